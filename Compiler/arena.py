@@ -0,0 +1,271 @@
+# arena.py
+# ------------------------------------------
+# Flat AST store: one row per node in parallel
+# arrays (kind + three operand slots), a flat
+# pool for child lists and a value pool.
+# Views let the existing phases walk it like
+# parser nodes; the binary dump is loaded back
+# as memoryviews without rebuilding objects.
+# ------------------------------------------
+
+import sys
+import struct
+from array import array
+from parser import *
+
+# field layout per node kind: (name, how) with how one of
+#   node  - index of a child node (-1 for None)
+#   val   - index into the value pool
+#   nodes - offset of a list of child nodes in the list pool
+#   vals  - offset of a list of value indices in the list pool
+SCHEMA = {
+    Program:    (("funcs", "nodes"),),
+    FuncDecl:   (("name", "val"), ("params", "vals"), ("body", "node")),
+    Block:      (("stmts", "nodes"),),
+    VarAssign:  (("name", "val"), ("expr", "node")),
+    PrintStmt:  (("expr", "node"),),
+    IfStmt:     (("cond", "node"), ("thenb", "node"), ("elseb", "node")),
+    WhileStmt:  (("cond", "node"), ("body", "node")),
+    ReturnStmt: (("expr", "node"),),
+    ExprStmt:   (("expr", "node"),),
+    BinOp:      (("op", "val"), ("left", "node"), ("right", "node")),
+    Number:     (("val", "val"),),
+    String:     (("val", "val"),),
+    Char:       (("val", "val"),),
+    VarRef:     (("name", "val"),),
+    FuncCall:   (("name", "val"), ("args", "nodes")),
+}
+KINDS = list(SCHEMA)
+KIND = {cls: k for k, cls in enumerate(KINDS)}
+NONE = -1
+
+MAGIC = b"MCAST"
+VERSION = 1
+# magic, version, nodes, list pool length, values, value blob bytes, root
+HEADER = struct.Struct("<5sHIIIQi")
+T_INT, T_FLOAT, T_BOOL, T_STR, T_NONE = range(5)
+
+def _pad(n):
+    return -n % 8
+
+class Values:
+    # value pool read lazily out of a dumped blob
+    def __init__(self, tags, offs, blob):
+        self.tags = tags; self.offs = offs; self.blob = blob
+    def __len__(self): return len(self.tags)
+    def __getitem__(self, k):
+        tag = self.tags[k]; raw = self.blob[self.offs[k]:self.offs[k + 1]]
+        if tag == T_STR: return str(raw, "utf-8")
+        if tag == T_INT: return int(str(raw, "ascii"))
+        if tag == T_FLOAT: return struct.unpack("<d", raw)[0]
+        if tag == T_BOOL: return raw[0] == 1
+        return None
+
+class Arena:
+    def __init__(self):
+        self.kind = array("B")
+        self.slots = (array("i"), array("i"), array("i"))
+        self.lists = array("i")
+        self.values = []; self._vid = {}
+        self.root = NONE
+        self.types = {}; self.binds = {}     # node -> what semantic.analyze gave it
+
+    def __len__(self): return len(self.kind)
+
+    # ---- building ----
+    def value(self, v):
+        # 1, 1.0 and True compare equal, so the pool is keyed on type too
+        key = (type(v), v)
+        k = self._vid.get(key)
+        if k is None:
+            k = self._vid[key] = len(self.values); self.values.append(v)
+        return k
+
+    def add_list(self, items):
+        off = len(self.lists)
+        self.lists.append(len(items)); self.lists.extend(items)
+        return off
+
+    def add(self, cls, *args):
+        i = len(self.kind)
+        self.kind.append(KIND[cls])
+        fields = SCHEMA[cls]
+        for k in range(3):
+            if k < len(fields):
+                how = fields[k][1]; x = args[k]
+                if how == "node": x = NONE if x is None else x
+                elif how == "val": x = self.value(x)
+                elif how == "nodes": x = self.add_list(x)
+                else: x = self.add_list([self.value(v) for v in x])
+            else:
+                x = NONE
+            self.slots[k].append(x)
+        if cls is Program: self.root = i
+        return i
+
+    def maker(self, cls):
+        add = self.add
+        return lambda *args: add(cls, *args)
+
+    def parse(self, tokens):
+        # Parser with its node constructors swapped for this arena's
+        p = Parser(tokens)
+        for cls in KINDS: setattr(p, cls.__name__, self.maker(cls))
+        self.root = p.parse()
+        return self
+
+    # ---- access ----
+    def get_list(self, off):
+        n = self.lists[off]
+        return self.lists[off + 1:off + 1 + n]
+
+    def field(self, i, name):
+        cls = KINDS[self.kind[i]]
+        for k, (f, how) in enumerate(SCHEMA[cls]):
+            if f == name: return self._read(how, self.slots[k][i])
+        raise AttributeError(f"{cls.__name__} has no field {name}")
+
+    def _read(self, how, x):
+        if how == "node": return None if x == NONE else self.view(x)
+        if how == "val": return self.values[x]
+        if how == "nodes": return [self.view(c) for c in self.get_list(x)]
+        return [self.values[v] for v in self.get_list(x)]
+
+    def children(self, i):
+        # child node indices in field order, for non-recursive walks
+        out = []
+        for k, (_, how) in enumerate(SCHEMA[KINDS[self.kind[i]]]):
+            x = self.slots[k][i]
+            if how == "node":
+                if x != NONE: out.append(x)
+            elif how == "nodes":
+                out.extend(self.get_list(x))
+        return out
+
+    def view(self, i):
+        return _views[self.kind[i]](self, i)
+
+    def tree(self):
+        return self.view(self.root)
+
+    def nbytes(self):
+        n = len(self.kind) + sum(len(s) * 4 for s in self.slots) + len(self.lists) * 4
+        return n
+
+    # ---- binary format ----
+    def dumps(self):
+        tags = bytearray(); offs = array("q", [0]); blob = bytearray()
+        for v in self.values:
+            if isinstance(v, bool): tags.append(T_BOOL); blob.append(1 if v else 0)
+            elif isinstance(v, int): tags.append(T_INT); blob += str(v).encode("ascii")
+            elif isinstance(v, float): tags.append(T_FLOAT); blob += struct.pack("<d", v)
+            elif isinstance(v, str): tags.append(T_STR); blob += v.encode("utf-8")
+            else: tags.append(T_NONE)
+            offs.append(len(blob))
+        arrays = [bytes(self.kind)] + [_le(s) for s in self.slots] + [_le(self.lists), bytes(tags), _le(offs)]
+        out = [HEADER.pack(MAGIC, VERSION, len(self.kind), len(self.lists), len(self.values), len(blob), self.root)]
+        out.append(b"\0" * _pad(HEADER.size))
+        for a in arrays: out.append(a); out.append(b"\0" * _pad(len(a)))
+        out.append(bytes(blob))
+        return b"".join(out)
+
+    @classmethod
+    def loads(cls, data):
+        # the tables become memoryview casts over `data`; nothing is copied
+        mv = memoryview(data)
+        magic, version, n, nl, nv, nblob, root = HEADER.unpack_from(mv)
+        if magic != MAGIC: raise ValueError("not a MiniCompiler AST file")
+        if version != VERSION: raise ValueError(f"AST format version {version}, expected {VERSION}")
+        pos = HEADER.size + _pad(HEADER.size)
+        def take(count, fmt, size):
+            nonlocal pos
+            v = mv[pos:pos + count * size]; pos += count * size + _pad(count * size)
+            if fmt == "B": return v
+            v = v.cast(fmt)
+            # the file is little-endian; big-endian hosts get a swapped copy
+            if sys.byteorder != "little": v = _swapped(fmt, v)
+            return v
+        a = cls.__new__(cls)
+        a.kind = take(n, "B", 1)
+        a.slots = (take(n, "i", 4), take(n, "i", 4), take(n, "i", 4))
+        a.lists = take(nl, "i", 4)
+        tags = take(nv, "B", 1); offs = take(nv + 1, "q", 8)
+        a.values = Values(tags, offs, mv[pos:pos + nblob])
+        a._vid = None
+        a.root = root
+        a.types = {}; a.binds = {}
+        return a
+
+    def dump(self, path):
+        with open(path, "wb") as f: f.write(self.dumps())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f: return cls.loads(f.read())
+
+def _le(a):
+    if sys.byteorder != "little":
+        a = array(a.typecode, a); a.byteswap()
+    return a.tobytes()
+
+def _swapped(fmt, v):
+    a = array(fmt, v.tobytes()); a.byteswap()
+    return a
+
+# ---- views ----
+# One class per node kind, subclassing the parser's node class so the
+# isinstance chains in semantic / codegen / print_ast accept it; fields
+# are properties reading the arena's arrays. A view is made afresh on
+# every access, so the type / bind the analysis sets are kept in the
+# arena by node index.
+class View:
+    __slots__ = ("arena", "i")
+    def __init__(self, arena, i): self.arena = arena; self.i = i
+    def __repr__(self): return f"<{type(self).__name__} #{self.i}>"
+
+    @property
+    def type(self): return self.arena.types.get(self.i)
+    @type.setter
+    def type(self, t): self.arena.types[self.i] = t
+
+    @property
+    def bind(self): return self.arena.binds.get(self.i)
+    @bind.setter
+    def bind(self, b): self.arena.binds[self.i] = b
+
+def _prop(k, how):
+    def get(self):
+        a = self.arena
+        return a._read(how, a.slots[k][self.i])
+    return property(get)
+
+_views = []
+for _cls in KINDS:
+    _ns = {"__slots__": (), "__init__": View.__init__}
+    for _k, (_f, _how) in enumerate(SCHEMA[_cls]): _ns[_f] = _prop(_k, _how)
+    _views.append(type(_cls.__name__, (View, _cls), _ns))
+
+if __name__ == "__main__":
+    import time
+    from lexical import tokenize
+    from codegen import TACGen
+    from stats import count_nodes
+    if len(sys.argv) < 2:
+        print("Usage: python arena.py sample.src [out.ast]"); sys.exit()
+    with open(sys.argv[1], "r", encoding="utf-8") as f: src = f.read()
+    toks = list(tokenize(src))
+    a = Arena().parse(toks)
+    data = a.dumps()
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], "wb") as f: f.write(data)
+    t0 = time.perf_counter(); b = Arena.loads(data); t1 = time.perf_counter()
+    print("===== AST ARENA =====")
+    print(f"nodes: {len(a)} (object tree: {count_nodes(Parser(toks).parse())})")
+    print(f"tables: {a.nbytes()} bytes, values: {len(a.values)}")
+    print(f"binary: {len(data)} bytes, format v{VERSION}, loaded in {(t1 - t0) * 1e6:.0f}us")
+    same = list(map(str, TACGen().gen(b.tree()))) == list(map(str, TACGen().gen(Parser(toks).parse())))
+    print(f"TAC from loaded arena matches object tree: {same}")
+    print("=====================\n")
+    print("===== PARSER (SYNTAX TREE) =====")
+    print_ast(b.tree())
+    print("===============================\n")
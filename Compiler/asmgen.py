@@ -3,30 +3,79 @@
 # Converts TAC into simplified assembly code
 # ------------------------------------------
 
-def tac_to_asm(tac_lines):
-    asm = []
-    for line in tac_lines:
-        if line.startswith("label"):
-            asm.append(line.replace("label", "").strip() + ":")
-        elif line.startswith("PRINT"):
-            asm.append("OUT " + line.split("PRINT")[1].strip())
-        elif line.startswith("IFZ"):
-            parts = line.split()
-            asm.append(f"CMPZ {parts[1]}")
-            asm.append(f"JZ {parts[3]}")
-        elif line.startswith("IF"):
-            parts = line.split()
-            asm.append(f"CMP {parts[1]}")
-            asm.append(f"JNZ {parts[3]}")
-        elif line.startswith("GOTO"):
-            asm.append("JMP " + line.split()[1])
-        elif line.startswith("RETURN"):
-            asm.append("RET " + line.split()[1])
-        elif ":" in line:
-            asm.append(line)
-        elif "=" in line:
-            asm.append("MOV " + line)
-    return asm
+from tac import Op
+from cfg import split_funcs
+from regalloc import REGS, Allocation, reuse_temps, intervals, read_first
+from peephole import peephole as peep
+
+def tac_to_asm(tac, regs=REGS, reports=None, peephole=True):
+    # Temps and locals live in a file of `regs` registers (R0..) with
+    # spill slots ([sp+k]); regs=0 keeps the names and only lets temps
+    # with disjoint lifetimes share one. Names read before any write are
+    # set to 0 on entry, as in the VM. A '; ...' line after each
+    # function label reports registers used, spills and dropped moves.
+    # TAC labels restart in every function; in assembly they are
+    # qualified with the function name to stay unique. Each function's
+    # code then goes through the peephole pass; `reports` gets one dict
+    # per function with the allocation numbers and rule hits.
+    # Calling convention: the caller moves argument k into A<k> and
+    # runs CALL f; the callee copies its arguments out of A0.. before
+    # any call of its own, RET leaves the result in RV, and every frame
+    # has its own spill slots. All registers are caller-saved, so values
+    # live across a call are kept in spill slots.
+    out = []
+    for func, body in split_funcs(tac):
+        asm = []; nargs = 0
+        if regs:
+            alloc = Allocation(func, body, regs)
+            opd = alloc.operand; entry = alloc.entry
+        else:
+            alloc = None
+            body = reuse_temps(body)[0]
+            opd = str; entry = read_first(intervals(body))
+        for nm in entry:
+            asm.append(f"MOV {opd(nm)} = 0")
+        for ins in body:
+            op = ins.op
+            if op is Op.PRINT:
+                asm.append(f"OUT {opd(ins.a)}")
+            elif op is Op.IFZ:
+                asm.append(f"CMPZ {opd(ins.a)}")
+                asm.append(f"JZ {func}.{ins.dst}")
+            elif op is Op.IF:
+                asm.append(f"CMP {opd(ins.a)}")
+                asm.append(f"JNZ {func}.{ins.dst}")
+            elif op is Op.GOTO:
+                asm.append(f"JMP {func}.{ins.dst}")
+            elif op is Op.RETURN:
+                asm.append(f"RET {opd(ins.a)}")
+            elif op is Op.LABEL:
+                asm.append(f"{func}.{ins.dst}:")
+            elif op is Op.COPY:
+                d = opd(ins.dst); a = opd(ins.a)
+                if d == a and alloc:
+                    alloc.moves += 1    # both sides got the same register
+                    continue
+                asm.append(f"MOV {d} = {a}")
+            elif op is Op.BIN:
+                asm.append(f"MOV {opd(ins.dst)} = {opd(ins.a)} {ins.sym} {opd(ins.b)}")
+            elif op is Op.PARAM:
+                asm.append(f"MOV A{nargs} = {opd(ins.a)}"); nargs += 1
+            elif op is Op.CALL:
+                asm.append(f"CALL {ins.sym}")
+                asm.append(f"MOV {opd(ins.dst)} = RV"); nargs = 0
+            elif op is Op.ARG:
+                asm.append(f"MOV {opd(ins.dst)} = A{ins.a}")
+        if not body or body[-1].op not in (Op.RETURN, Op.GOTO):
+            asm.append("RET 0")     # falling off the end returns 0
+        hits = {}
+        if peephole: asm = peep(asm, hits)
+        if func is not None: out.append(f"{func}:")
+        if alloc: out.append(alloc.summary())
+        out.extend(asm)
+        if reports is not None:
+            reports.append(dict(alloc.report() if alloc else {}, function=func, peephole=hits))
+    return out
 
 
 if __name__ == "__main__":
@@ -35,6 +84,7 @@ if __name__ == "__main__":
     from parser import Parser
     from codegen import TACGen
     from optimizer import optimize
+    from peephole import RULE_NAMES
 
     if len(sys.argv) < 2:
         print("Usage: python asmgen.py sample.src")
@@ -46,9 +96,19 @@ if __name__ == "__main__":
     g = TACGen()
     tac = g.gen(tree)
     opt = optimize(tac)
-    asm = tac_to_asm(opt)
+    reports = []
+    asm = tac_to_asm(opt, REGS, reports)
 
     print("===== ASSEMBLY CODE =====")
     for line in asm:
         print(line)
     print("=========================\n")
+    print("===== REGISTER ALLOCATION =====")
+    for r in reports:
+        print(f"{r['function']}: {r['used']}/{r['registers']} registers, {r['spills']} spills, "
+              f"{r['moves_eliminated']} moves eliminated ({r['names']} names)")
+    print("===============================\n")
+    print("===== PEEPHOLE =====")
+    for name in RULE_NAMES:
+        print(f"{name}: {sum(r['peephole'].get(name, 0) for r in reports)}")
+    print("====================\n")
@@ -0,0 +1,100 @@
+# batch.py
+# ------------------------------------------
+# Parallel batch compilation of many .src files
+# over a process pool with bounded in-flight work
+# ------------------------------------------
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from cache import Cache, compile_source
+
+_cache=None     # per worker process
+
+def _init(cache_dir):
+    global _cache
+    _cache=Cache(cache_dir) if cache_dir else None
+
+def collect(paths):
+    # expand directories to the .src files under them -> [(path, name)],
+    # name being the path relative to the directory given (for --out-dir)
+    files=[]
+    for p in paths:
+        if os.path.isdir(p):
+            for root,dirs,names in os.walk(p):
+                dirs.sort()
+                files.extend((os.path.join(root,n),os.path.relpath(os.path.join(root,n),p))
+                             for n in sorted(names) if n.endswith(".src"))
+        else:
+            files.append((p,os.path.basename(p)))
+    return files
+
+def out_path(path,out_dir,name=None):
+    # next to the source, or at the same relative place under out_dir
+    if not out_dir: return os.path.splitext(path)[0]+".asm"
+    return os.path.join(out_dir,os.path.splitext(name or os.path.basename(path))[0]+".asm")
+
+def compile_file(path,out=None):
+    # -> (path, source lines, error or None); never raises
+    try:
+        with open(path,"r",encoding="utf-8") as f: src=f.read()
+    except OSError as e:
+        return path,0,f"{type(e).__name__}: {e}"
+    lines=src.count("\n")+1
+    try:
+        asm=compile_source(src,_cache)
+        out=out or out_path(path,None)
+        if os.path.dirname(out): os.makedirs(os.path.dirname(out),exist_ok=True)
+        with open(out,"w",encoding="utf-8") as f:
+            f.write("\n".join(asm)+"\n")
+    except Exception as e:
+        return path,lines,f"{type(e).__name__}: {e}"
+    return path,lines,None
+
+def batch(paths,jobs=None,out_dir=None,cache_dir=None,inflight=None,log=print):
+    if out_dir: os.makedirs(out_dir,exist_ok=True)
+    jobs=jobs or os.cpu_count() or 1
+    inflight=inflight or jobs*4
+    errors=[]; nfiles=0; nlines=0
+    # a source that would write an .asm another one writes already (the
+    # same x.src name given from two places) fails instead of replacing it
+    files=[]; owner={}
+    for path,name in collect(paths):
+        out=os.path.normpath(os.path.abspath(out_path(path,out_dir,name)))
+        if out in owner:
+            errors.append((path,f"output {out_path(path,out_dir,name)} is also written for {owner[out]}"))
+            nfiles+=1
+        else:
+            owner[out]=path; files.append((path,out))
+    t0=time.perf_counter()
+    with ProcessPoolExecutor(jobs,initializer=_init,initargs=(cache_dir,)) as pool:
+        pending=set(); it=iter(files)
+        while True:
+            # keep at most `inflight` files queued so huge batches stay bounded
+            for path,out in it:
+                pending.add(pool.submit(compile_file,path,out))
+                if len(pending)>=inflight: break
+            if not pending: break
+            done,pending=wait(pending,return_when=FIRST_COMPLETED)
+            for fut in done:
+                path,lines,err=fut.result()
+                nfiles+=1; nlines+=lines
+                if err: errors.append((path,err))
+    dt=time.perf_counter()-t0
+    for path,err in errors: log(f"{path}: {err}")
+    log(f"compiled {nfiles-len(errors)}/{nfiles} files ({len(errors)} failed) in {dt:.2f}s "
+        f"with {jobs} worker{'s' if jobs>1 else ''}: {nfiles/dt if dt else 0:.1f} files/sec, {nlines/dt if dt else 0:.0f} lines/sec")
+    return errors
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(usage="python batch.py FILE_OR_DIR... [-j N] [--out-dir DIR]")
+    ap.add_argument("paths", nargs="+")
+    ap.add_argument("-j", "--jobs", type=int, help="worker processes (default: CPU count)")
+    ap.add_argument("--out-dir", help="write .asm files here, laid out as under the given directories (default: next to the sources)")
+    ap.add_argument("--cache", metavar="DIR", help="reuse phase artifacts cached in DIR")
+    ap.add_argument("--max-inflight", type=int, help="files queued at once (default: 4 per worker)")
+    args = ap.parse_args()
+    errs = batch(args.paths, args.jobs, args.out_dir, args.cache, args.max_inflight)
+    sys.exit(1 if errs else 0)
@@ -0,0 +1,264 @@
+# bench.py
+# ------------------------------------------
+# Per-phase benchmark suite
+# generates synthetic MiniCompiler programs,
+# times every phase, records peak memory and
+# saves / compares JSON results
+# ------------------------------------------
+
+import gc
+import os
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import tracemalloc
+
+from lexical import tokenize, tokenize_file
+from parser import Parser
+from semantic import analyze
+from codegen import TACGen
+from optimizer import optimize
+from asmgen import tac_to_asm
+
+# ---- synthetic program generator ----
+
+OPS=["+","-","*","/","<",">","==","!=","<=",">="]
+
+class ProgramGen:
+    def __init__(self,depth=3,expr_size=4,stmts=8,params=2,seed=0):
+        self.depth=depth; self.expr_size=expr_size; self.stmts=stmts
+        self.params=params; self.rnd=random.Random(seed); self.nfunc=0
+
+    def expr(self,names,size):
+        r=self.rnd
+        if size<=1:
+            return r.choice(names) if names and r.random()<0.6 else str(r.randint(0,99))
+        left=r.randint(1,size-1)
+        e=f"{self.expr(names,left)} {r.choice(OPS)} {self.expr(names,size-left)}"
+        return f"({e})" if r.random()<0.3 else e
+
+    def block(self,names,depth,ind):
+        r=self.rnd; sp="    "*ind; out=[]
+        for _ in range(self.stmts):
+            k=r.random()
+            if depth>0 and k<0.15:
+                out.append(f"{sp}if ({self.expr(names,self.expr_size)}) {{")
+                out.extend(self.block(names,depth-1,ind+1))
+                if r.random()<0.5:
+                    out.append(f"{sp}}} else {{"); out.extend(self.block(names,depth-1,ind+1))
+                out.append(f"{sp}}}")
+            elif depth>0 and k<0.25:
+                v=f"i{depth}"; names.append(v)
+                out.append(f"{sp}{v} = 0;")
+                out.append(f"{sp}while ({v} < {r.randint(1,9)}) {{")
+                out.extend(self.block(names,depth-1,ind+1))
+                out.append(f"{sp}    {v} = {v} + 1;")
+                out.append(f"{sp}}}")
+            elif k<0.35:
+                out.append(f"{sp}print({self.expr(names,self.expr_size)});")
+            else:
+                v=f"v{r.randint(0,9)}"
+                out.append(f"{sp}{v} = {self.expr(names,self.expr_size)};")
+                if v not in names: names.append(v)
+        return out
+
+    def func(self):
+        name=f"f{self.nfunc}"; self.nfunc+=1
+        params=[f"p{k}" for k in range(self.params)]
+        lines=[f"func {name}({', '.join(params)}) {{"]
+        names=list(params)
+        lines.extend(self.block(names,self.depth,1))
+        lines.append(f"    return {self.expr(names,self.expr_size)};")
+        lines.append("}")
+        return "\n".join(lines)+"\n"
+
+    def chunks(self,size=None,funcs=None):
+        # yields whole functions until `size` bytes or `funcs` functions
+        total=0; n=0
+        while (funcs is None or n<funcs) and (size is None or total<size):
+            s=self.func(); total+=len(s); n+=1
+            yield s
+
+def generate(size=None,funcs=None,**kw):
+    return "".join(ProgramGen(**kw).chunks(size,funcs))
+
+def write_program(path,size=None,funcs=None,**kw):
+    # streams to disk, so hundreds of MB never sit in one string
+    with open(path,"w",encoding="utf-8") as f:
+        for s in ProgramGen(**kw).chunks(size,funcs): f.write(s)
+
+def parse_size(s):
+    s=s.strip().upper(); mult=1
+    for suf,m in (("K",1<<10),("M",1<<20),("G",1<<30)):
+        if s.endswith(suf) or s.endswith(suf+"B"):
+            s=s[:-len(suf)] if s.endswith(suf) else s[:-len(suf)-1]; mult=m
+    return int(float(s)*mult)
+
+def deep_programs(n):
+    # pathological nesting: n levels of if / while / {} / parens / calls,
+    # and n-operand chains in both associativities
+    return {
+        "if":    "func main() { x = 0; " + "if (1) { "*n + "x = x + 1; " + "} "*n + "print(x); return x; }",
+        "while": "func main() { i = 0; " + "while (i < 1) { "*n + "i = i + 1; " + "} "*n + "return i; }",
+        "block": "func main() { " + "{ "*n + "x = 1; " + "} "*n + "return 0; }",
+        "paren": "func main() { x = " + "("*n + "1" + ")"*n + "; return x; }",
+        "call":  "func main() { x = " + "g("*n + "1" + ")"*n + "; return 0; }",
+        "chain": "func main() { x = 1" + " + 1"*n + "; return x; }",
+        "right": "func main() { x = " + "1 + ("*n + "1" + ")"*n + "; return x; }",
+    }
+
+def recursion_programs(n):
+    return {
+        "tail":  "func f(n, a) { if (n < 1) { return a; } return f(n - 1, a + n); }\n"
+                 f"func main() {{ return f({n}, 0); }}",
+        "accum": "func f(n) { if (n < 1) { return 0; } return n + f(n - 1); }\n"
+                 f"func main() {{ return f({n}); }}",
+    }
+
+def deep(n,log=print):
+    # front-end phases on deeply nested input; any recursion would
+    # overflow long before n=100000
+    for name,src in deep_programs(n).items():
+        tokens=list(tokenize(src))
+        t0=time.perf_counter(); tree=Parser(tokens).parse()
+        t1=time.perf_counter(); analyze(tree)
+        t2=time.perf_counter(); tac=TACGen().gen(tree)
+        t3=time.perf_counter()
+        log(f"{name:6} depth {n}: parse {t1-t0:7.3f}s  analyze {t2-t1:7.3f}s  tacgen {t3-t2:7.3f}s  ({len(tac)} TAC)")
+    # self recursion n calls deep: with calls in return position made
+    # jumps by TACGen, the VM stack stays at one frame
+    import vm
+    for name,src in recursion_programs(n).items():
+        m=vm.VM(vm.load(TACGen().gen(Parser(list(tokenize(src))).parse())),lambda s: None)
+        t0=time.perf_counter(); ret=m.run(); t1=time.perf_counter()
+        log(f"{name:6} depth {n}: run {t1-t0:7.3f}s  max call depth {m.depth}  (returned {ret})")
+
+# ---- phase timing ----
+
+def tokens_of(d):
+    # a program written to disk is streamed rather than held as one string
+    return list(tokenize_file(d["path"]) if "path" in d else tokenize(d["src"]))
+
+def count_lines(path,chunk=1<<20):
+    n=0
+    with open(path,"rb") as f:
+        for b in iter(lambda: f.read(chunk),b""): n+=b.count(b"\n")
+    return n
+
+PHASES=[
+    ("tokenize", tokens_of, "tokens"),
+    ("parse",    lambda d: Parser(d["tokens"]).parse(), "tree"),
+    ("analyze",  lambda d: analyze(d["tree"]), "symtab"),
+    ("tacgen",   lambda d: TACGen().gen(d["tree"]), "tac"),
+    ("optimize", lambda d: optimize(d["tac"]), "opt"),
+    ("asmgen",   lambda d: tac_to_asm(d["opt"]), "asm"),
+]
+
+def measure(src=None,memory=True,path=None):
+    # times the phases on `src`, or on the program in the file `path`
+    inp={"path":path} if path else {"src":src}
+    d=dict(inp); phases={}
+    for name,fn,out in PHASES:
+        gc.collect()
+        c0=time.process_time(); t0=time.perf_counter()
+        d[out]=fn(d)
+        phases[name]={"seconds":time.perf_counter()-t0,"cpu":time.process_time()-c0}
+    if memory:
+        # second pass under tracemalloc so tracing does not skew the timings
+        m=dict(inp)
+        for name,fn,out in PHASES:
+            gc.collect()
+            tracemalloc.start()
+            m[out]=fn(m)
+            phases[name]["peak_bytes"]=tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    size,lines=(os.path.getsize(path),count_lines(path)) if path else (len(src),src.count("\n"))
+    return {"bytes":size,"lines":lines,"tokens":len(d["tokens"]),
+            "tac":len(d["tac"]),"opt":len(d["opt"]),"asm":len(d["asm"]),"phases":phases}
+
+STREAM=64<<20   # sizes from here up go through a file and the streaming tokenizer
+
+def run(sizes,memory=True,log=print,funcs=None,stream=STREAM,**kw):
+    results=[]
+    for size in sizes:
+        if size is not None and size<stream:
+            r=measure(generate(size=size,funcs=funcs,**kw),memory)
+        else:
+            fd,path=tempfile.mkstemp(suffix=".src"); os.close(fd)
+            try:
+                write_program(path,size=size,funcs=funcs,**kw)
+                r=measure(memory=memory,path=path)
+            finally: os.remove(path)
+        results.append(r)
+        log(f"{r['bytes']:>12} bytes {r['lines']:>9} lines {r['tokens']:>10} tokens")
+        for name,p in r["phases"].items():
+            mem=f"  peak {p['peak_bytes']/1e6:9.2f} MB" if "peak_bytes" in p else ""
+            log(f"    {name:9} {p['seconds']:9.4f}s{mem}")
+    return results
+
+def compare(old,new,threshold=0.10,log=print):
+    # flags phases that got slower than `threshold` on the same input size
+    base={r["bytes"]:r for r in old["results"]}
+    worse=0
+    for r in new["results"]:
+        o=base.get(r["bytes"])
+        if not o: continue
+        for name,p in r["phases"].items():
+            if name not in o["phases"]: continue
+            a=o["phases"][name]["seconds"]; b=p["seconds"]
+            ratio=b/a if a else 1.0
+            flag="  REGRESSION" if ratio>1+threshold else ""
+            worse+=bool(flag)
+            log(f"{r['bytes']:>12} {name:9} {a:9.4f}s -> {b:9.4f}s  x{ratio:5.2f}{flag}")
+    return worse
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(usage="python bench.py [--sizes 16K,256K,4M] [--funcs N] [--json out.json] [--compare old.json] [--deep N]")
+    ap.add_argument("--sizes", help="comma separated source sizes (K/M/G), default 16K,128K,1M")
+    ap.add_argument("--funcs", type=int, help="functions per program (with --sizes, whichever limit comes first)")
+    ap.add_argument("--depth", type=int, default=3, help="if/while nesting depth")
+    ap.add_argument("--expr-size", type=int, default=4, help="operands per expression")
+    ap.add_argument("--stmts", type=int, default=8, help="statements per block")
+    ap.add_argument("--params", type=int, default=2, help="parameters per function")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--no-mem", action="store_true", help="skip the tracemalloc pass")
+    ap.add_argument("--stream", default="64M", help="sizes from here up are written to a temp file and tokenized from it")
+    ap.add_argument("--json", help="save results here")
+    ap.add_argument("--compare", help="compare against a previous results file")
+    ap.add_argument("--threshold", type=float, default=0.10, help="slowdown ratio flagged as regression")
+    ap.add_argument("--write", metavar="FILE", help="only write one generated program of the first size")
+    ap.add_argument("--deep", type=int, metavar="N", help="only run the front end on programs nested N levels deep (and recursion N calls deep)")
+    args = ap.parse_args()
+
+    if args.deep:
+        print("===== DEEP NESTING =====")
+        deep(args.deep)
+        print("========================\n")
+        sys.exit()
+
+    if args.sizes: sizes = [parse_size(s) for s in args.sizes.split(",")]
+    else: sizes = [None] if args.funcs else [16<<10, 128<<10, 1<<20]
+    kw = dict(depth=args.depth, expr_size=args.expr_size, stmts=args.stmts,
+              params=args.params, seed=args.seed, funcs=args.funcs)
+    if args.write:
+        write_program(args.write, size=sizes[0], **kw); sys.exit()
+
+    print("===== BENCHMARK =====")
+    results = run(sizes, memory=not args.no_mem, stream=parse_size(args.stream), **kw)
+    print("=====================\n")
+    doc = {"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                    "machine": platform.machine(), "config": kw},
+           "results": results}
+    if args.json:
+        with open(args.json, "w") as f: json.dump(doc, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f: old = json.load(f)
+        print("===== COMPARISON =====")
+        n = compare(old, doc, args.threshold)
+        print(f"{n} regression(s)")
+        print("======================\n")
+        sys.exit(1 if n else 0)
@@ -0,0 +1,170 @@
+# cache.py
+# ------------------------------------------
+# Content-addressed on-disk cache of phase
+# artifacts (tokens / ast / tac / opt / asm)
+# keyed by source hash + compiler version,
+# with size-bounded LRU eviction
+# ------------------------------------------
+
+import os
+import sys
+import pickle
+import hashlib
+
+PHASES=("tokens","ast","tac","opt","asm")
+MODULES=("lexical.py","parser.py","semantic.py","codegen.py","tac.py",
+         "cfg.py","optimizer.py","inline.py","loops.py","ssa.py","regalloc.py","peephole.py","asmgen.py")
+
+_version=None
+def compiler_version():
+    # hash of the phase sources, so editing the compiler invalidates old entries
+    global _version
+    if _version is None:
+        h=hashlib.sha256()
+        here=os.path.dirname(os.path.abspath(__file__))
+        for m in MODULES:
+            with open(os.path.join(here,m),"rb") as f: h.update(f.read())
+        _version=h.hexdigest()[:16]
+    return _version
+
+class Cache:
+    def __init__(self,root,max_bytes=256<<20):
+        self.root=root; self.max_bytes=max_bytes
+        self.hits={p:0 for p in PHASES}; self.misses={p:0 for p in PHASES}
+        os.makedirs(root,exist_ok=True)
+        self._size=None     # bytes on disk, measured when first needed (a put)
+
+    @property
+    def size(self):
+        if self._size is None: self._size=sum(sz for _,sz,_ in self._entries())
+        return self._size
+
+    def key(self,src):
+        if isinstance(src,str): src=src.encode("utf-8")
+        return hashlib.sha256(compiler_version().encode()+b"\0"+src).hexdigest()
+
+    def path(self,key,phase):
+        return os.path.join(self.root,key[:2],f"{key}.{phase}")
+
+    def _load(self,p):
+        try:
+            with open(p,"rb") as f: obj=pickle.load(f)
+        except (OSError,EOFError,pickle.UnpicklingError):
+            return None
+        try: os.utime(p)    # mark as recently used
+        except OSError: pass
+        return obj
+
+    def get(self,key,phase):
+        obj=self._load(self.path(key,phase))
+        if obj is None: self.misses[phase]+=1
+        else: self.hits[phase]+=1
+        return obj
+
+    def note(self,key,phase,counters):
+        # counters the phase reported (tail calls, optimizer passes), kept
+        # next to its artifact so --stats has them on a hit too
+        self.put(key,f"{phase}.stats",counters)
+
+    def notes(self,key,phase):
+        return self._load(self.path(key,f"{phase}.stats")) or {}
+
+    def put(self,key,phase,obj):
+        p=self.path(key,phase)
+        os.makedirs(os.path.dirname(p),exist_ok=True)
+        total=self.size     # measured before the new entry lands
+        tmp=f"{p}.{os.getpid()}.tmp"
+        with open(tmp,"wb") as f: pickle.dump(obj,f,pickle.HIGHEST_PROTOCOL)
+        try: old=os.path.getsize(p)     # an entry being rewritten
+        except OSError: old=0
+        os.replace(tmp,p)   # atomic, so concurrent compiles never see half an entry
+        self._size=total-old+os.path.getsize(p)
+        if self._size>self.max_bytes: self.evict()
+
+    def fetch(self,key,phase,compute):
+        obj=self.get(key,phase)
+        if obj is None:
+            obj=compute(); self.put(key,phase,obj)
+        return obj
+
+    def _entries(self):
+        for d in os.listdir(self.root):
+            sub=os.path.join(self.root,d)
+            if not os.path.isdir(sub): continue
+            for name in os.listdir(sub):
+                p=os.path.join(sub,name)
+                try: st=os.stat(p)
+                except OSError: continue
+                yield p,st.st_size,st.st_mtime
+
+    def evict(self):
+        # least recently used first, down to 3/4 of the budget
+        entries=sorted(self._entries(),key=lambda e:e[2])
+        total=sum(sz for _,sz,_ in entries)
+        for p,sz,_ in entries:
+            if total<=self.max_bytes*3//4: break
+            try: os.remove(p); total-=sz
+            except OSError: pass
+        self._size=total
+
+    def report(self):
+        h=sum(self.hits.values()); m=sum(self.misses.values())
+        per=", ".join(f"{p} {self.hits[p]}/{self.misses[p]}" for p in PHASES)
+        size=f"; {self._size} bytes" if self._size is not None else ""
+        return f"cache: {h} hits, {m} misses (hit/miss: {per}){size}"
+
+def run_phase(phase,prev,src=None,counters=None):
+    # compute one phase from the artifact of the phase before it;
+    # `counters` collects what tac and opt report
+    if phase=="tokens":
+        from lexical import tokenize
+        return list(tokenize(src))
+    if phase=="ast":
+        from parser import Parser
+        from semantic import analyze
+        tree=Parser(prev).parse()
+        analyze(tree)
+        return tree
+    if phase=="tac":
+        from codegen import TACGen
+        gen=TACGen(); tac=gen.gen(prev)
+        if counters is not None: counters.update(gen.stats)
+        return tac
+    if phase=="opt":
+        from optimizer import optimize
+        return optimize(prev,stats=counters)
+    if phase=="asm":
+        from asmgen import tac_to_asm
+        return tac_to_asm(prev)
+    raise ValueError(f"unknown phase {phase}")
+
+def compile_source(src,cache=None,upto="asm"):
+    # artifact of phase `upto`, resuming from the deepest cached artifact
+    last=PHASES.index(upto)
+    key=cache.key(src) if cache else None
+    start=0; obj=None
+    if cache:
+        for i in range(last,-1,-1):
+            obj=cache.get(key,PHASES[i])
+            if obj is not None: start=i+1; break
+    for phase in PHASES[start:last+1]:
+        counters={}
+        obj=run_phase(phase,obj,src,counters)
+        if cache:
+            cache.put(key,phase,obj)
+            if counters: cache.note(key,phase,counters)
+    return obj
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python cache.py sample.src [cache_dir]")
+        sys.exit()
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        src = f.read()
+    c = Cache(sys.argv[2] if len(sys.argv) > 2 else ".minicache")
+    asm = compile_source(src, c)
+    print("===== ASSEMBLY CODE =====")
+    for line in asm:
+        print(line)
+    print("=========================\n")
+    print(c.report())
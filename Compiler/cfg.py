@@ -0,0 +1,256 @@
+# cfg.py
+# ------------------------------------------
+# Basic blocks / control-flow graph over TAC
+# plus iterative worklist dataflow (bitsets)
+# ------------------------------------------
+
+import re
+import heapq
+from tac import Op, Instr, is_name, is_temp
+
+ENDS=(Op.GOTO,Op.IF,Op.IFZ,Op.RETURN)
+
+class Block:
+    __slots__=("id","label","code","succ","pred")
+    def __init__(self,id,label=None):
+        self.id=id; self.label=label; self.code=[]; self.succ=[]; self.pred=[]
+    def __repr__(self): return f"B{self.id}({self.label})"
+
+def split_funcs(tac):
+    # [(name, body)] where body excludes the 'label f' header
+    funcs=[]; cur=None
+    for ins in tac:
+        if ins.op is Op.FUNC:
+            cur=(ins.dst,[]); funcs.append(cur)
+        else:
+            if cur is None: cur=(None,[]); funcs.append(cur)
+            cur[1].append(ins)
+    return funcs
+
+def join_funcs(funcs):
+    out=[]
+    for name,body in funcs:
+        if name is not None: out.append(Instr(Op.FUNC,name))
+        out.extend(body)
+    return out
+
+def build_cfg(body):
+    blocks=[]; cur=None
+    for ins in body:
+        if cur is None or (ins.op is Op.LABEL and cur.code) or (cur.code and cur.code[-1].op in ENDS):
+            cur=Block(len(blocks)); blocks.append(cur)
+        if ins.op is Op.LABEL and not cur.code: cur.label=ins.dst
+        cur.code.append(ins)
+    bylabel={b.label:b for b in blocks if b.label}
+    for i,b in enumerate(blocks):
+        last=b.code[-1]; nxt=blocks[i+1] if i+1<len(blocks) else None
+        if last.op in (Op.GOTO,Op.IF,Op.IFZ):
+            tgt=bylabel.get(last.dst)
+            if tgt is not None: b.succ.append(tgt)
+        if last.op not in (Op.GOTO,Op.RETURN) and nxt is not None and nxt not in b.succ:
+            b.succ.append(nxt)
+        for s in b.succ: s.pred.append(b)
+    return blocks
+
+def reachable(blocks):
+    # drop blocks that cannot be reached from the entry, renumber the rest
+    if not blocks: return blocks
+    seen={blocks[0].id}; stack=[blocks[0]]
+    while stack:
+        for s in stack.pop().succ:
+            if s.id not in seen: seen.add(s.id); stack.append(s)
+    live=[b for b in blocks if b.id in seen]
+    for b in live: b.pred=[p for p in b.pred if p.id in seen]
+    for i,b in enumerate(live): b.id=i
+    return live
+
+def flatten(blocks):
+    return [ins for b in blocks for ins in b.code]
+
+# generic worklist solver; facts are int bitsets
+# returns (before, after) per block id in program order
+def solve(blocks,transfer,forward=True,must=False,boundary=0,top=0):
+    n=len(blocks)
+    before=[top]*n; after=[top]*n
+    # lowest id first (highest going backward): program order is close to a
+    # reverse postorder, so a loop settles before the code past it is redone
+    sign=1 if forward else -1
+    work=[sign*b.id for b in blocks]; heapq.heapify(work); queued=[True]*n; seen=[False]*n
+    while work:
+        b=blocks[sign*heapq.heappop(work)]; queued[b.id]=False
+        edges=b.pred if forward else b.succ
+        facts=[after[p.id] for p in edges] if forward else [before[s.id] for s in edges]
+        if (forward and b.id==0) or not edges: facts.append(boundary)
+        x=facts[0]
+        for f in facts[1:]: x=(x&f) if must else (x|f)
+        if forward:
+            before[b.id]=x; y=transfer(b,x)
+            if seen[b.id] and y==after[b.id]: continue
+            after[b.id]=y; nxt=b.succ; seen[b.id]=True
+        else:
+            after[b.id]=x; y=transfer(b,x)
+            if seen[b.id] and y==before[b.id]: continue
+            before[b.id]=y; nxt=b.pred; seen[b.id]=True
+        for s in nxt:
+            if not queued[s.id]: queued[s.id]=True; heapq.heappush(work,sign*s.id)
+    return before,after
+
+DEFS=frozenset((Op.COPY,Op.BIN,Op.CALL,Op.ARG))     # a set test beats chained enum lookups
+PURE=frozenset((Op.COPY,Op.BIN))
+
+def defined(ins):
+    return ins.dst if ins.op in DEFS else None
+
+def pure(ins):
+    # a def that can be dropped or moved when its value is not needed; a
+    # '/' only by a known nonzero constant, else dropping it drops a fault
+    if ins.op is Op.BIN and ins.sym=="/":
+        return isinstance(ins.b,(int,float)) and ins.b!=0
+    return ins.op in PURE
+
+class Names:
+    # fresh labels, temps and variable names for one function
+    def __init__(self,body):
+        self.used=set()
+        for ins in body:
+            if ins.op is Op.LABEL: self.used.add(ins.dst)
+            for x in (ins.dst,ins.a,ins.b):
+                if is_name(x): self.used.add(x)
+        nums=[int(x[1:]) for x in self.used if re.fullmatch(r"L\d+",x)]
+        self.next=max(nums,default=0)+1
+        nums=[int(x[1:]) for x in self.used if is_temp(x)]
+        self.next_temp=max(nums,default=0)+1
+        self.suffix={}      # base -> first suffix var() may still find free
+    def label(self):
+        while f"L{self.next}" in self.used: self.next+=1
+        nm=f"L{self.next}"; self.used.add(nm)
+        return nm
+    def temp(self):
+        while f"T{self.next_temp}" in self.used: self.next_temp+=1
+        nm=f"T{self.next_temp}"; self.used.add(nm)
+        return nm
+    def var(self,base):
+        k=self.suffix.get(base,1)
+        while f"{base}_{k}" in self.used: k+=1
+        nm=f"{base}_{k}"; self.used.add(nm); self.suffix[base]=k+1
+        return nm
+
+def names_in(blocks):
+    names=set()
+    for b in blocks:
+        for ins in b.code:
+            for u in ins.uses():
+                if is_name(u): names.add(u)
+            d=defined(ins)
+            if d is not None: names.add(d)
+    return names
+
+# the analyses below only track the names in `track` (all names by default)
+class ReachingDefs:
+    # defs[k] = (name, instr or None); None marks the value on entry (params etc.)
+    def __init__(self,blocks,track=None):
+        self.defs=[]; self.of={}
+        names=names_in(blocks) if track is None else track
+        for nm in sorted(names): self._add(nm,None)
+        entry=(1<<len(self.defs))-1
+        self.site={}
+        for b in blocks:
+            for ins in b.code:
+                d=defined(ins)
+                if d in names: self.site[id(ins)]=self._add(d,ins)
+        self.masks={}
+        for nm,ks in self.of.items():
+            m=0
+            for k in ks: m|=1<<k
+            self.masks[nm]=m
+        gen=[0]*len(blocks); kill=[0]*len(blocks)
+        for b in blocks:
+            g=0; k=0
+            for ins in b.code:
+                d=defined(ins)
+                if d in self.masks: g=self.step(g,ins); k|=self.masks[d]
+            gen[b.id]=g; kill[b.id]=k
+        self.before,self.after=solve(blocks,lambda b,x:gen[b.id]|(x&~kill[b.id]),boundary=entry)
+
+    def _add(self,name,ins):
+        k=len(self.defs); self.defs.append((name,ins)); self.of.setdefault(name,[]).append(k)
+        return k
+
+    def step(self,x,ins):
+        d=defined(ins)
+        if d not in self.masks: return x
+        return (x&~self.masks[d])|(1<<self.site[id(ins)])
+
+    def reaching(self,x,name):
+        # lazily, lowest index first, so a caller can stop at the first def it rejects
+        x&=self.masks.get(name,0)
+        if not x: return
+        bits=bin(x)[:1:-1]      # bits[k] is bit k
+        k=bits.find("1")
+        while k>=0: yield self.defs[k][1]; k=bits.find("1",k+1)
+
+class Liveness:
+    def __init__(self,blocks,track=None):
+        names=names_in(blocks) if track is None else track
+        self.bit={nm:1<<k for k,nm in enumerate(sorted(names))}
+        use=[0]*len(blocks); kill=[0]*len(blocks)
+        for b in blocks:
+            u=0; k=0
+            for ins in reversed(b.code):
+                u,k=self.step(u,ins),k|self.bit.get(defined(ins),0)
+            use[b.id]=u; kill[b.id]=k
+        self.before,self.after=solve(blocks,lambda b,x:use[b.id]|(x&~kill[b.id]),forward=False)
+
+    def step(self,x,ins):
+        # live-before from live-after for one instruction
+        bit=self.bit
+        d=defined(ins)
+        if d in bit: x&=~bit[d]
+        for u in ins.uses():
+            if u.__class__ is str and u in bit: x|=bit[u]
+        return x
+
+    def live(self,x,name):
+        m=self.bit.get(name)
+        return True if m is None else bool(x&m)
+
+def read_first(body):
+    # names the body reads before writing them (0 on every call)
+    blocks=build_cfg(body)
+    if not blocks: return []
+    lv=Liveness(blocks)
+    return sorted(nm for nm,m in lv.bit.items() if lv.before[0]&m)
+
+class AvailableCopies:
+    # copies[k] = (dst, src) for 'dst = src' with both names
+    def __init__(self,blocks):
+        self.copies=[]; self.touch={}; self.by_dst={}; self.index={}
+        for b in blocks:
+            for ins in b.code:
+                if ins.op is Op.COPY and is_name(ins.a) and ins.a!=ins.dst \
+                        and (ins.dst,ins.a) not in self.index:
+                    k=len(self.copies); self.copies.append((ins.dst,ins.a)); self.index[(ins.dst,ins.a)]=k
+                    self.by_dst[ins.dst]=self.by_dst.get(ins.dst,0)|(1<<k)
+                    for nm in (ins.dst,ins.a): self.touch[nm]=self.touch.get(nm,0)|(1<<k)
+        gen=[0]*len(blocks); kill=[0]*len(blocks)
+        for b in blocks:
+            g=0; k=0
+            for ins in b.code:
+                g=self.step(g,ins); d=defined(ins)
+                if d is not None: k|=self.touch.get(d,0)
+            gen[b.id]=g; kill[b.id]=k
+        full=(1<<len(self.copies))-1
+        self.before,self.after=solve(blocks,lambda b,x:gen[b.id]|(x&~kill[b.id]),
+                                     must=True,top=full)
+
+    def step(self,x,ins):
+        d=defined(ins)
+        if d is None: return x
+        x&=~self.touch.get(d,0)
+        if ins.op is Op.COPY and is_name(ins.a) and ins.a!=d:
+            x|=1<<self.index[(d,ins.a)]
+        return x
+
+    def source(self,x,name):
+        x&=self.by_dst.get(name,0)
+        return self.copies[(x&-x).bit_length()-1][1] if x else None
@@ -0,0 +1,63 @@
+# client.py
+# ------------------------------------------
+# Thin client for the compile server: sends
+# one request over the Unix socket and prints
+# the reports. Imports nothing from the
+# compiler, so it starts in a few milliseconds.
+# ------------------------------------------
+
+import os
+import sys
+import json
+import socket
+import tempfile
+
+def default_socket():
+    return os.path.join(tempfile.gettempdir(), f"minicc-{os.getuid()}.sock")
+
+def request(msg, path=None, timeout=None):
+    # one JSON line out, one JSON line back
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(path or default_socket())
+        s.sendall(json.dumps(msg).encode("utf-8") + b"\n")
+        buf = bytearray()
+        while not buf.endswith(b"\n"):
+            chunk = s.recv(1 << 16)
+            if not chunk: break
+            buf += chunk
+    if not buf: raise ConnectionError("server closed the connection")
+    return json.loads(buf)
+
+def compile_file(path, stages=("asm",), sock=None):
+    return request({"path": os.path.abspath(path), "stages": list(stages)}, sock)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(usage="python client.py sample.src [--emit STAGES] [-o FILE] | --stats | --shutdown")
+    ap.add_argument("src", nargs="?")
+    ap.add_argument("--emit", default="asm", metavar="STAGES", help="comma list: tokens,ast,symbols,tac,opt,asm (default: asm)")
+    ap.add_argument("-o", dest="output", metavar="FILE", help="write reports to FILE instead of stdout")
+    ap.add_argument("--socket", help="server socket (default: minicc-<uid>.sock in the temp dir)")
+    ap.add_argument("--stats", action="store_true", help="print the server's latency metrics")
+    ap.add_argument("--shutdown", action="store_true", help="stop the server")
+    args = ap.parse_args()
+
+    try:
+        if args.stats or args.shutdown:
+            r = request({"op": "stats" if args.stats else "shutdown"}, args.socket)
+            print(json.dumps(r, indent=2))
+            sys.exit()
+        if not args.src: ap.error("a source file is required")
+        r = compile_file(args.src, [x.strip() for x in args.emit.split(",")], args.socket)
+    except OSError as e:
+        print(f"cannot reach compile server: {e}", file=sys.stderr)
+        sys.exit(2)
+    if not r.get("ok"):
+        print(r.get("error", "compile failed"), file=sys.stderr)
+        sys.exit(1)
+    text = "".join(r["reports"][s] for s in r["stages"])
+    if args.output and args.output != "-":
+        with open(args.output, "w", encoding="utf-8") as f: f.write(text)
+    else:
+        sys.stdout.write(text)
@@ -4,67 +4,281 @@
 # ------------------------------------------
 
 from parser import *
-from itertools import count
+from itertools import count, chain
+from tac import Op, Instr, Lit
+from cfg import read_first
+
+INT_OPS=("PLUS","MINUS","TIMES","EQEQ","NE","LT","GT","LE","GE")
+
+def scan(f):
+    # -> (returns, assignments, calls, names) anywhere in f, without recursion
+    rets=[]; assigns=[]; calls=[]; names=set(f.params); exprs=[]
+    stack=[iter(f.body.stmts)]
+    while stack:
+        s=next(stack[-1],None)
+        if s is None: stack.pop(); continue
+        if isinstance(s,ReturnStmt): rets.append(s)
+        elif isinstance(s,VarAssign): assigns.append(s); names.add(s.name)
+        elif isinstance(s,IfStmt):
+            exprs.append(s.cond)
+            if s.elseb: stack.append(iter(s.elseb.stmts))
+            stack.append(iter(s.thenb.stmts))
+        elif isinstance(s,WhileStmt): exprs.append(s.cond); stack.append(iter(s.body.stmts))
+        elif isinstance(s,Block): stack.append(iter(s.stmts))
+        if isinstance(s,(ReturnStmt,VarAssign,PrintStmt,ExprStmt)): exprs.append(s.expr)
+    while exprs:
+        e=exprs.pop()
+        if isinstance(e,BinOp): exprs.append(e.left); exprs.append(e.right)
+        elif isinstance(e,FuncCall): calls.append(e); exprs.extend(e.args)
+        elif isinstance(e,VarRef): names.add(e.name)
+    return rets,assigns,calls,names
+
+def expr_deps(e,deps):
+    # the params e is an int for as long as they are, or None when e may
+    # be something else: int literals, names (a name never assigned reads
+    # 0), and + - * and comparisons of those
+    out=set(); stack=[e]
+    while stack:
+        x=stack.pop()
+        if isinstance(x,BinOp):
+            if x.op not in INT_OPS: return None
+            stack.append(x.left); stack.append(x.right)
+        elif isinstance(x,Number):
+            if x.val.__class__ is not int: return None
+        elif isinstance(x,VarRef):
+            d=deps.get(x.name,())
+            if d is None: return None
+            out|=d
+        else:
+            return None
+    return out
+
+def int_deps(f,found=None):
+    # -> (deps, calls): expr_deps for every name f assigns or takes as a
+    # param, and (callee, k, deps) for the k-th argument of each call f makes
+    rets,assigns,calls,_=found or scan(f)
+    deps={p:{p} for p in f.params}
+    for s in assigns: deps.setdefault(s.name,set())
+    changed=True
+    while changed:
+        changed=False
+        for s in assigns:
+            cur=deps[s.name]
+            if cur is None: continue
+            d=expr_deps(s.expr,deps)
+            if d is None or not d<=cur: deps[s.name]=None if d is None else cur|d; changed=True
+    return deps,[(c.name,k,expr_deps(a,deps)) for c in calls for k,a in enumerate(c.args)]
+
+def int_params(funcs,entries=()):
+    # funcs: [(name, params, calls)] in program order, calls as int_deps
+    # gives them -> {name: params every call passes an int}. A call goes to
+    # the last definition of a name; `main` is entered with no arguments
+    # (0s), functions in `entries` from outside with any
+    last={name:k for k,(name,_,_) in enumerate(funcs)}
+    ints={name:set() if name in entries else set(funcs[k][1]) for name,k in last.items()}
+    changed=True
+    while changed:
+        changed=False
+        for k,(name,_,calls) in enumerate(funcs):
+            mine=ints[name] if last[name]==k else set()
+            for callee,i,d in calls:
+                ps=funcs[last[callee]][1] if callee in last else ()
+                if i<len(ps) and ps[i] in ints[callee] and (d is None or not d<=mine):
+                    ints[callee].discard(ps[i]); changed=True
+    return {name:frozenset(ps) for name,ps in ints.items()}
+
+def shape(e,name):
+    # how `return e` in function `name` can become a jump: (call, None) for
+    # a self call, (call, E, op, E on the left) for E + / * a self call
+    calls=lambda x: isinstance(x,FuncCall) and x.name==name
+    if calls(e): return e,None,None,None
+    if isinstance(e,BinOp) and e.op in ("PLUS","TIMES") and calls(e.left)!=calls(e.right):
+        return (e.right,e.left,e.op,True) if calls(e.right) else (e.left,e.right,e.op,False)
+    return None
+
+class TailPlan:
+    # self calls in return position of one function: `return f(..)` and,
+    # with an accumulator, `return E op f(..)` / `return f(..) op E` become
+    # parameter copies and a jump back to the entry label
+    __slots__=("name","params","entry","acc","tok","op","left")
+    def __init__(self,name,params,acc=None,tok=None,left=True):
+        self.name=name; self.params=params; self.entry=None
+        self.acc=acc; self.tok=tok; self.op=TACGen.opmap.get(tok); self.left=left
+
+    def match(self,e):
+        # -> (call, E) when `return e` is a jump (E None: nothing to fold)
+        m=shape(e,self.name)
+        if m is None: return None
+        call,x,tok,left=m
+        if tok is None: return call,None
+        return (call,x) if self.acc and tok==self.tok and left==self.left else None
+
+def tail_plan(f,ints=frozenset()):
+    # -> TailPlan or None. The accumulator form needs + or * on one side
+    # throughout, and E and every other return to be ints whatever the
+    # params in `ints` (those every call passes an int) hold, so
+    # regrouping the operations cannot change the result
+    found=scan(f); rets=found[0]
+    shapes=[shape(s.expr,f.name) for s in rets]
+    if not any(shapes): return None
+    acc=set((m[2],m[3]) for m in shapes if m and m[2])
+    if len(acc)==1:
+        deps,_=int_deps(f,found)
+        isint=lambda e: (lambda d: d is not None and d<=ints)(expr_deps(e,deps))
+        if all(isint(m[1]) if m else isint(s.expr) for s,m in zip(rets,shapes) if not m or m[2]):
+            tok,left=acc.pop(); names=found[3]
+            name="acc"; n=0
+            while name in names: n+=1; name=f"acc_{n}"
+            return TailPlan(f.name,f.params,name,tok,left)
+    return TailPlan(f.name,f.params) if any(m and not m[2] for m in shapes) else None
 
 class TACGen:
-    def __init__(self):
+    def __init__(self,entries=()):
+        # `entries`: functions also run from outside with arguments of any
+        # type (vector.py columns), so their params are not taken as ints
+        self.entries=frozenset(entries)
         self.code=[]
         self.temp=count(1)
         self.label=count(1)
+        self.tail=None
+        self.stats={}       # tail_calls / accumulated: returns compiled as jumps
 
     def newt(self): return f"T{next(self.temp)}"
     def newl(self): return f"L{next(self.label)}"
-    def emit(self,line): self.code.append(line)
+    def emit(self,op,dst=None,a=None,sym=None,b=None): self.code.append(Instr(op,dst,a,sym,b))
 
     def gen(self,tree):
-        for f in tree.funcs:
-            self.emit(f"label {f.name}")
-            for s in f.body.stmts: self.stmt(s)
+        funcs=tree.funcs; last={f.name:k for k,f in enumerate(funcs)}
+        ints=int_params([(f.name,f.params,int_deps(f)[1]) for f in funcs],self.entries)
+        for k,f in enumerate(funcs): self.gen_func(f,last[f.name]==k,ints[f.name])
         return self.code
 
-    def stmt(self,s):
-        if isinstance(s,VarAssign):
-            t=self.expr(s.expr)
-            self.emit(f"{s.name} = {t}")
-        elif isinstance(s,PrintStmt):
-            t=self.expr(s.expr)
-            self.emit(f"PRINT {t}")
-        elif isinstance(s,IfStmt):
-            cond=self.expr(s.cond)
-            L1=self.newl(); L2=self.newl()
-            self.emit(f"IF {cond} GOTO {L1}")
-            for st in s.thenb.stmts: self.stmt(st)
-            self.emit(f"GOTO {L2}")
-            self.emit(f"{L1}:")
-            if s.elseb:
-                for st in s.elseb.stmts: self.stmt(st)
-            self.emit(f"{L2}:")
-        elif isinstance(s,WhileStmt):
-            L1=self.newl(); L2=self.newl()
-            self.emit(f"{L1}:")
-            cond=self.expr(s.cond)
-            self.emit(f"IFZ {cond} GOTO {L2}")
-            for st in s.body.stmts: self.stmt(st)
-            self.emit(f"GOTO {L1}")
-            self.emit(f"{L2}:")
-        elif isinstance(s,ReturnStmt):
-            t=self.expr(s.expr)
-            self.emit(f"RETURN {t}")
+    def gen_func(self,f,own=True,ints=frozenset()):
+        # temps and labels are numbered per function, so a function's
+        # code does not depend on the functions before it. `own`: calls
+        # to f's name reach this definition (it is the last one); `ints`:
+        # the params every call passes an int (int_params)
+        start=len(self.code)
+        self.temp=count(1); self.label=count(1)
+        self.emit(Op.FUNC,f.name)
+        for k,p in enumerate(f.params): self.emit(Op.ARG,p,k)
+        self.tail=t=tail_plan(f,ints) if own else None
+        if t:
+            if t.acc: self.emit(Op.COPY,t.acc,0 if t.op=="+" else 1)
+            t.entry=self.newl(); at=len(self.code)
+            self.emit(Op.LABEL,t.entry)
+        self.stmts(f.body.stmts)
+        if t:
+            if t.acc: self.ret(0)      # ran off the end
+            # a jump back must see what a new call would: names read
+            # before they are written start out as 0 again
+            keep=set(t.params)|{t.acc}
+            self.code[at+1:at+1]=[Instr(Op.COPY,v,0) for v in read_first(self.code[at:]) if v not in keep]
+            self.tail=None
+        return self.code[start:]
 
-    def expr(self,e):
-        if isinstance(e,Number): t=self.newt(); self.emit(f"{t} = {e.val}"); return t
-        if isinstance(e,String): t=self.newt(); self.emit(f'{t} = "{e.val}"'); return t
-        if isinstance(e,Char): t=self.newt(); self.emit(f"{t} = '{e.val}'"); return t
+    def ret(self,x):
+        t=self.tail
+        if t and t.acc:
+            r=self.newt()
+            self.emit(Op.BIN,r,t.acc,t.op,x) if t.left else self.emit(Op.BIN,r,x,t.op,t.acc)
+            x=r
+        self.emit(Op.RETURN,a=x)
+
+    def tail_call(self,call,e):
+        # arguments (and E) are evaluated in source order before any
+        # parameter changes; parameters read as arguments are saved first
+        t=self.tail
+        if e is not None and t.left: self.fold(e)
+        vals=[self.expr(a) for a in call.args]
+        if e is not None and not t.left: self.fold(e)
+        ps=set(t.params)
+        for k,v in enumerate(vals):
+            if v in ps and (k>=len(t.params) or v!=t.params[k]):
+                c=self.newt(); self.emit(Op.COPY,c,v); vals[k]=c
+        for k,p in enumerate(t.params):
+            v=vals[k] if k<len(vals) else 0
+            if v!=p: self.emit(Op.COPY,p,v)
+        self.emit(Op.GOTO,t.entry)
+        key="accumulated" if e is not None else "tail_calls"
+        self.stats[key]=self.stats.get(key,0)+1
+
+    def fold(self,e):
+        t=self.tail; x=self.expr(e)
+        self.emit(Op.BIN,t.acc,t.acc,t.op,x) if t.left else self.emit(Op.BIN,t.acc,x,t.op,t.acc)
+
+    def stmt(self,s): self.stmts((s,))
+
+    def stmts(self,body):
+        # Work items are statements or ready instructions; nested bodies
+        # are pushed as iterators so deep nesting needs no recursion.
+        stack=[iter(body)]
+        while stack:
+            s=next(stack[-1],None)
+            if s is None: stack.pop(); continue
+            if isinstance(s,Instr):
+                self.code.append(s)
+            elif isinstance(s,VarAssign):
+                t=self.expr(s.expr)
+                self.emit(Op.COPY,s.name,t)
+            elif isinstance(s,PrintStmt):
+                t=self.expr(s.expr)
+                self.emit(Op.PRINT,a=t)
+            elif isinstance(s,IfStmt):
+                cond=self.expr(s.cond)
+                L1=self.newl(); L2=self.newl()
+                self.emit(Op.IFZ,L1,cond)
+                stack.append(chain(s.thenb.stmts,(Instr(Op.GOTO,L2),Instr(Op.LABEL,L1)),
+                                   s.elseb.stmts if s.elseb else (),(Instr(Op.LABEL,L2),)))
+            elif isinstance(s,WhileStmt):
+                L1=self.newl(); L2=self.newl()
+                self.emit(Op.LABEL,L1)
+                cond=self.expr(s.cond)
+                self.emit(Op.IFZ,L2,cond)
+                stack.append(chain(s.body.stmts,(Instr(Op.GOTO,L1),Instr(Op.LABEL,L2))))
+            elif isinstance(s,ReturnStmt):
+                j=self.tail.match(s.expr) if self.tail else None
+                if j: self.tail_call(*j)
+                else: self.ret(self.expr(s.expr))
+            elif isinstance(s,ExprStmt):
+                self.expr(s.expr)
+
+    opmap={"PLUS":"+","MINUS":"-","TIMES":"*","DIVIDE":"/","EQEQ":"==","NE":"!=",
+           "LT":"<","GT":">","LE":"<=","GE":">="}
+    def leaf(self,e):
+        if isinstance(e,Number): t=self.newt(); self.emit(Op.COPY,t,e.val); return t
+        if isinstance(e,String): t=self.newt(); self.emit(Op.COPY,t,Lit(e.val,'"')); return t
+        if isinstance(e,Char): t=self.newt(); self.emit(Op.COPY,t,Lit(e.val,"'")); return t
         if isinstance(e,VarRef): return e.name
-        if isinstance(e,BinOp):
-            a=self.expr(e.left); b=self.expr(e.right)
-            t=self.newt()
-            opmap={"PLUS":"+","MINUS":"-","TIMES":"*","DIVIDE":"/","EQEQ":"==","NE":"!=",
-                   "LT":"<","GT":">","LE":"<=","GE":">="}
-            op=opmap.get(e.op,"?")
-            self.emit(f"{t} = {a} {op} {b}")
-            return t
-        return "0"
+        return 0
+
+    def expr(self,e):
+        # post-order over BinOps and calls with an explicit stack; operands
+        # are numbered left to right exactly as the recursive walk did.
+        # A call's arguments are all evaluated before its PARAMs, so the
+        # PARAMs sit right before their CALL.
+        if not isinstance(e,(BinOp,FuncCall)): return self.leaf(e)
+        vals=[]; stack=[(e,False)]
+        while stack:
+            n,done=stack.pop()
+            if done and isinstance(n,FuncCall):
+                k=len(n.args); args=vals[len(vals)-k:]; del vals[len(vals)-k:]
+                for a in args: self.emit(Op.PARAM,a=a)
+                t=self.newt()
+                self.emit(Op.CALL,t,k,n.name)
+                vals.append(t)
+            elif done:
+                b=vals.pop(); a=vals.pop()
+                t=self.newt()
+                self.emit(Op.BIN,t,a,self.opmap.get(n.op,"?"),b)
+                vals.append(t)
+            elif isinstance(n,BinOp):
+                stack.append((n,True)); stack.append((n.right,False)); stack.append((n.left,False))
+            elif isinstance(n,FuncCall):
+                stack.append((n,True)); stack.extend((a,False) for a in reversed(n.args))
+            else:
+                vals.append(self.leaf(n))
+        return vals[0]
 
 if __name__ == "__main__":
     import sys
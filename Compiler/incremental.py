@@ -0,0 +1,192 @@
+# incremental.py
+# ------------------------------------------
+# Per-function incremental recompilation:
+# functions are cut out of the token stream
+# and hashed by token span; only changed ones,
+# plus the callers that depend on them through
+# FuncCall (callees may be inlined), go through
+# analysis, codegen, optimization and asm
+# generation again
+# ------------------------------------------
+
+import os
+import sys
+import pickle
+import hashlib
+from collections import defaultdict
+from lexical import tokenize
+from parser import Parser, Node, FuncCall
+from semantic import SymbolTable, analyze_func
+from codegen import TACGen, int_deps, int_params
+from optimizer import optimize_body
+from inline import CallGraph, inline_calls
+from asmgen import tac_to_asm
+from regalloc import REGS
+from cache import compiler_version
+from tac import Op, Instr
+
+class Unit:
+    # compiled artifacts of one function; `plan` is what its inlining
+    # decisions saw of the rest of the program, `tail` what its tail calls
+    # did (last definition?, params every call passes an int) and `sums`
+    # (params, int_deps calls) its part in working the latter out
+    __slots__=("name","hash","calls","scope","tac","opt","asm","plan","tail","sums")
+    def __init__(self,name,hash,calls=(),scope=None,tac=(),opt=(),asm=(),plan=None,tail=None,sums=((),())):
+        self.name=name; self.hash=hash; self.calls=calls; self.scope=scope
+        self.tac=tac; self.opt=opt; self.asm=asm; self.plan=plan; self.tail=tail; self.sums=sums
+
+def split_spans(toks):
+    # [(name, start, end)] of each top-level 'func ... { ... }'
+    spans=[]; i=0; n=len(toks)
+    while i<n:
+        if toks[i].type!="FUNC" or i+1>=n or toks[i+1].type!="ID": return None
+        j=i+2; depth=0
+        while j<n:
+            t=toks[j].type; j+=1
+            if t=="LBRACE": depth+=1
+            elif t=="RBRACE":
+                depth-=1
+                if depth==0: break
+        if depth!=0: return None
+        spans.append((toks[i+1].value,i,j)); i=j
+    return spans
+
+def span_hash(toks):
+    # positions are left out, so moving a function does not change it
+    return hashlib.sha256(repr([t[:2] for t in toks]).encode("utf-8")).hexdigest()
+
+def parse_func(toks):
+    p=Parser(toks); f=p.func()
+    if p.peek() is not None: raise SyntaxError(f"Unexpected {p.peek().type}")
+    return f
+
+def callees(f):
+    # names called anywhere in the function, without recursion
+    names=set(); stack=[f]
+    while stack:
+        x=stack.pop()
+        if isinstance(x,Node):
+            if isinstance(x,FuncCall): names.add(x.name)
+            stack.extend(vars(x).values())
+        elif isinstance(x,list):
+            stack.extend(x)
+    return frozenset(names)
+
+class Build:
+    def __init__(self,path=None,regs=REGS,peephole=True,unroll=0):
+        self.path=path; self.opts=(regs,peephole,unroll); self.units={}
+        self.changed=[]; self.dependent=[]; self.reused=0
+        if path and os.path.exists(path):
+            try:
+                with open(path,"rb") as f: state=pickle.load(f)
+                if state.get("version")==compiler_version() and state.get("opts")==self.opts:
+                    self.units=state["units"]
+            except (OSError,EOFError,pickle.UnpicklingError,AttributeError,KeyError):
+                self.units={}
+
+    def save(self):
+        if not self.path: return
+        d=os.path.dirname(self.path)
+        if d: os.makedirs(d,exist_ok=True)
+        tmp=f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp,"wb") as f:
+            pickle.dump({"version":compiler_version(),"opts":self.opts,"units":self.units},
+                        f,pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp,self.path)
+
+    def compile(self,src):
+        # -> {"symbols", "tac", "opt", "asm"} for the whole program
+        toks=list(tokenize(src))
+        spans=split_spans(toks)
+        if spans is None:
+            Parser(toks).parse()    # raises the real syntax error
+            raise SyntaxError("malformed function list")
+
+        # units are keyed by (name, occurrence) so duplicates stay apart
+        seen=defaultdict(int); order=[]; trees={}; units={}
+        for name,i,j in spans:
+            key=(name,seen[name]); seen[name]+=1; order.append((key,i,j))
+            h=span_hash(toks[i:j])
+            old=self.units.get(key)
+            if old is not None and old.hash==h:
+                units[key]=old
+            else:
+                f=trees[key]=parse_func(toks[i:j])
+                units[key]=Unit(name,h,callees(f),sums=(f.params,int_deps(f)[1]))
+        changed=set(trees)
+
+        # callers of a changed, added or removed function are rebuilt too,
+        # transitively up the reverse call graph
+        callers=defaultdict(list)
+        for key,u in units.items():
+            for c in u.calls: callers[c].append(key)
+        touched=[k[0] for k in changed]+[k[0] for k in self.units if k not in units]
+        dirty=set(changed)
+        while touched:
+            for key in callers.get(touched.pop(),()):
+                if key not in dirty: dirty.add(key); touched.append(key[0])
+
+        # a function's tail calls also depend on the whole program: which
+        # definition is last, and what every call passes its params
+        ints=int_params([(key[0],)+units[key].sums for key,_,_ in order])
+        tails={}
+        for key,_,_ in order:
+            own=key[1]==seen[key[0]]-1
+            tails[key]=(own,ints[key[0]] if own else None)
+            if units[key].tail!=tails[key]: dirty.add(key)
+
+        tab=SymbolTable()
+        for key,_,_ in order: tab.declare(key[0],"func")
+        for key,i,j in order:
+            if key not in dirty: tab.funcs[key[0]]=units[key].scope; continue
+            f=trees.get(key) or parse_func(toks[i:j])
+            own,fi=units[key].tail=tails[key]
+            units[key].scope=analyze_func(f,tab)
+            units[key].tac=TACGen().gen_func(f,own,fi or frozenset())
+
+        # optimization goes callees first, as in optimize(); a unit is also
+        # redone when a callee was (it may have been inlined) or when the
+        # call counts its inlining decisions used have changed
+        keys=[key for key,_,_ in order]
+        graph=CallGraph([(key[0],units[key].tac[1:]) for key in keys])
+        regs,peep,unroll=self.opts
+        bodies={}; redone=set()
+        self.changed=[]; self.dependent=[]; self.reused=0
+        for n in graph.order():
+            key=keys[n]; u=units[key]; plan=graph.plan(n)
+            if key in dirty or u.plan!=plan or any(c in redone for c in graph.calls[n]):
+                body=inline_calls(u.tac[1:],bodies,graph)
+                u.opt=[Instr(Op.FUNC,u.name)]+optimize_body(body,unroll=unroll)
+                u.asm=tac_to_asm(u.opt,regs,None,peep); u.plan=plan
+                redone.add(n)
+                (self.changed if key in changed else self.dependent).append(u.name)
+            else:
+                self.reused+=1
+            if graph.index.get(u.name)==n: bodies[u.name]=u.opt[1:]
+        self.units=units
+
+        out={"symbols":tab,"tac":[],"opt":[],"asm":[]}
+        for key,_,_ in order:
+            u=units[key]
+            out["tac"].extend(u.tac); out["opt"].extend(u.opt); out["asm"].extend(u.asm)
+        return out
+
+    def report(self):
+        total=len(self.units)
+        return (f"incremental: {len(self.changed)+len(self.dependent)}/{total} functions rebuilt "
+                f"({len(self.changed)} changed, {len(self.dependent)} dependent callers), {self.reused} reused")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python incremental.py sample.src [state_file]")
+        sys.exit()
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        src = f.read()
+    b = Build(sys.argv[2] if len(sys.argv) > 2 else None)
+    res = b.compile(src)
+    b.save()
+    print("===== ASSEMBLY CODE =====")
+    for line in res["asm"]:
+        print(line)
+    print("=========================\n")
+    print(b.report())
@@ -0,0 +1,179 @@
+# inline.py
+# ------------------------------------------
+# Call graph over a program's functions and
+# a cost-model inliner: callees that are not
+# recursive are copied into their callers
+# when they are small, or big but called from
+# one place, within a per-caller size budget
+# ------------------------------------------
+
+from tac import Op, Instr, is_name, is_temp
+from cfg import defined, read_first, Names
+
+SMALL = 16      # callees up to this size inline at every call site
+ONCE = 200      # a callee with a single call site inlines up to this size
+GROWTH = 400    # instructions inlining may add to one caller
+
+def size(body):
+    return sum(1 for ins in body if ins.op is not Op.LABEL)
+
+class CallGraph:
+    # nodes are indexes into `funcs` ([(name, body)]); a call to a name
+    # goes to its last definition, as in the VM
+    def __init__(self, funcs):
+        self.names = [name for name, _ in funcs]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.sites = {}     # callee name -> call sites in the whole program
+        self.calls = []     # per function: callee indexes
+        for name, body in funcs:
+            out = []
+            for ins in body:
+                if ins.op is Op.CALL:
+                    self.sites[ins.sym] = self.sites.get(ins.sym, 0) + 1
+                    if ins.sym in self.index: out.append(self.index[ins.sym])
+            self.calls.append(out)
+        self.sccs = self._sccs()
+        self.recursive = set()
+        for comp in self.sccs:
+            if len(comp) > 1 or comp[0] in self.calls[comp[0]]:
+                self.recursive.update(self.names[i] for i in comp)
+
+    def _sccs(self):
+        # Tarjan without recursion; components come out callees first
+        n = len(self.names); low = [0] * n; num = [0] * n; on = [False] * n
+        stack = []; out = []; k = 0
+        for root in range(n):
+            if num[root]: continue
+            k += 1; num[root] = low[root] = k; stack.append(root); on[root] = True
+            work = [(root, iter(self.calls[root]))]
+            while work:
+                v, it = work[-1]
+                for w in it:
+                    if not num[w]:
+                        k += 1; num[w] = low[w] = k; stack.append(w); on[w] = True
+                        work.append((w, iter(self.calls[w]))); break
+                    if on[w]: low[v] = min(low[v], num[w])
+                else:
+                    work.pop()
+                    if work: low[work[-1][0]] = min(low[work[-1][0]], low[v])
+                    if low[v] == num[v]:
+                        comp = []
+                        while True:
+                            w = stack.pop(); on[w] = False; comp.append(w)
+                            if w == v: break
+                        out.append(comp)
+        return out
+
+    def order(self):
+        # function indexes, callees before their callers
+        return [i for comp in self.sccs for i in sorted(comp)]
+
+    def plan(self, i):
+        # what the inlining decisions in function i depend on beyond the
+        # bodies it calls: how often each callee is called program-wide
+        return tuple(sorted({(self.names[c], self.sites.get(self.names[c], 0)) for c in self.calls[i]}))
+
+def worth(name, body, graph, budget):
+    if name in graph.recursive: return False
+    n = size(body)
+    if n > budget: return False
+    return n <= SMALL or (n <= ONCE and graph.sites.get(name) == 1)
+
+def expand(body, args, dst, names, zero):
+    # the callee body with fresh names: arguments and names it reads
+    # before writing are set up first, RETURN becomes a copy to dst and
+    # a jump past the end. dst is a temp, which has one def, so with
+    # several ways out the value goes through a variable first
+    rets = sum(1 for ins in body if ins.op is Op.RETURN)
+    if rets > 1 or (rets and body[-1].op is not Op.RETURN):
+        res, dst = dst, names.var("ret")
+    else:
+        res = None
+    # temps of an optimized body may have several defs (coalescing), and
+    # those become variables: the caller's local_pass takes a temp's
+    # one def for its value
+    ndef = {v: 1 for v in zero}
+    for ins in body:
+        d = defined(ins)
+        if d is not None: ndef[d] = ndef.get(d, 0) + 1
+    ren = {}
+    def f(x):
+        if not is_name(x): return x
+        r = ren.get(x)
+        if r is None: r = ren[x] = names.temp() if is_temp(x) and ndef.get(x, 0) <= 1 else names.var(x)
+        return r
+    labels = {ins.dst: names.label() for ins in body if ins.op is Op.LABEL}
+    end = None
+    out = [Instr(Op.COPY, f(v), 0) for v in zero]
+    for k, ins in enumerate(body):
+        op = ins.op
+        if op is Op.ARG:
+            out.append(Instr(Op.COPY, f(ins.dst), args[ins.a] if ins.a < len(args) else 0))
+        elif op is Op.RETURN:
+            out.append(Instr(Op.COPY, dst, f(ins.a)))
+            if k + 1 < len(body):
+                end = end or names.label()
+                out.append(Instr(Op.GOTO, end))
+        elif op in (Op.LABEL, Op.GOTO, Op.IF, Op.IFZ):
+            out.append(Instr(op, labels[ins.dst], f(ins.a)))
+        else:
+            out.append(Instr(op, f(ins.dst) if defined(ins) is not None else ins.dst, f(ins.a), ins.sym, f(ins.b)))
+    if not body or body[-1].op not in (Op.RETURN, Op.GOTO):
+        out.append(Instr(Op.COPY, dst, 0))      # ran off the end
+    if end: out.append(Instr(Op.LABEL, end))
+    if res: out.append(Instr(Op.COPY, res, dst))
+    return out
+
+def inline_calls(body, bodies, graph, st=None):
+    # `bodies` maps callee names to their (already optimized) bodies
+    if st is None: st = {}
+    if not any(ins.op is Op.CALL and ins.sym in bodies for ins in body): return body
+    names = Names(body); budget = GROWTH; zero = {}
+    out = []; params = []
+    for ins in body:
+        if ins.op is Op.PARAM: params.append(ins); continue
+        if ins.op is Op.CALL:
+            k = len(params) - ins.a
+            out.extend(params[:k]); args = params[k:]; params = []
+            callee = bodies.get(ins.sym)
+            if callee is not None and worth(ins.sym, callee, graph, budget):
+                if ins.sym not in zero: zero[ins.sym] = read_first(callee)
+                budget -= size(callee)
+                out.extend(expand(callee, [p.a for p in args], ins.dst, names, zero[ins.sym]))
+                st["inlined"] = st.get("inlined", 0) + 1
+                continue
+            out.extend(args)
+        elif params:
+            out.extend(params); params = []
+        out.append(ins)
+    out.extend(params)
+    return out
+
+if __name__ == "__main__":
+    import sys
+    from lexical import tokenize
+    from parser import Parser
+    from codegen import TACGen
+    from cfg import split_funcs
+    from optimizer import optimize
+
+    if len(sys.argv) < 2:
+        print("Usage: python inline.py sample.src")
+        sys.exit()
+
+    src = open(sys.argv[1]).read()
+    gen = TACGen()
+    tac = gen.gen(Parser(list(tokenize(src))).parse())
+    funcs = split_funcs(tac)
+    graph = CallGraph(funcs)
+    st = {}
+    opt = optimize(tac, stats=st)
+    print("===== CALL GRAPH =====")
+    for i, (name, body) in enumerate(funcs):
+        calls = ", ".join(dict.fromkeys(graph.names[c] for c in graph.calls[i])) or "-"
+        flag = " (recursive)" if name in graph.recursive else ""
+        print(f"{name}: size {size(body)}, called from {graph.sites.get(name, 0)} site(s){flag} -> {calls}")
+    print(f"inlined: {st.get('inlined', 0)} call(s); calls left: {sum(1 for ins in opt if ins.op is Op.CALL)}")
+    print(f"self tail calls made jumps: {gen.stats.get('tail_calls', 0)}, "
+          f"with an accumulator: {gen.stats.get('accumulated', 0)}")
+    print("======================\n")
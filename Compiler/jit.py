@@ -0,0 +1,274 @@
+# jit.py
+# ------------------------------------------
+# Compiles optimized TAC to Python functions
+# if/while are recovered from the label patterns
+# TACGen emits; anything else falls back to a
+# block dispatch loop. Code objects are cached
+# per function body.
+# ------------------------------------------
+
+import sys
+from tac import Op, Lit, is_name
+from cfg import split_funcs
+from vm import CALL_DEPTH
+
+PYOPS={"+":"+","-":"-","*":"*","/":"/","==":"==","!=":"!=","<":"<",">":">","<=":"<=",">=":">="}
+CMPS=("==","!=","<",">","<=",">=")
+
+_cache={}       # function TAC text -> code object
+stats={"hits":0,"misses":0}
+MAX_DEPTH=19
+
+class Unstructured(Exception): pass
+
+def ident(x):
+    return "v_"+x
+
+def operand(x):
+    if is_name(x): return ident(x)
+    if isinstance(x,Lit): return repr(x.val)
+    return repr(x)
+
+class PyGen:
+    def __init__(self,name,body):
+        self.name=name
+        self.code=[ins for ins in body]
+        self.at={ins.dst:i for i,ins in enumerate(self.code) if ins.op is Op.LABEL}
+        self.uses={}
+        for ins in self.code:
+            for u in ins.uses():
+                if is_name(u): self.uses[u]=self.uses.get(u,0)+1
+        self.lines=[]
+        self.params=[]      # operands of the PARAMs before the next CALL
+
+    def out(self,depth,text): self.lines.append("    "*depth+text)
+
+    def source(self):
+        # def v_f(_w, _F, _a): _w writes output, _F maps names to compiled
+        # functions, _a holds this call's arguments
+        names=set()
+        for ins in self.code:
+            for u in ins.uses():
+                if is_name(u): names.add(u)
+            if ins.op in (Op.COPY,Op.BIN,Op.CALL,Op.ARG): names.add(ins.dst)
+        head=[f"def {ident(self.name)}(_w,_F,_a):"]
+        if names: head.append("    "+" = ".join(ident(n) for n in sorted(names))+" = 0")
+        try:
+            self.lines=[]; self.seq(0,len(self.code),1,None)
+        except Unstructured:
+            self.lines=[]; self.dispatch()
+        self.out(1,"return 0")
+        return "\n".join(head+self.lines)+"\n"
+
+    # ---- straight-line instructions ----
+    def simple(self,ins,depth):
+        op=ins.op
+        if op is Op.COPY: self.out(depth,f"{ident(ins.dst)} = {operand(ins.a)}")
+        elif op is Op.BIN: self.out(depth,f"{ident(ins.dst)} = {self.binexpr(ins)}")
+        elif op is Op.PRINT: self.out(depth,f'_w(f"{{{operand(ins.a)}}}\\n")')
+        elif op is Op.RETURN: self.out(depth,f"return {operand(ins.a)}")
+        elif op is Op.PARAM: self.params.append(operand(ins.a))
+        elif op is Op.CALL:
+            args="".join(f"{x}," for x in self.params[len(self.params)-ins.a:])
+            del self.params[len(self.params)-ins.a:]
+            self.out(depth,f"{ident(ins.dst)} = _F[{ins.sym!r}](_w,_F,({args}))")
+        elif op is Op.ARG: self.out(depth,f"{ident(ins.dst)} = _a[{ins.a}] if len(_a)>{ins.a} else 0")
+        else: return False
+        return True
+
+    def binexpr(self,ins,flag=False):
+        e=f"{operand(ins.a)} {PYOPS[ins.sym]} {operand(ins.b)}"
+        # comparisons yield 1/0 like the VM, unless only used as a branch flag
+        if ins.sym in CMPS and not flag: return f"(1 if {e} else 0)"
+        return e
+
+    def cond(self,i,ins,negate):
+        # fuse 'T = a < b; IFZ T' into one test when T has no other use
+        prev=self.code[i-1] if i>0 else None
+        if prev is not None and prev.op is Op.BIN and prev.dst==ins.a and self.uses.get(ins.a)==1 \
+                and self.lines and self.lines[-1].lstrip()==f"{ident(prev.dst)} = {self.binexpr(prev)}":
+            self.lines.pop()
+            e=self.binexpr(prev,True)
+        else:
+            e=operand(ins.a)
+        return f"not ({e})" if negate else e
+
+    # ---- structured recovery ----
+    def loop_end(self,i,j,label):
+        for k in range(j-1,i,-1):
+            ins=self.code[k]
+            if ins.op is Op.GOTO and ins.dst==label: return k
+        return None
+
+    def find(self,label,i,j):
+        p=self.at.get(label)
+        return p if p is not None and i<=p<j else None
+
+    def next_label(self,i,j,label):
+        # True when only labels sit between i and the label `label`
+        while i<j and self.code[i].op is Op.LABEL:
+            if self.code[i].dst==label: return True
+            i+=1
+        return False
+
+    def seq(self,i,j,depth,loop):
+        # CPython rejects more than 20 nested loops (and 100 indents);
+        # deeper code goes through the flat dispatch loop instead
+        if depth>MAX_DEPTH: raise Unstructured("nesting")
+        start=len(self.lines)
+        while i<j:
+            ins=self.code[i]; op=ins.op
+            if op is Op.LABEL:
+                k=self.loop_end(i,j,ins.dst)
+                if k is None: i+=1; continue
+                ext=self.code[k+1].dst if k+1<len(self.code) and self.code[k+1].op is Op.LABEL else None
+                self.out(depth,"while True:")
+                self.seq(i+1,k,depth+1,(ins.dst,ext))
+                i=k+1; continue
+            if op is Op.GOTO:
+                if loop and ins.dst==loop[0]: self.out(depth,"continue")
+                elif loop and ins.dst==loop[1]: self.out(depth,"break")
+                elif not self.next_label(i+1,j,ins.dst): raise Unstructured(ins)
+                i+=1; continue
+            if op is Op.IF or op is Op.IFZ:
+                jump_if_false=op is Op.IFZ
+                if loop and ins.dst in loop:
+                    word="continue" if ins.dst==loop[0] else "break"
+                    self.out(depth,f"if {self.cond(i,ins,jump_if_false)}: {word}")
+                    i+=1; continue
+                p=self.find(ins.dst,i+1,j)
+                if p is None: raise Unstructured(ins)
+                test=self.cond(i,ins,not jump_if_false)
+                self.out(depth,f"if {test}:")
+                last=self.code[p-1] if p-1>i else None
+                q=self.find(last.dst,p+1,j) if last is not None and last.op is Op.GOTO else None
+                if q is not None:
+                    self.seq(i+1,p-1,depth+1,loop)
+                    self.out(depth,"else:")
+                    self.seq(p+1,q,depth+1,loop)
+                    i=q+1
+                else:
+                    self.seq(i+1,p,depth+1,loop)
+                    i=p+1
+                continue
+            self.simple(ins,depth); i+=1
+        if len(self.lines)==start: self.out(depth,"pass")
+
+    # ---- fallback: one state per basic block ----
+    def dispatch(self):
+        blocks=[[]]; index={}
+        for ins in self.code:
+            if ins.op is Op.LABEL:
+                if blocks[-1]: blocks.append([])
+                index[ins.dst]=len(blocks)-1; continue
+            blocks[-1].append(ins)
+            if ins.op in (Op.GOTO,Op.IF,Op.IFZ,Op.RETURN): blocks.append([])
+        self.out(1,"pc = 0")
+        self.out(1,"while True:")
+        for k,blk in enumerate(blocks):
+            self.out(2,f"{'if' if k==0 else 'elif'} pc == {k}:")
+            for ins in blk:
+                if ins.op is Op.GOTO:
+                    self.out(3,f"pc = {index[ins.dst]}; continue")
+                elif ins.op is Op.IF or ins.op is Op.IFZ:
+                    neg="not " if ins.op is Op.IFZ else ""
+                    self.out(3,f"if {neg}{operand(ins.a)}: pc = {index[ins.dst]}; continue")
+                else:
+                    self.simple(ins,3)
+            if k+1<len(blocks): self.out(3,f"pc = {k+1}")
+            else: self.out(3,"break")
+        self.out(2,"else: break")
+
+def compile_func(name,body):
+    key=name+"\n"+"\n".join(map(str,body))
+    code=_cache.get(key)
+    if code is None:
+        stats["misses"]+=1
+        g=PyGen(name,body)
+        code=_cache[key]=compile(g.source(),f"<jit {name}>","exec")
+    else:
+        stats["hits"]+=1
+    ns={}
+    exec(code,ns)
+    return ns[ident(name)]
+
+def source(tac):
+    out=[]
+    for name,body in split_funcs(tac):
+        out.append(PyGen(name,body).source())
+    return "\n".join(out)
+
+class Funcs(dict):
+    # compiled functions by name, as generated calls look them up
+    def __missing__(self,name): raise RuntimeError(f"no function '{name}'")
+
+class JIT:
+    def __init__(self,tac,write=None):
+        self.funcs=Funcs((name,compile_func(name,body)) for name,body in split_funcs(tac))
+        self.write=write or sys.stdout.write
+
+    def run(self,entry="main"):
+        f=self.funcs.get(entry)
+        if f is None: raise RuntimeError(f"no function '{entry}'")
+        # calls are Python calls; allow about as deep a stack as the VM
+        old=sys.getrecursionlimit()
+        sys.setrecursionlimit(max(old,CALL_DEPTH+100))
+        try:
+            return f(self.write,self.funcs,())
+        except ZeroDivisionError as e:
+            tb=e.__traceback__      # the innermost frame is the faulting function
+            while tb.tb_next: tb=tb.tb_next
+            raise RuntimeError(f"{tb.tb_frame.f_code.co_name[2:]}: division by zero") from None
+        except RecursionError:
+            raise RuntimeError(f"call depth {CALL_DEPTH} exceeded") from None
+        finally:
+            sys.setrecursionlimit(old)
+
+def run(tac,entry="main",write=None):
+    return JIT(tac,write).run(entry)
+
+# loop-heavy benchmark programs
+PROGRAMS={
+    "count": "func main() { i = 0; s = 0; while (i < 200000) { s = s + i * 2; i = i + 1; } return s; }",
+    "nested": "func main() { i = 0; s = 0; while (i < 400) { j = 0; while (j < 400) {"
+              " if (j > i) { s = s + 1; } else { s = s - 1; } j = j + 1; } i = i + 1; } return s; }",
+    "float": "func main() { x = 0.5; n = 0; while (n < 100000) { x = x * 1.000001 + 0.25 / 2; n = n + 1; } return x; }",
+}
+
+def bench():
+    # VM dispatch vs compiled Python
+    import time
+    import vm
+    from lexical import tokenize
+    from parser import Parser
+    from codegen import TACGen
+    from optimizer import optimize
+    print("===== JIT BENCHMARK =====")
+    for name,src in PROGRAMS.items():
+        opt=optimize(TACGen().gen(Parser(list(tokenize(src))).parse()))
+        t0=time.perf_counter(); r1,_=vm.run(opt); t1=time.perf_counter()
+        r2=run(opt); t2=time.perf_counter()
+        assert r1==r2, (r1,r2)
+        print(f"{name:8} vm {t1-t0:7.3f}s  jit {t2-t1:7.3f}s  speedup x{(t1-t0)/(t2-t1):.1f}")
+    print("=========================\n")
+
+if __name__ == "__main__":
+    from lexical import tokenize
+    from parser import Parser
+    from codegen import TACGen
+    from optimizer import optimize
+
+    if len(sys.argv) < 2:
+        print("Usage: python jit.py sample.src | --bench")
+        sys.exit()
+    if sys.argv[1] == "--bench":
+        bench(); sys.exit()
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        src = f.read()
+    opt = optimize(TACGen().gen(Parser(list(tokenize(src))).parse()))
+    print("===== GENERATED PYTHON =====")
+    print(source(opt))
+    print("===== RUN (JIT) =====")
+    print(f"return: {run(opt)}")
+    print("=====================\n")
@@ -5,12 +5,15 @@
 # ------------------------------------------
 
 import re
-from dataclasses import dataclass
+import io
+import mmap
+import codecs
+from typing import NamedTuple
 from collections import defaultdict
 import sys
 
-@dataclass
-class Token:
+# tuple-based token: no per-instance __dict__, type names are interned
+class Token(NamedTuple):
     type: str
     value: any
     line: int
@@ -44,17 +47,141 @@ _spec = [
     ("SEMI", r";"), ("COMMA", r",")
 ]
 master = re.compile("|".join("(?P<%s>%s)" % x for x in _spec))
+_kind_of = [None] * (master.groups + 1)
+for _name, _idx in master.groupindex.items(): _kind_of[_idx] = sys.intern(_name)
 
-def tokenize(src: str):
-    line, start = 1, 0
-    for mo in master.finditer(src):
-        kind = mo.lastgroup
-        val = mo.group(kind)
-        col = mo.start() - start + 1
+CHUNK = 1 << 20
+
+# ---- table-driven scanner ----
+# The leading character picks the scanner state from a precomputed
+# table; each state consumes its run with an anchored match, and
+# keywords are found by one dict lookup on the scanned identifier.
+S_ID, S_NUM, S_BLANK, S_NL, S_ONE, S_OPEQ, S_MINUS, S_SLASH, S_CHAR, S_STRING = range(10)
+
+_state = {}
+for _c in "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_": _state[_c] = S_ID
+for _c in "0123456789": _state[_c] = S_NUM
+for _c in " \t\r": _state[_c] = S_BLANK
+_state["\n"] = S_NL
+_one = {"+": "PLUS", "*": "TIMES", "(": "LPAREN", ")": "RPAREN",
+        "{": "LBRACE", "}": "RBRACE", ";": "SEMI", ",": "COMMA"}
+for _c in _one: _state[_c] = S_ONE
+# operators that take an optional '=': (alone, with '=')
+_opeq = {"=": ("ASSIGN", "EQEQ"), "<": ("LT", "LE"), ">": ("GT", "GE"), "!": (None, "NE")}
+for _c in _opeq: _state[_c] = S_OPEQ
+_state["-"] = S_MINUS
+_state["/"] = S_SLASH
+_state["'"] = S_CHAR
+_state['"'] = S_STRING
+
+keywords = {"func": "FUNC", "if": "IF", "else": "ELSE", "while": "WHILE",
+            "return": "RETURN", "print": "PRINT", "true": "TRUE", "false": "FALSE"}
+
+_word = re.compile(r"([A-Za-z0-9_]*)[ \t\r]*").match
+_blank = re.compile(r"[ \t\r]*").match
+_number = re.compile(r"-?\d+(\.\d+)?").match
+_char = re.compile(r"'([^'\\]|\\.)'").match
+_string = re.compile(r'"([^"\\]|\\.)*"').match
+
+_string_head = re.compile(r'"([^"\\]|\\.)*\\?').match
+
+def _open(s, buf, pos):
+    # True when a quote failed to match only because the buffer ended
+    if s is S_CHAR: return len(buf) - pos < 4
+    return _string_head(buf, pos).end() == len(buf)
+
+def _isword(c):
+    # same test as \b in str patterns
+    return c.isalnum() or c == "_"
+
+def scan(buf, pos, cut, final, line, start):
+    # Yields the tokens of buf[pos:cut] and returns (pos, line, start)
+    # where scanning stopped. Short of the final round it stops before
+    # a token that runs past `cut` or a quote that does not close yet.
+    state = _state.get; kw = keywords.get
+    tok = tuple.__new__; T = Token     # skips NamedTuple's Python-level __new__
+    while pos < cut:
+        c = buf[pos]
+        s = state(c)
+        if s is S_ID:
+            mo = _word(buf, pos + 1)
+            end = mo.end(1)
+            val = buf[pos:end]
+            kind = kw(val)
+            if kind is not None and not (pos and _isword(buf[pos - 1]) or end < len(buf) and _isword(buf[end])):
+                if kind == "TRUE" or kind == "FALSE":
+                    yield tok(T, ("BOOL", kind == "TRUE", line, pos - start + 1))
+                else:
+                    yield tok(T, (kind, val, line, pos - start + 1))
+            else:
+                yield tok(T, ("ID", val, line, pos - start + 1))
+            pos = mo.end()      # trailing blanks go with the identifier
+        elif s is S_BLANK:
+            pos = _blank(buf, pos + 1).end()
+        elif s is S_NL:
+            pos += 1; line += 1; start = pos
+        elif s is S_ONE:
+            yield tok(T, (_one[c], c, line, pos - start + 1))
+            pos += 1
+        elif s is S_OPEQ:
+            alone, with_eq = _opeq[c]
+            if buf.startswith("=", pos + 1):
+                yield tok(T, (with_eq, c + "=", line, pos - start + 1))
+                pos += 2
+            else:
+                if alone: yield tok(T, (alone, c, line, pos - start + 1))
+                pos += 1
+        elif s is S_NUM or s is S_MINUS or (s is None and c.isdecimal()):
+            mo = _number(buf, pos)
+            if mo is None:
+                if s is S_MINUS: yield tok(T, ("MINUS", c, line, pos - start + 1))
+                pos += 1; continue
+            val = mo.group()
+            if "." in val:
+                yield tok(T, ("FLOAT", float(val), line, pos - start + 1))
+            else:
+                yield tok(T, ("INT", int(val), line, pos - start + 1))
+            pos = mo.end()
+        elif s is S_SLASH:
+            if buf.startswith("/", pos + 1):
+                end = buf.find("\n", pos)
+                pos = end if end >= 0 else len(buf)
+            else:
+                yield tok(T, ("DIVIDE", c, line, pos - start + 1))
+                pos += 1
+        elif s is S_CHAR or s is S_STRING:
+            mo = (_char if s is S_CHAR else _string)(buf, pos)
+            if mo is None or mo.end() > cut:
+                # short of the final round an open quote may still close
+                if not final and (mo is not None or _open(s, buf, pos)): break
+                pos += 1; continue
+            yield tok(T, ("CHAR" if s is S_CHAR else "STRING", mo.group()[1:-1], line, pos - start + 1))
+            pos = mo.end()
+        else:
+            pos += 1    # no token starts here
+    return pos, line, start
+
+def scan_regex(buf, pos, cut, final, line, start):
+    # the original alternation scanner over `master`, kept as the
+    # reference for the table-driven one
+    search = master.search
+    while True:
+        mo = search(buf, pos)
+        if mo is None: break
+        end = mo.end()
+        if not final and (end > cut or (mo.start() > pos and
+                          ('"' in buf[pos:mo.start()] or "'" in buf[pos:mo.start()]))):
+            break
+        pos = end
+        kind = _kind_of[mo.lastindex]
         if kind == "NEWLINE":
-            line += 1; start = mo.end(); continue
-        if kind in ("SKIP", "COMMENT"): continue
-        if kind == "NUMBER":
+            line += 1; start = end; continue
+        if kind == "SKIP" or kind == "COMMENT": continue
+        val = mo.group()
+        col = mo.start() - start + 1
+        if kind == "ID":
+            yield Token(kind, val, line, col)
+        elif kind == "NUMBER":
             if "." in val:
                 yield Token("FLOAT", float(val), line, col)
             else:
@@ -67,9 +194,75 @@ def tokenize(src: str):
             yield Token("BOOL", True if kind == "TRUE" else False, line, col)
         else:
             yield Token(kind, val, line, col)
+    return pos, line, start
+
+def tokenize(src: str, scanner=scan):
+    return tokenize_chunks((src,), scanner)
+
+def tokenize_file(path, chunk_size=CHUNK):
+    # streams tokens from an mmap'ed file without reading it into one string
+    return tokenize_chunks(mmap_chunks(path, chunk_size))
+
+def tokenize_stream(f, chunk_size=CHUNK):
+    return tokenize_chunks(read_chunks(f, chunk_size))
+
+def read_chunks(f, size=CHUNK):
+    while True:
+        chunk = f.read(size)
+        if not chunk: break
+        yield chunk
+
+def mmap_chunks(path, size=CHUNK):
+    # decoded like text-mode open(): utf-8 with universal newlines
+    with open(path, "rb") as f:
+        if not f.seek(0, 2): return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            dec = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(), True)
+            n = len(mm)
+            for off in range(0, n, size):
+                text = dec.decode(mm[off:off + size], off + size >= n)
+                if text: yield text
+
+def tokenize_chunks(chunks, scanner=scan):
+    # Tokens may straddle chunk boundaries, so each round only scans up
+    # to the last newline of the buffer (no token but a string spans
+    # lines) and the rest is carried into the next round.
+    line, start = 1, 0
+    buf = ""; pos = 0
+    it = iter(chunks); nxt = next(it, None)
+    while nxt is not None:
+        chunk = nxt; nxt = next(it, None); final = nxt is None
+        if pos:
+            keep = pos - 1      # one char of context for keyword boundaries
+            buf = buf[keep:]; pos -= keep; start -= keep
+        buf += chunk
+        cut = len(buf) if final else buf.rfind("\n") + 1
+        pos, line, start = yield from scanner(buf, pos, cut, final, line, start)
+
+def bench(n=200000, rounds=3):
+    # identifier-heavy input: keyword-like names make every ID pay for
+    # the failed keyword alternatives in the regex scanner
+    import time, random
+    r = random.Random(0)
+    names = ["iffy", "whiled", "format", "returned", "printer", "elsewhere", "truth", "falsey",
+             "x", "count", "total_sum", "_tmp1", "value"]
+    words = [r.choice(names) if r.random() < 0.8 else r.choice(("if", "=", "+", ";", "(", ")", "12"))
+             for _ in range(n)]
+    src = "\n".join(" ".join(words[i:i + 12]) for i in range(0, n, 12)) + "\n"
+    print("===== LEXER BENCHMARK =====")
+    ref = None
+    for name, scanner in (("regex", scan_regex), ("table", scan)):
+        best = None
+        for _ in range(rounds):
+            t0 = time.perf_counter(); toks = list(tokenize(src, scanner)); dt = time.perf_counter() - t0
+            best = dt if best is None else min(best, dt)
+        if ref is None: ref = toks
+        assert toks == ref, f"{name} scanner output differs"
+        print(f"{name:6} {len(toks):>8} tokens {best:8.3f}s  {len(toks) / best:12.0f} tokens/sec")
+    print("===========================\n")
 
 # pretty print grouped output
-def print_token_summary(tokens):
+def print_token_summary(tokens,out=None):
     groups = defaultdict(list)
     for t in tokens:
         if t.type in ("FUNC","IF","ELSE","WHILE","RETURN","PRINT"):
@@ -89,15 +282,17 @@ def print_token_summary(tokens):
         else:
             groups["Others"].append(t.value)
 
-    print("===== LEXICAL ANALYSIS =====")
-    for name, items in groups.items():
-        print(f"{name} ({len(items)}): {', '.join(items)}")
-    print("=============================\n")
+    lines = ["===== LEXICAL ANALYSIS ====="]
+    lines.extend(f"{name} ({len(items)}): {', '.join(items)}" for name, items in groups.items())
+    lines.append("=============================\n")
+    print("\n".join(lines), file=out)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python lexical.py sample.src")
+        print("Usage: python lexical.py sample.src | --bench")
         sys.exit()
+    if sys.argv[1] == "--bench":
+        bench(); sys.exit()
     with open(sys.argv[1],'r',encoding='utf-8') as f:
         src=f.read()
     toks=list(tokenize(src))
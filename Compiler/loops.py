@@ -0,0 +1,350 @@
+# loops.py
+# ------------------------------------------
+# Loop optimizations on one function's TAC:
+# natural loops from dominator back edges,
+# invariant code hoisted into a preheader,
+# multiplies of integer induction variables
+# turned into additions, and small counted
+# loops fully unrolled within a size budget
+# ------------------------------------------
+
+from tac import Op, Instr, EVAL, is_name
+from cfg import Block, build_cfg, reachable, defined, pure, Names, Liveness, ReachingDefs
+from ssa import dominators
+
+JUMPS=(Op.GOTO,Op.IF,Op.IFZ)
+
+class Loop:
+    __slots__=("header","blocks","orig","parent")
+    def __init__(self,header): self.header=header; self.blocks={header}; self.parent=None
+
+def is_int(x): return x.__class__ is int
+
+def dom_numbers(blocks):
+    # [start, end) of every block in a walk of the dominator tree
+    _,kids=dominators(blocks)
+    entry=blocks[0]; start={entry:0}; num={}; n=1
+    stack=[(entry,iter(kids[entry]))]
+    while stack:
+        b,it=stack[-1]
+        for k in it:
+            start[k]=n; n+=1; stack.append((k,iter(kids[k]))); break
+        else:
+            num[b]=(start[b],n); stack.pop()
+    return num
+
+def dominates(a,b,num):
+    lo,hi=num[a]
+    return lo<=num[b][0]<hi
+
+def find_loops(blocks,num):
+    # one Loop per header (back edges to it merged), innermost first, each
+    # linked to the next loop out
+    loops={}
+    for b in blocks:
+        for h in b.succ:
+            if not dominates(h,b,num): continue
+            lp=loops.get(h) or loops.setdefault(h,Loop(h))
+            stack=[b]
+            while stack:
+                x=stack.pop()
+                if x not in lp.blocks: lp.blocks.add(x); stack.extend(x.pred)
+    out=sorted(loops.values(),key=lambda lp:(len(lp.blocks),lp.header.id))
+    inner={}    # block -> innermost loop holding it
+    for lp in out:
+        lp.orig=frozenset(lp.blocks)
+        for b in lp.blocks:
+            x=inner.get(b)
+            if x is None: inner[b]=lp; continue
+            while x.parent is not None: x=x.parent
+            if x is not lp: x.parent=lp
+    return out
+
+def outer(lp):
+    lp=lp.parent
+    while lp is not None:
+        yield lp; lp=lp.parent
+
+class Func:
+    # one function's blocks, analysed once and rewritten in place loop by
+    # loop. Layout order is a linked list with ids increasing along it.
+    # Liveness and reaching defs at a loop's header and exits only depend
+    # on code outside the loop, so rewriting inner loops leaves them sound
+    # for the outer ones; a new block takes the facts of the one it enters.
+    def __init__(self,body):
+        self.names=Names(body)
+        blocks=reachable(build_cfg(body))
+        self.loops=find_loops(blocks,dom_numbers(blocks)) if blocks else []
+        if not self.loops: return
+        lv=Liveness(blocks)
+        self.bit=lv.bit; self.live={b:lv.before[b.id] for b in blocks}
+        # entry values are only asked of induction variables, and rewriting
+        # inner loops never makes new ones
+        track=set()
+        for lp in self.loops: track.update(induction_vars(lp,counts(lp)))
+        rd=ReachingDefs(blocks,track)
+        self.rd=rd; self.reach={lp.header:rd.before[lp.header.id] for lp in self.loops}
+        self.home={id(ins):b for b in blocks for ins in b.code}
+        self.bylabel={b.label:b for b in blocks if b.label}
+        self.first=blocks[0]
+        self.next={}; self.prev={}
+        for a,b in zip(blocks,blocks[1:]): self.next[a]=b; self.prev[b]=a
+        for b in blocks: b.id<<=32     # room for new blocks between old ones
+
+    def pinned(self,x,name):
+        return bool(self.bit.get(name,0)&x)
+
+    def place(self,new,prev,nxt):
+        # links the blocks `new` in between prev and nxt (either may be None)
+        lo=prev.id if prev else -1<<32
+        hi=nxt.id if nxt else lo+(len(new)+1<<32)
+        if hi-lo<=len(new):
+            self.renumber(); lo=prev.id if prev else -1<<32
+            hi=nxt.id if nxt else lo+(len(new)+1<<32)
+        for k,b in enumerate(new): b.id=lo+(hi-lo)*(k+1)//(len(new)+1)
+        chain=[prev]+new+[nxt]
+        for a,b in zip(chain,chain[1:]):
+            if a is not None: self.next[a]=b
+            if b is not None: self.prev[b]=a
+        if prev is None: self.first=chain[1]
+
+    def renumber(self):
+        b=self.first; k=0
+        while b is not None: b.id=k<<32; k+=1; b=self.next.get(b)
+
+    def flatten(self):
+        out=[]; b=self.first
+        while b is not None: out.extend(b.code); b=self.next.get(b)
+        return out
+
+def counts(lp):
+    n={}
+    for b in lp.blocks:
+        for ins in b.code:
+            d=defined(ins)
+            if d is not None: n[d]=n.get(d,0)+1
+    return n
+
+def induction_vars(lp,ndef):
+    # v -> (its one def, c) for 'v = v +/- c' with an integer c, also in the
+    # 'T = v +/- c; v = T' form codegen leaves behind
+    iv={}
+    for b in lp.blocks:
+        step={}     # T -> (v, c)
+        for ins in b.code:
+            if ins.op is Op.BIN and ins.sym in ("+","-") and is_int(ins.b) and ndef[ins.dst]==1:
+                c=ins.b if ins.sym=="+" else -ins.b
+                if ins.dst==ins.a: iv[ins.dst]=(ins,c)
+                else: step[ins.dst]=(ins.a,c)
+            elif ins.op is Op.COPY and ins.a in step and step[ins.a][0]==ins.dst and ndef[ins.dst]==1:
+                iv[ins.dst]=(ins,step[ins.a][1])
+    return iv
+
+def entry_values(f,lp,names):
+    # v -> the constants v can hold on entry to the loop (None if not all constant)
+    x=f.reach[lp.header]
+    out={}
+    for v in names:
+        vals=[]
+        for d in f.rd.reaching(x,v):
+            if d is not None and f.home[id(d)] in lp.orig: continue
+            if d is None or d.op is not Op.COPY or not is_int(d.a): vals=None; break
+            vals.append(d.a)
+        out[v]=vals or None
+    return out
+
+def reaches(a,b,B,stop):
+    # a path from a to b inside B through no block of `stop`
+    seen=set(); stack=list(a.succ)
+    while stack:
+        x=stack.pop()
+        if x not in B or x in stop or x in seen: continue
+        if x is b: return True
+        seen.add(x); stack.extend(x.succ)
+    return False
+
+# ---- invariant code motion + strength reduction ----
+
+def transform(f,lp,st):
+    h=lp.header; B=lp.blocks
+    prev=f.prev.get(h)
+    if prev in B and h in prev.succ and prev.code[-1].op is not Op.GOTO:
+        return False    # the loop falls into its header: no room for a preheader
+    ndef=counts(lp)
+    pinned=f.live[h]
+    for b in B:
+        for s in b.succ:
+            if s not in B: pinned|=f.live.get(s,-1)
+    order=sorted(B,key=lambda b:b.id)
+
+    # hoist 'd = ...' when every operand is fixed in the loop, d has no other
+    # def there and no value of d from before or after the loop is observed;
+    # calls stay, and so does a '/' that may fault (pure), as it would fault
+    # on iterations that never run
+    pre=[]; hoisted=set(); changed=True
+    while changed:
+        changed=False
+        for b in order:
+            code=[]
+            for ins in b.code:
+                d=defined(ins)
+                if d is not None and pure(ins) and ndef[d]==1 and not f.pinned(pinned,d) \
+                        and all(not is_name(u) or u in hoisted or u not in ndef for u in ins.uses()):
+                    pre.append(ins); hoisted.add(d); changed=True
+                    continue
+                code.append(ins)
+            b.code=code
+    st["hoisted"]=st.get("hoisted",0)+len(pre)
+
+    # t = v * k for an induction variable v and constant k becomes a copy of
+    # s, kept equal to v * k by an add right after v's increment
+    iv=induction_vars(lp,ndef)
+    ints=entry_values(f,lp,iv) if iv else {}
+    red={}      # (v, k) -> s
+    for b in order:
+        for i,ins in enumerate(b.code):
+            if ins.op is not Op.BIN or ins.sym!="*": continue
+            v,k=(ins.a,ins.b) if ins.a in iv else (ins.b,ins.a)
+            if v not in iv or not is_int(k) or not ints.get(v): continue
+            s=red.get((v,k))
+            if s is None:
+                s=red[(v,k)]=f.names.var(v)
+                pre.append(Instr(Op.BIN,s,v,"*",k))
+            b.code[i]=Instr(Op.COPY,ins.dst,s)
+            st["reduced"]=st.get("reduced",0)+1
+    for (v,k),s in red.items():
+        inc,step=iv[v]
+        for b in order:
+            if inc in b.code:
+                b.code.insert(b.code.index(inc)+1,Instr(Op.BIN,s,s,"+",step*k)); break
+    if not pre: return False
+
+    # the preheader sits right before the header; jumps from outside the
+    # loop that targeted the header now land on it
+    p0=Block(0); outside=[p for p in h.pred if p not in B]
+    for p in outside:
+        last=p.code[-1] if p.code else None
+        if last is not None and last.op in JUMPS and last.dst==h.label:
+            if p0.label is None:
+                p0.label=f.names.label(); p0.code.append(Instr(Op.LABEL,p0.label))
+                f.bylabel[p0.label]=p0
+            p.code[-1]=Instr(last.op,p0.label,last.a)
+        p.succ=[p0 if s is h else s for s in p.succ]
+    p0.code.extend(pre); p0.pred=outside; p0.succ=[h]
+    h.pred=[p for p in h.pred if p in B]+[p0]
+    f.place([p0],prev,h)
+    f.live[p0]=f.live[h]
+    for o in outer(lp): o.blocks.add(p0)
+    return True
+
+# ---- full unrolling ----
+
+def unroll(f,lp,budget,st):
+    # 'L: T = v < N; IFZ T GOTO X; body; GOTO L' with v counted from a
+    # known constant becomes trip-count copies of body
+    h=lp.header; B=lp.blocks; run=[h]
+    while len(run)<len(B):
+        x=f.next.get(run[-1])
+        if x not in B: return False
+        run.append(x)
+    code=h.code
+    if len(code)!=3 or code[1].op is not Op.BIN or code[2].op is not Op.IFZ or code[2].a!=code[1].dst:
+        return False
+    cmp=code[1]; xl=code[2].dst; latch=run[-1]
+    if latch is h or latch.code[-1].op is not Op.GOTO or latch.code[-1].dst!=h.label: return False
+    if cmp.sym not in ("<","<=",">",">=","!="): return False
+    if is_name(cmp.a) and is_int(cmp.b): v,bound,swap=cmp.a,cmp.b,False
+    elif is_int(cmp.a) and is_name(cmp.b): v,bound,swap=cmp.b,cmp.a,True
+    else: return False
+    ndef=counts(lp)
+    iv=induction_vars(lp,ndef)
+    if v not in iv or ndef[cmp.dst]!=1: return False
+    init=entry_values(f,lp,[v])[v]
+    if not init or len(set(init))!=1: return False
+    body=[ins for b in run[1:] for ins in b.code][:-1]
+    if any(ins.op in JUMPS and ins.dst==h.label for ins in body): return False
+    # the header's label goes: only a fall-through may enter it
+    prev=f.prev.get(h)
+    if any(p not in B and p is not prev for p in h.pred): return False
+    if prev is not None and prev.code[-1].op in JUMPS and prev.code[-1].dst==h.label: return False
+    after=f.bylabel.get(xl)
+    if after is not None and f.pinned(f.live.get(after,-1),cmp.dst): return False
+
+    size=max(1,sum(1 for ins in body if ins.op is not Op.LABEL))
+    ev=EVAL[cmp.sym]; x=init[0]; step=iv[v][1]; trips=0
+    while (ev(bound,x) if swap else ev(x,bound)):
+        trips+=1; x+=step
+        if trips*size>budget: return False
+    # the trip count assumes v steps once per iteration: its increment's
+    # block must dominate the latch and lie on no cycle short of the header
+    inc=iv[v][0]
+    home=next(b for b in B if any(x is inc for x in b.code))
+    if home is not h and reaches(h,latch,B,{h,home}): return False
+    if reaches(home,home,B,{h}): return False
+
+    # names whose values never cross an iteration or leave the loop get
+    # fresh ones per copy, so each copy's defs stay single (and hoistable)
+    own={ins.dst for ins in body if ins.op is Op.LABEL}
+    pinned=f.live[h]
+    if after is not None: pinned|=f.live.get(after,-1)
+    local={d for d in map(defined,body) if d is not None and not f.pinned(pinned,d)}
+    out=[]
+    for _ in range(trips):
+        lab={L:f.names.label() for L in own}
+        ren={v:f.names.var(v) for v in local}
+        rn=lambda x: ren.get(x,x) if is_name(x) else x
+        for ins in body:
+            if ins.op in (Op.LABEL,Op.GOTO,Op.IF,Op.IFZ):
+                ins=Instr(ins.op,lab.get(ins.dst,ins.dst),rn(ins.a))
+            else:
+                ins=Instr(ins.op,rn(ins.dst),rn(ins.a),ins.sym,rn(ins.b))
+            out.append(ins)
+    nxt=f.next.get(latch)
+    if nxt is None or nxt.label!=xl: out.append(Instr(Op.GOTO,xl))
+    splice(f,lp,run,out)
+    st["unrolled"]=st.get("unrolled",0)+1
+    return True
+
+def splice(f,lp,run,code):
+    # the blocks in `run` (entered only by falling into the first) give way
+    # to blocks built from `code`
+    prev=f.prev.get(run[0]); nxt=f.next.get(run[-1]); old=set(run)
+    made=build_cfg(code); local={b.label for b in made if b.label}
+    tail=made[-1] if made else None
+    new=reachable(made)
+    for b in run:
+        for s in b.succ:
+            if s not in old: s.pred.remove(b)
+        if b.label and f.bylabel.get(b.label) is b: del f.bylabel[b.label]
+        f.next.pop(b,None); f.prev.pop(b,None)
+    for b in new:
+        if b.label: f.bylabel[b.label]=b
+    for b in new:
+        last=b.code[-1]
+        if last.op in JUMPS and last.dst not in local:
+            t=f.bylabel.get(last.dst)
+            if t is not None and t not in b.succ: b.succ.append(t); t.pred.append(b)
+    if new and new[-1] is tail and tail.code[-1].op not in (Op.GOTO,Op.RETURN) and nxt is not None:
+        if nxt not in tail.succ: tail.succ.append(nxt); nxt.pred.append(tail)
+    entry=new[0] if new else nxt
+    for p in run[0].pred:
+        if p in old: continue
+        p.succ=[s for s in p.succ if s is not run[0]]
+        if entry is not None and entry not in p.succ: p.succ.append(entry); entry.pred.append(p)
+    f.place(new,prev,nxt)
+    if new: f.live[entry]=f.live[run[0]]
+    for o in outer(lp):
+        o.blocks-=old; o.blocks.update(new)
+
+def loop_optimize(body,unroll_budget=0,st=None):
+    # loops are handled innermost first, on one CFG analysed up front
+    if st is None: st={}
+    f=Func(body); changed=False
+    if not f.loops: return body
+    for lp in f.loops:
+        if not lp.header.label: continue
+        st["loops"]=st.get("loops",0)+1
+        done=bool(unroll_budget) and unroll(f,lp,unroll_budget,st)
+        if not done: done=transform(f,lp,st)
+        changed|=done
+    return f.flatten() if changed else body
@@ -3,58 +3,251 @@
 # Main driver: runs all compiler phases
 # ------------------------------------------
 
+import os
 import sys
-from lexical import tokenize, print_token_summary
+import argparse
+from lexical import tokenize, tokenize_file, print_token_summary
 from parser import Parser, print_ast
-from semantic import analyze
+from semantic import analyze, print_symbols
 from codegen import TACGen
 from optimizer import optimize
 from asmgen import tac_to_asm
+from regalloc import REGS
+from cache import Cache
+from incremental import Build
+import batch
+from stats import Stats, count_nodes, asm_instructions, counting
+import vm
+import jit
+
+STAGES = ["tokens", "ast", "symbols", "tac", "opt", "asm"]
+
+def open_output(path):
+    # one large buffered writer for every report
+    if path and path != "-":
+        return open(path, "w", encoding="utf-8", buffering=1 << 20)
+    sys.stdout.flush()
+    return open(sys.stdout.fileno(), "w", encoding="utf-8", buffering=1 << 20, closefd=False)
+
+def write_tac(out, title, bar, code):
+    out.write(f"{title}\n")
+    out.write("".join(f"({i}) {line}\n" for i, line in enumerate(code, 1)))
+    out.write(f"{bar}\n\n")
+
+def write_report(out, stage, obj):
+    # the report of one stage, as main.py prints it (also used by server.py)
+    if stage == "tokens":
+        print_token_summary(obj, out)
+    elif stage == "ast":
+        out.write("===== PARSER (SYNTAX TREE) =====\n")
+        print_ast(obj, out=out)
+        out.write("===============================\n\n")
+    elif stage == "symbols":
+        print_symbols(obj, out)
+    elif stage == "tac":
+        write_tac(out, "===== THREE ADDRESS CODE =====", "==============================", obj)
+    elif stage == "opt":
+        write_tac(out, "===== OPTIMIZED TAC =====", "=========================", obj)
+    elif stage == "asm":
+        out.write("===== ASSEMBLY CODE =====\n")
+        out.write("".join(f"{line}\n" for line in obj))
+        out.write("=========================\n\n")
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py sample.src")
-        sys.exit()
-
-    src_file = sys.argv[1]
-    with open(src_file, "r", encoding="utf-8") as f:
-        src = f.read()
-
-    # Phase 1: Lexical Analysis
-    toks = list(tokenize(src))
-    print_token_summary(toks)
-
-    # Phase 2: Parsing
-    parser = Parser(toks)
-    tree = parser.parse()
-    print("===== PARSER (SYNTAX TREE) =====")
-    print_ast(tree)
-    print("===============================\n")
-
-    # Phase 3: Semantic Analysis
-    symtab = analyze(tree)
-
-    # Phase 4: TAC Generation
-    gen = TACGen()
-    tac = gen.gen(tree)
-    print("===== THREE ADDRESS CODE =====")
-    for i, line in enumerate(tac, 1):
-        print(f"({i}) {line}")
-    print("==============================\n")
-
-    # Phase 5: Optimization
-    opt = optimize(tac)
-    print("===== OPTIMIZED TAC =====")
-    for i, line in enumerate(opt, 1):
-        print(f"({i}) {line}")
-    print("=========================\n")
-
-    # Phase 6: Assembly Generation
-    asm = tac_to_asm(opt)
-    print("===== ASSEMBLY CODE =====")
-    for line in asm:
-        print(line)
-    print("=========================\n")
+    ap = argparse.ArgumentParser(usage="python main.py sample.src [--emit STAGES] [--stop-after STAGE] [-o FILE] [--run [--jit]]\n"
+                                       "       python main.py --batch FILE_OR_DIR... [-j N] [--out-dir DIR]")
+    ap.add_argument("src", nargs="+")
+    ap.add_argument("--emit", metavar="STAGES",
+                    help="comma list of reports to write: " + "|".join(STAGES) + " (default: all)")
+    ap.add_argument("--stop-after", choices=STAGES,
+                    help="last phase to run (default: the last emitted stage, or asm)")
+    ap.add_argument("-o", dest="output", metavar="FILE", help="write reports to FILE instead of stdout")
+    ap.add_argument("--regs", type=int, default=REGS, metavar="N",
+                    help=f"registers for the allocator (default: {REGS}; 0 keeps names, reusing temps)")
+    ap.add_argument("--unroll", type=int, default=0, metavar="N",
+                    help="fully unroll counted loops up to N instructions (default: 0, off)")
+    ap.add_argument("--no-peephole", dest="peephole", action="store_false",
+                    help="skip the peephole pass over the assembly")
+    ap.add_argument("--run", action="store_true", help="execute the optimized TAC on the VM")
+    ap.add_argument("--jit", action="store_true", help="with --run, execute compiled Python instead")
+    ap.add_argument("--cache", metavar="DIR", help="reuse phase artifacts cached in DIR")
+    ap.add_argument("--cache-size", type=int, default=256, metavar="MB", help="cache size bound")
+    ap.add_argument("--incremental", metavar="STATE",
+                    help="recompile only changed functions (and their callers), keeping per-function results in STATE")
+    ap.add_argument("--batch", action="store_true", help="compile many files/directories to .asm")
+    ap.add_argument("-j", "--jobs", type=int, help="batch worker processes (default: CPU count)")
+    ap.add_argument("--out-dir", help="batch output directory, laid out as under the given directories (default: next to each source)")
+    ap.add_argument("--stats", nargs="?", const="-", metavar="FILE",
+                    help="write per-phase timings and sizes as JSON (default: stdout)")
+    ap.add_argument("--stats-mem", action="store_true", help="with --stats, record tracemalloc peaks")
+    ap.add_argument("--profile", metavar="PHASES", help="cProfile these phases (comma list or 'all')")
+    args = ap.parse_args()
+
+    if args.batch or len(args.src) > 1 or os.path.isdir(args.src[0]):
+        errors = batch.batch(args.src, args.jobs, args.out_dir, args.cache)
+        sys.exit(1 if errors else 0)
+
+    emit = set(STAGES)
+    if args.emit:
+        emit = set(x.strip() for x in args.emit.split(","))
+        bad = emit - set(STAGES)
+        if bad: ap.error(f"unknown --emit stage(s): {', '.join(sorted(bad))}")
+    stop = args.stop_after or (max(emit, key=STAGES.index) if args.emit else "asm")
+    last = STAGES.index(stop)
+    if args.run: last = max(last, STAGES.index("opt"))
+
+    src_file = args.src[0]
+    # without a token report or cache, tokens stream from the mmap'ed
+    # file straight into the parser and no token list is built
+    stream = not args.cache and not args.incremental and "tokens" not in emit and last >= 1
+    if not stream:
+        with open(src_file, "r", encoding="utf-8") as f:
+            src = f.read()
+
+    st = Stats(args.stats is not None, args.stats_mem,
+               args.profile.split(",") if args.profile else ())
+    cache = Cache(args.cache, args.cache_size << 20) if args.cache else None
+    key = cache.key(src) if cache else None
+    # cached artifacts past tac are for the default options only
+    default = args.regs == REGS and args.peephole and not args.unroll
+    cacheable = {"tokens", "ast", "tac"} | ({"opt"} if not args.unroll else set()) | ({"asm"} if default else set())
+    got = {}    # artifacts an incremental build produced or the cache had
+    def phase(name, compute, counters=None):
+        if name in got: return got[name]
+        obj = compute()
+        if cache and name in cacheable:
+            cache.put(key, name, obj)
+            if counters: cache.note(key, name, counters)
+        return obj
+
+    build = None
+    if args.incremental:
+        build = Build(args.incremental, args.regs, args.peephole, args.unroll)
+        with st.phase("incremental"):
+            got = build.compile(src)
+        build.save()
+        st.count("functions_rebuilt", len(build.changed) + len(build.dependent))
+        st.count("functions_reused", build.reused)
+
+    # stages to load or compute: the reports asked for and the last phase.
+    # As in cache.compile_source the deepest artifact found wins, and the
+    # phases before it only run for their own reports
+    need = {s for s in emit if STAGES.index(s) <= last} | {STAGES[last]}
+    if args.run: need |= {"tac", "opt"}
+    for i in range(last, -1, -1):
+        s = STAGES[i]
+        if s not in need or s in got: continue
+        if cache and s in cacheable:
+            obj = cache.get(key, s)
+            if obj is not None:
+                got[s] = obj
+                continue
+        if i: need.add(STAGES[i - 1])
+    if cache and st.enabled:
+        # counters of the phases not run here, as stored with their artifact
+        for s, name in (("tac", "tailcalls"), ("opt", "optimizer")):
+            if STAGES.index(s) <= last and (s in got or s not in need):
+                counters = cache.notes(key, s)
+                if counters: st.count(name, counters)
+
+    out = open_output(args.output)
+    try:
+        # Phase 1: Lexical Analysis (runs inside parsing when streaming)
+        if "tokens" not in need:
+            pass    # a later artifact is at hand already
+        elif stream:
+            toks = tokenize_file(src_file)
+            if st.enabled: toks = counting(toks, st, "tokens")
+        else:
+            with st.phase("tokenize"):
+                toks = phase("tokens", lambda: list(tokenize(src)))
+            st.count("tokens", len(toks))
+        if "tokens" in emit:
+            write_report(out, "tokens", toks)
+
+        # Phase 2: Parsing
+        if "ast" in need:
+            with st.phase("parse"):
+                tree = phase("ast", lambda: Parser(toks).parse())
+            st.count("ast_nodes", lambda: count_nodes(tree))
+            if "ast" in emit:
+                write_report(out, "ast", tree)
+
+        # Phase 3: Semantic Analysis
+        if "symbols" in need:
+            with st.phase("analyze"):
+                symtab = got["symbols"] if "symbols" in got else analyze(tree)
+            if "symbols" in emit:
+                write_report(out, "symbols", symtab)
+
+        # Phase 4: TAC Generation
+        if "tac" in need:
+            with st.phase("tacgen"):
+                gen = TACGen()
+                tac = phase("tac", lambda: gen.gen(tree), gen.stats)
+            st.count("tac_lines", len(tac))
+            if gen.stats: st.count("tailcalls", gen.stats)
+            if "tac" in emit:
+                write_report(out, "tac", tac)
+
+        # Phase 5: Optimization
+        if "opt" in need:
+            with st.phase("optimize"):
+                passes = {}
+                opt = phase("opt", lambda: optimize(tac, stats=passes, unroll=args.unroll), passes)
+            st.count("opt_lines", len(opt))
+            if passes: st.count("optimizer", passes)
+            if "opt" in emit:
+                write_report(out, "opt", opt)
+
+        # Phase 6: Assembly Generation
+        if "asm" in need:
+            with st.phase("asmgen"):
+                funcs = []
+                asm = phase("asm", lambda: tac_to_asm(opt, args.regs, funcs, args.peephole))
+            st.count("asm_instructions", lambda: asm_instructions(asm))
+            if funcs:
+                hits = {}
+                for r in funcs:
+                    for rule, n in r.pop("peephole").items(): hits[rule] = hits.get(rule, 0) + n
+                if args.regs: st.count("regalloc", {r.pop("function"): r for r in funcs})
+                if args.peephole: st.count("peephole", hits)
+            if "asm" in emit:
+                write_report(out, "asm", asm)
+
+        # Phase 7: Execution (optional)
+        if args.run and args.jit:
+            out.write("===== RUN (JIT) =====\n")
+            with st.phase("run"):
+                ret = jit.JIT(opt, out.write).run()
+            out.write(f"return: {ret}\n")
+            out.write("=====================\n\n")
+        elif args.run:
+            out.write("===== RUN =====\n")
+            machine = vm.VM(vm.load(opt), out.write)
+            with st.phase("run"):
+                ret = machine.run()
+            st.count("instructions_executed", machine.count)
+            st.count("max_call_depth", machine.depth)
+            _, base = vm.run(tac, write=lambda s: None)
+            out.write(f"return: {ret}\n")
+            out.write(f"instructions executed: {machine.count} (unoptimized: {base})\n")
+            out.write(f"max call depth: {machine.depth}\n")
+            out.write("===============\n\n")
+
+        if cache:
+            out.write(cache.report() + "\n")
+        if build:
+            out.write(build.report() + "\n")
+    except RuntimeError as e:
+        out.flush()
+        print(f"runtime error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        out.close()
+
+    if args.stats is not None:
+        st.dump(args.stats, file=src_file)
 
 if __name__ == "__main__":
     main()
@@ -1,38 +1,245 @@
 # optimizer.py
 # ------------------------------------------
-# Simple optimizer for TAC (constant folding, dead code removal)
+# Optimizer for TAC
+#  level 1: single indexed pass over temps (constant folding,
+#           dead temp removal), linear in the number of TAC lines
+#  level 2: + inlining of small / single-use callees (inline.py),
+#           per-function CFG dataflow (global constant and copy
+#           propagation, branch folding, dead-store elimination)
+#  level 3: + loop optimizations (loops.py): invariant code motion,
+#           strength reduction, optional unrolling; then an SSA
+#           round trip (ssa.py): conditional constant propagation
+#           and global value numbering / CSE
 # ------------------------------------------
 
-import re
+from tac import Op, Instr, EVAL, is_num, is_temp, is_name
+from cfg import (split_funcs, join_funcs, build_cfg, reachable, flatten, defined, pure,
+                 names_in, ReachingDefs, Liveness, AvailableCopies)
 
-def optimize(tac_lines):
+MAX_ROUNDS = 20
+
+def fold(sym, a, b):
+    # returns the folded value or None when it must be left for run time
+    if not (is_num(a) and is_num(b)) or sym not in EVAL: return None
+    if sym == "/" and b == 0: return None
+    return EVAL[sym](a, b)
+
+def optimize(tac, level=3, stats=None, unroll=0):
+    # temp names restart in every function, so each pass sees one function;
+    # from level 2 functions go callees first, so calls can be inlined
+    # (inline.py) from already optimized bodies. `stats` collects the
+    # counters of the inliner and the level-3 passes, `unroll` is the
+    # size budget (instructions) for fully unrolled loops, 0 for none
+    funcs = split_funcs(tac)
+    if level < 2:
+        return join_funcs([(name, local_pass(body)) for name, body in funcs])
+    from inline import CallGraph, inline_calls
+    graph = CallGraph(funcs)
+    out = [None] * len(funcs); done = {}
+    for i in graph.order():
+        name, body = funcs[i]
+        body = optimize_body(inline_calls(body, done, graph, stats), level, stats, unroll)
+        out[i] = (name, body)
+        if graph.index.get(name) == i: done[name] = body
+    return join_funcs(out)
+
+def optimize_body(body, level=3, stats=None, unroll=0):
+    code = local_pass(body)
+    if level < 2: return code
+    code = optimize_func(code)
+    if level < 3: return code
+    from loops import loop_optimize
+    from ssa import ssa_optimize
+    code = loop_optimize(code, unroll, stats)
+    return optimize_func(ssa_optimize(code, stats))
+
+def local_pass(tac):
     optimized = []
-    consts = {}
-
-    for line in tac_lines:
-        m = re.match(r"(T\d+)\s*=\s*([0-9.]+)\s*([\+\-\*/])\s*([0-9.]+)", line)
-        if m:
-            # Constant folding: compute constants
-            t, a, op, b = m.groups()
-            val = eval(f"{a}{op}{b}")
-            optimized.append(f"{t} = {val}")
-            consts[t] = str(val)
-            continue
+    consts = {}     # temp -> constant value
+    defs = {}       # temp -> index of its defining instruction
+    uses = {}       # operand -> use count
 
+    for ins in tac:
+        op = ins.op
+        a, b = ins.a, ins.b
         # Replace known constants
-        for c, v in consts.items():
-            if re.search(rf"\b{c}\b", line):
-                line = re.sub(rf"\b{c}\b", v, line)
+        if a.__class__ is str and a in consts: a = consts[a]
+        if b.__class__ is str and b in consts: b = consts[b]
+
+        if op is Op.BIN:
+            val = fold(ins.sym, a, b)
+            if val is not None:
+                # Constant folding: compute constants
+                ins = Instr(Op.COPY, ins.dst, val)
+            elif a is not ins.a or b is not ins.b:
+                ins = Instr(op, ins.dst, a, ins.sym, b)
+        elif a is not ins.a:
+            ins = Instr(op, ins.dst, a)
+
+        if ins.op is Op.COPY and is_temp(ins.dst) and not is_name(ins.a):
+            consts[ins.dst] = ins.a
+        if pure(ins) and is_temp(ins.dst):
+            defs[ins.dst] = len(optimized)
+        for u in ins.uses():
+            if u.__class__ is str: uses[u] = uses.get(u, 0) + 1
+        optimized.append(ins)
+
+    # Dead code elimination (remove temp results never used);
+    # walking backwards lets a removal free the temps it read
+    dead = bytearray(len(optimized))
+    for i in range(len(optimized) - 1, -1, -1):
+        ins = optimized[i]
+        if defs.get(ins.dst) == i and not uses.get(ins.dst):
+            dead[i] = 1
+            for u in ins.uses():
+                if u.__class__ is str: uses[u] -= 1
+    return [ins for i, ins in enumerate(optimized) if not dead[i]]
+
+
+# ---- global (dataflow) passes ----
+
+NOTC = object()     # "not a constant" marker
+
+def is_const(x): return x is not None and not is_name(x)
+def same_const(x, y): return x.__class__ is y.__class__ and x == y
 
-        optimized.append(line)
+def optimize_func(body):
+    # temps are assigned once by TACGen, so their single def dominates every
+    # use and plain def/use maps are exact; only other names (variables, or
+    # a temp that somehow has several defs) go through the bitset dataflow
+    for _ in range(MAX_ROUNDS):
+        blocks = reachable(build_cfg(body))
+        ndefs = {}
+        for b in blocks:
+            for ins in b.code:
+                d = defined(ins)
+                if d is not None: ndefs[d] = ndefs.get(d, 0) + 1
+        single = {t for t, n in ndefs.items() if n == 1 and is_temp(t)}
+        track = names_in(blocks) - single
+        changed = propagate_consts(blocks, track, single)
+        changed |= propagate_copies(blocks)
+        changed |= eliminate_dead(blocks, track)
+        new = flatten(blocks)
+        if not changed and len(new) == len(body): return new
+        body = new
+    return body
 
-    # Dead code elimination (remove temp results never used)
-    used = set()
-    for l in optimized:
-        for t in re.findall(r"\bT\d+\b", l):
-            used.add(t)
-    final = [l for l in optimized if not re.match(r"(T\d+)\s*=", l) or re.match(r"(T\d+)\s*=", l).group(1) in used]
-    return final
+def propagate_consts(blocks, track, single):
+    rd = ReachingDefs(blocks, track)
+    val = {}        # id(original def) -> constant or NOTC
+    temp_def = {}   # single-def temp -> original defining instr
+    for b in blocks:
+        for ins in b.code:
+            if ins.dst in single and defined(ins): temp_def[ins.dst] = ins
+
+    def def_value(d):
+        v = val.get(id(d))
+        if v is None:
+            v = d.a if d.op is Op.COPY and is_const(d.a) else NOTC
+        return v
+
+    def lookup(x, u):
+        if u.__class__ is not str: return u
+        if u in single:
+            d = temp_def.get(u)
+            v = def_value(d) if d is not None else NOTC
+        else:
+            v = NOTC
+            for d in rd.reaching(x, u):
+                dv = NOTC if d is None else def_value(d)
+                if dv is NOTC or (v is not NOTC and not same_const(v, dv)): v = NOTC; break
+                v = dv
+        return u if v is NOTC else v
+
+    changed = False
+    for b in blocks:
+        x = rd.before[b.id]; code = []
+        for ins in b.code:
+            op = ins.op
+            new = ins
+            if op in (Op.COPY, Op.BIN, Op.PRINT, Op.IF, Op.IFZ, Op.RETURN, Op.PARAM):
+                a = lookup(x, ins.a)
+                bb = lookup(x, ins.b) if op is Op.BIN else ins.b
+                if op is Op.BIN:
+                    v = fold(ins.sym, a, bb)
+                    if v is not None: new = Instr(Op.COPY, ins.dst, v)
+                    elif a is not ins.a or bb is not ins.b: new = Instr(op, ins.dst, a, ins.sym, bb)
+                elif op is Op.IF or op is Op.IFZ:
+                    if is_num(a) or isinstance(a, bool):
+                        # branch on a known condition
+                        if bool(a) == (op is Op.IF): new = Instr(Op.GOTO, ins.dst)
+                        else: new = None
+                    elif a is not ins.a: new = Instr(op, ins.dst, a)
+                elif a is not ins.a:
+                    new = Instr(op, ins.dst, a)
+            if defined(ins):
+                val[id(ins)] = new.a if new.op is Op.COPY and is_const(new.a) else NOTC
+            x = rd.step(x, ins)
+            if new is not ins: changed = True
+            if new is not None: code.append(new)
+        b.code = code
+    return changed
+
+def propagate_copies(blocks):
+    ac = AvailableCopies(blocks)
+    if not ac.copies: return False
+    changed = False
+    for b in blocks:
+        x = ac.before[b.id]; code = []
+        for ins in b.code:
+            new = ins
+            a = ins.a; bb = ins.b
+            if ins.op in (Op.COPY, Op.BIN, Op.PRINT, Op.IF, Op.IFZ, Op.RETURN, Op.PARAM):
+                if is_name(a): a = ac.source(x, a) or a
+                if ins.op is Op.BIN and is_name(bb): bb = ac.source(x, bb) or bb
+                if a is not ins.a or bb is not ins.b:
+                    new = Instr(ins.op, ins.dst, a, ins.sym, bb); changed = True
+            x = ac.step(x, ins)
+            code.append(new)
+        b.code = code
+    return changed
+
+def eliminate_dead(blocks, track):
+    lv = Liveness(blocks, track)
+    uses = {}
+    for b in blocks:
+        for ins in b.code:
+            for u in ins.uses():
+                if u.__class__ is str: uses[u] = uses.get(u, 0) + 1
+    changed = False
+    for b in reversed(blocks):
+        x = lv.after[b.id]; code = []
+        for ins in reversed(b.code):
+            d = defined(ins)
+            if d is not None and (pure(ins) or ins.op is Op.ARG) and (
+                    (d in lv.bit and not lv.live(x, d)) or (d not in lv.bit and not uses.get(d))):
+                # dead store: drop it and release what it read (a call
+                # stays for what it prints, a division that may fault too)
+                for u in ins.uses():
+                    if u.__class__ is str and u in uses: uses[u] -= 1
+                changed = True
+                continue
+            x = lv.step(x, ins)
+            code.append(ins)
+        code.reverse(); b.code = code
+    return changed
+
+
+def bench(sizes=(1000, 4000, 16000, 64000)):
+    # synthetic straight-line + loop code; time per TAC line should stay flat
+    import time
+    from lexical import tokenize
+    from parser import Parser
+    from codegen import TACGen
+    print("===== OPTIMIZER SCALING =====")
+    for n in sizes:
+        body = "".join(f"v{k} = (v{k-1} + {k}) * 2 - {k % 7};\n" if k % 10 else
+                       f"while (v{k-1} < {k}) {{ v{k-1} = v{k-1} + 1 * 3; }}\nv{k} = 1 + 2;\n"
+                       for k in range(1, n // 6))
+        tac = TACGen().gen(Parser(list(tokenize("func main() { v0 = 0;\n" + body + "}"))).parse())
+        t0 = time.perf_counter(); opt = local_pass(tac); dt = time.perf_counter() - t0
+        print(f"{len(tac):>8} lines -> {len(opt):>8}  {dt*1000:9.2f} ms  {dt/len(tac)*1e6:6.3f} us/line")
+    print("=============================\n")
 
 
 if __name__ == "__main__":
@@ -42,8 +249,10 @@ if __name__ == "__main__":
     from codegen import TACGen
 
     if len(sys.argv) < 2:
-        print("Usage: python optimizer.py sample.src")
+        print("Usage: python optimizer.py sample.src | --bench")
         sys.exit()
+    if sys.argv[1] == "--bench":
+        bench(); sys.exit()
 
     src = open(sys.argv[1]).read()
     toks = list(tokenize(src))
@@ -1,14 +1,17 @@
 # parser.py
 # ------------------------------------------
-# Recursive-descent parser for MiniCompiler
+# Parser for MiniCompiler (explicit stacks,
+# no recursion)
 # Produces indented syntax tree (P1 format)
 # ------------------------------------------
 
 from lexical import tokenize, Token
 import sys
 
-# AST node classes
-class Node: pass
+# AST node classes; semantic.analyze sets type / bind on the nodes
+class Node:
+    type=None       # expression type
+    bind=None       # (function, slot) of a VarRef / VarAssign
 class Program(Node): 
     def __init__(self,funcs): self.funcs=funcs
 class FuncDecl(Node):
@@ -44,9 +47,27 @@ class FuncCall(Node):
     def __init__(self,name,args): self.name=name; self.args=args
 
 class Parser:
-    def __init__(self,tokens): self.toks=tokens; self.i=0
-    def peek(self): return self.toks[self.i] if self.i<len(self.toks) else None
-    def next(self): t=self.peek(); self.i+=1; return t
+    # tokens may be a list or a lazy stream (lexical.tokenize_file);
+    # only a small lookahead buffer is kept
+    # node constructors are looked up on the parser, so arena.Arena can
+    # swap in its own and get flat node tables instead of objects
+    Program=Program; FuncDecl=FuncDecl; Block=Block; VarAssign=VarAssign
+    PrintStmt=PrintStmt; IfStmt=IfStmt; WhileStmt=WhileStmt; ReturnStmt=ReturnStmt
+    ExprStmt=ExprStmt; BinOp=BinOp; Number=Number; String=String; Char=Char
+    VarRef=VarRef; FuncCall=FuncCall
+    def __init__(self,tokens): self.toks=iter(tokens); self.la=[]
+    def peek(self,k=0):
+        la=self.la
+        if len(la)>k: return la[k]
+        while len(la)<=k:
+            t=next(self.toks,None)
+            if t is None: return None
+            la.append(t)
+        return la[k]
+    def next(self):
+        la=self.la
+        if la: return la.pop(0)
+        return next(self.toks,None)
     def expect(self,typ):
         t=self.peek()
         if not t or t.type!=typ:
@@ -56,7 +77,7 @@ class Parser:
     def parse(self):
         funcs=[]
         while self.peek(): funcs.append(self.func())
-        return Program(funcs)
+        return self.Program(funcs)
 
     def func(self):
         self.expect("FUNC")
@@ -68,109 +89,158 @@ class Parser:
                 self.next(); params.append(self.expect("ID").value)
         self.expect("RPAREN")
         body=self.block()
-        return FuncDecl(name,params,body)
+        return self.FuncDecl(name,params,body)
+
+    # Statements and expressions are parsed with explicit stacks rather
+    # than recursion, so nesting depth is bounded by memory only.
 
     def block(self):
-        self.expect("LBRACE"); stmts=[]
-        while self.peek() and self.peek().type!="RBRACE":
-            stmts.append(self.stmt())
-        self.expect("RBRACE")
-        return Block(stmts)
+        self.expect("LBRACE")
+        return self.nest(("block",))
+
+    def opener(self):
+        # consumes the header of a compound statement up to its '{'
+        t=self.next()
+        if t.type=="LBRACE": return ("block",)
+        self.expect("LPAREN"); cond=self.expr(); self.expect("RPAREN")
+        self.expect("LBRACE")
+        return ("if",cond) if t.type=="IF" else ("while",cond)
+
+    def nest(self,head):
+        # statements up to the '}' closing an opened block; each open
+        # block is (head, stmts) where head says what the block becomes
+        stack=[(head,[])]
+        while True:
+            t=self.peek()
+            if t is None or t.type=="RBRACE":
+                self.expect("RBRACE")
+                head,stmts=stack.pop()
+                body=self.Block(stmts)
+                kind=head[0]
+                if kind=="if":
+                    if self.peek() and self.peek().type=="ELSE":
+                        self.next(); self.expect("LBRACE")
+                        stack.append((("else",head[1],body),[])); continue
+                    s=self.IfStmt(head[1],body,None)
+                elif kind=="else": s=self.IfStmt(head[1],head[2],body)
+                elif kind=="while": s=self.WhileStmt(head[1],body)
+                else: s=body
+                if not stack: return s
+                stack[-1][1].append(s)
+            elif t.type in ("IF","WHILE","LBRACE"):
+                stack.append((self.opener(),[]))
+            else:
+                stack[-1][1].append(self.stmt())
 
     def stmt(self):
         t=self.peek()
         if not t: return None
         if t.type=="ID":
             name=t.value
-            nxt=self.toks[self.i+1] if self.i+1<len(self.toks) else None
+            nxt=self.peek(1)
             if nxt and nxt.type=="ASSIGN":
                 self.next(); self.next()
                 expr=self.expr(); self.expect("SEMI")
-                return VarAssign(name,expr)
-            expr=self.expr(); self.expect("SEMI"); return ExprStmt(expr)
+                return self.VarAssign(name,expr)
+            expr=self.expr(); self.expect("SEMI"); return self.ExprStmt(expr)
         if t.type=="PRINT":
             self.next(); self.expect("LPAREN"); e=self.expr()
-            self.expect("RPAREN"); self.expect("SEMI"); return PrintStmt(e)
-        if t.type=="IF":
-            self.next(); self.expect("LPAREN"); cond=self.expr(); self.expect("RPAREN")
-            thenb=self.block()
-            elseb=None
-            if self.peek() and self.peek().type=="ELSE":
-                self.next(); elseb=self.block()
-            return IfStmt(cond,thenb,elseb)
-        if t.type=="WHILE":
-            self.next(); self.expect("LPAREN"); cond=self.expr(); self.expect("RPAREN")
-            body=self.block(); return WhileStmt(cond,body)
+            self.expect("RPAREN"); self.expect("SEMI"); return self.PrintStmt(e)
+        if t.type in ("IF","WHILE","LBRACE"): return self.nest(self.opener())
         if t.type=="RETURN":
-            self.next(); e=self.expr(); self.expect("SEMI"); return ReturnStmt(e)
-        if t.type=="LBRACE": return self.block()
-        expr=self.expr(); self.expect("SEMI"); return ExprStmt(expr)
+            self.next(); e=self.expr(); self.expect("SEMI"); return self.ReturnStmt(e)
+        expr=self.expr(); self.expect("SEMI"); return self.ExprStmt(expr)
 
-    # expression parsing (precedence climbing)
+    # expression parsing (operator precedence with explicit stacks)
     prec={"EQEQ":3,"NE":3,"LT":4,"GT":4,"LE":4,"GE":4,"PLUS":5,"MINUS":5,"TIMES":6,"DIVIDE":6}
-    def expr(self,minp=0):
-        left=self.atom()
+    def expr(self):
+        # Operands and pending operators of the innermost open '(' or
+        # call argument; enclosing ones are saved on `frames` together
+        # with the call being built, if any. Operators of equal
+        # precedence reduce left to right, as before.
+        prec=self.prec; BinOp=self.BinOp; peek=self.peek; nxt=self.next
+        vals=[]; ops=[]; frames=[]
         while True:
-            op=self.peek()
-            if not op or op.type not in self.prec: break
-            p=self.prec[op.type]
-            if p<minp: break
-            self.next()
-            right=self.expr(p+1)
-            left=BinOp(op.type,left,right)
-        return left
+            # an operand is expected here
+            t=nxt()
+            if t is None: raise SyntaxError("Unexpected end of input")
+            typ=t.type
+            if typ=="LPAREN":
+                frames.append((vals,ops,None)); vals=[]; ops=[]; continue
+            if typ=="ID":
+                la=peek()
+                if la is not None and la.type=="LPAREN":
+                    nxt(); la=peek()
+                    if la is None or la.type!="RPAREN":
+                        frames.append((vals,ops,(t.value,[]))); vals=[]; ops=[]; continue
+                    nxt(); vals.append(self.FuncCall(t.value,[]))
+                else:
+                    vals.append(self.VarRef(t.value))
+            else:
+                vals.append(self.atom(t))
+            # after an operand: binary operators, or the end of a frame
+            while True:
+                op=peek()
+                p=prec.get(op.type) if op is not None else None
+                if p is not None:
+                    while ops and prec[ops[-1]]>=p:
+                        r=vals.pop(); vals.append(BinOp(ops.pop(),vals.pop(),r))
+                    ops.append(op.type); nxt()
+                    break
+                while ops:
+                    r=vals.pop(); vals.append(BinOp(ops.pop(),vals.pop(),r))
+                e=vals.pop()
+                if not frames: return e
+                vals,ops,call=frames.pop()
+                if call is None:
+                    self.expect("RPAREN"); vals.append(e); continue
+                call[1].append(e)
+                if op is not None and op.type=="COMMA":
+                    nxt(); frames.append((vals,ops,call)); vals=[]; ops=[]
+                    break
+                self.expect("RPAREN"); vals.append(self.FuncCall(*call))
 
-    def atom(self):
-        t=self.next()
-        if t.type in ("INT","FLOAT","BOOL"): return Number(t.value)
-        if t.type=="STRING": return String(t.value)
-        if t.type=="CHAR": return Char(t.value)
-        if t.type=="ID":
-            if self.peek() and self.peek().type=="LPAREN":
-                self.next()
-                args=[]
-                if self.peek() and self.peek().type!="RPAREN":
-                    args.append(self.expr())
-                    while self.peek() and self.peek().type=="COMMA":
-                        self.next(); args.append(self.expr())
-                self.expect("RPAREN"); return FuncCall(t.value,args)
-            return VarRef(t.value)
-        if t.type=="LPAREN":
-            e=self.expr(); self.expect("RPAREN"); return e
+    def atom(self,t):
+        if t.type in ("INT","FLOAT","BOOL"): return self.Number(t.value)
+        if t.type=="STRING": return self.String(t.value)
+        if t.type=="CHAR": return self.Char(t.value)
+        if t.type=="ID": return self.VarRef(t.value)
         raise SyntaxError(f"Unexpected {t.type}")
 
-# pretty print AST
-def print_ast(node, indent=0, prefix=""):
-    sp=" "*(indent*2)
-    if isinstance(node, Program):
-        print(sp+"Program")
-        for f in node.funcs: print_ast(f, indent+1, "└── ")
-    elif isinstance(node, FuncDecl):
-        print(sp+f"{prefix}Function: {node.name}")
-        print_ast(node.body, indent+1)
-    elif isinstance(node, Block):
-        print(sp+f"{prefix}Block")
-        for i,s in enumerate(node.stmts):
-            mark="├── " if i<len(node.stmts)-1 else "└── "
-            print_ast(s, indent+1, mark)
-    elif isinstance(node, VarAssign):
-        print(sp+f"{prefix}Assignment: {node.name} = ...")
-    elif isinstance(node, PrintStmt):
-        print(sp+f"{prefix}Print: ...")
-    elif isinstance(node, IfStmt):
-        print(sp+f"{prefix}If (...)")
-        print_ast(node.thenb, indent+1, "├── ")
-        if node.elseb:
-            print_ast(node.elseb, indent+1, "└── ")
-    elif isinstance(node, WhileStmt):
-        print(sp+f"{prefix}While (...)")
-        print_ast(node.body, indent+1, "└── ")
-    elif isinstance(node, ReturnStmt):
-        print(sp+f"{prefix}Return: ...")
-    elif isinstance(node, ExprStmt):
-        print(sp+f"{prefix}Expr: ...")
-    else:
-        print(sp+f"{prefix}{type(node).__name__}")
+# pretty print AST (explicit stack, children pushed in reverse)
+def print_ast(node, indent=0, prefix="", out=None):
+    stack=[(node,indent,prefix)]
+    while stack:
+        node,indent,prefix=stack.pop()
+        sp=" "*(indent*2)
+        if isinstance(node, Program):
+            print(sp+"Program", file=out)
+            stack.extend((f,indent+1,"└── ") for f in reversed(node.funcs))
+        elif isinstance(node, FuncDecl):
+            print(sp+f"{prefix}Function: {node.name}", file=out)
+            stack.append((node.body,indent+1,""))
+        elif isinstance(node, Block):
+            print(sp+f"{prefix}Block", file=out)
+            n=len(node.stmts)
+            stack.extend((s,indent+1,"├── " if i<n-1 else "└── ") for i,s in reversed(list(enumerate(node.stmts))))
+        elif isinstance(node, VarAssign):
+            print(sp+f"{prefix}Assignment: {node.name} = ...", file=out)
+        elif isinstance(node, PrintStmt):
+            print(sp+f"{prefix}Print: ...", file=out)
+        elif isinstance(node, IfStmt):
+            print(sp+f"{prefix}If (...)", file=out)
+            if node.elseb:
+                stack.append((node.elseb,indent+1,"└── "))
+            stack.append((node.thenb,indent+1,"├── "))
+        elif isinstance(node, WhileStmt):
+            print(sp+f"{prefix}While (...)", file=out)
+            stack.append((node.body,indent+1,"└── "))
+        elif isinstance(node, ReturnStmt):
+            print(sp+f"{prefix}Return: ...", file=out)
+        elif isinstance(node, ExprStmt):
+            print(sp+f"{prefix}Expr: ...", file=out)
+        else:
+            print(sp+f"{prefix}{type(node).__name__}", file=out)
 
 if __name__ == "__main__":
     if len(sys.argv)<2:
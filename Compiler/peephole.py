@@ -0,0 +1,202 @@
+# peephole.py
+# ------------------------------------------
+# Peephole pass over one function's assembly:
+# rules are indexed by the opcode that opens
+# their window, each sweep is one walk over
+# the code, and sweeps repeat until no rule
+# fires; hits are counted per rule
+# ------------------------------------------
+
+import re
+
+MAX_ROUNDS = 20
+JUMPS = ("JMP", "JZ", "JNZ")
+OPND = re.compile(r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|\S+')
+NUM = re.compile(r"-?\d+(\.\d*)?([eE][-+]?\d+)?$")
+
+# ---- lines <-> (op, dst, a, sym, b) ----
+
+def parse(line):
+    if line.endswith(":") and " " not in line: return ("LABEL", line[:-1], None, None, None)
+    op, _, rest = line.partition(" ")
+    if op == "MOV":
+        dst, _, rhs = rest.partition(" = ")
+        t = OPND.findall(rhs)
+        if len(t) == 3: return (op, dst, t[0], t[1], t[2])
+        return (op, dst, rhs, None, None)
+    if op in JUMPS: return (op, rest, None, None, None)
+    return (op, None, rest, None, None)
+
+def fmt(ins):
+    op, dst, a, sym, b = ins
+    if op == "LABEL": return f"{dst}:"
+    if op == "MOV": return f"MOV {dst} = {a} {sym} {b}" if sym else f"MOV {dst} = {a}"
+    if op in JUMPS: return f"{op} {dst}"
+    return f"{op} {a}"
+
+def is_loc(x):
+    # register, spill slot or name; not a literal
+    return x is not None and x != "None" and x[:1] not in "\"'" and not NUM.match(x)
+
+# ---- analyses over the code a sweep starts from ----
+
+def liveness(code):
+    # -> ({location: bit}, [live-after bitset per instruction])
+    bit = {}
+    def mask(xs):
+        m = 0
+        for x in xs:
+            if is_loc(x): m |= bit.setdefault(x, 1 << len(bit))
+        return m
+    n = len(code)
+    at = {ins[1]: i for i, ins in enumerate(code) if ins[0] == "LABEL"}
+    use = [0] * n; kill = [0] * n; succ = [()] * n
+    for i, (op, dst, a, sym, b) in enumerate(code):
+        nxt = (i + 1,) if i + 1 < n else ()
+        tgt = (at[dst],) if op in JUMPS and dst in at else ()
+        if op == "MOV": use[i] = mask((a, b)); kill[i] = mask((dst,))
+        elif op != "LABEL" and op not in JUMPS: use[i] = mask((a,))
+        succ[i] = tgt if op == "JMP" else () if op == "RET" else nxt + tgt
+    live_in = [0] * n; live_out = [0] * n
+    changed = True
+    while changed:
+        changed = False
+        for i in range(n - 1, -1, -1):
+            o = 0
+            for s in succ[i]: o |= live_in[s]
+            x = use[i] | (o & ~kill[i])
+            if x != live_in[i] or o != live_out[i]:
+                live_in[i] = x; live_out[i] = o; changed = True
+    return bit, live_out
+
+def chains(code):
+    # label -> label its chain of 'L: JMP M' hops ends at (cycles left out)
+    hop = {}; pending = []
+    for ins in code:
+        if ins[0] == "LABEL": pending.append(ins[1]); continue
+        if ins[0] == "JMP":
+            for L in pending: hop[L] = ins[1]
+        pending = []
+    final = {}
+    for L, M in hop.items():
+        seen = {L}
+        while M in hop and M not in seen: seen.add(M); M = hop[M]
+        if M not in seen: final[L] = M
+    return final
+
+class Sweep:
+    # state shared by the rules during one walk; the analyses describe
+    # the code at the start of the walk, which stays a safe
+    # over-approximation while the rules remove code and edges
+    def __init__(self, code):
+        self.code = code
+        self.refs = {}
+        for ins in code:
+            if ins[0] in JUMPS: self.refs[ins[1]] = self.refs.get(ins[1], 0) + 1
+        self.final = chains(code)
+        self.removed = set()    # labels dropped during this walk
+        self._live = None
+
+    def unref(self, L): self.refs[L] -= 1
+
+    def live_after(self, i, x):
+        if self._live is None: self._live = liveness(self.code)
+        bit, out = self._live
+        return bool(out[i] & bit.get(x, 0))
+
+# ---- rules: (code, i, sweep) -> (lines consumed, replacement) or None ----
+
+def jump_next(code, i, sw):
+    # JMP to a label that follows anyway (TACGen's GOTO after every branch)
+    L = code[i][1]; j = i + 1
+    while j < len(code) and code[j][0] == "LABEL":
+        if code[j][1] == L: sw.unref(L); return 1, []
+        j += 1
+    return None
+
+def thread(code, i, sw):
+    # jump to a label that only jumps on -> jump to where the chain ends
+    op, L = code[i][0], code[i][1]
+    M = sw.final.get(L)
+    if M is None or M in sw.removed: return None
+    sw.unref(L); sw.refs[M] = sw.refs.get(M, 0) + 1
+    return 1, [(op, M, None, None, None)]
+
+def unreachable(code, i, sw):
+    # nothing between a JMP/RET and the next label can run
+    j = i + 1
+    while j < len(code) and code[j][0] != "LABEL":
+        if code[j][0] in JUMPS: sw.unref(code[j][1])
+        j += 1
+    if j == i + 1: return None
+    return j - i, [code[i]]
+
+def const_branch(code, i, sw):
+    # CMP/CMPZ on a constant decides the branch after it; the constant
+    # may come through a MOV into a location nothing else reads
+    k = i; c = code[i][2]
+    if code[i][0] == "MOV":
+        t = code[i][1]; k = i + 1
+        if code[i][3] is not None or k >= len(code): return None
+        if code[k][0] not in ("CMP", "CMPZ") or code[k][2] != t: return None
+    if k + 1 >= len(code): return None
+    op = code[k][0]; br = code[k + 1]
+    if not NUM.match(c) or br[0] != ("JNZ" if op == "CMP" else "JZ"): return None
+    if k > i and sw.live_after(k, t): return None
+    if (float(c) != 0) == (op == "CMP"): return k + 2 - i, [("JMP", br[1], None, None, None)]
+    sw.unref(br[1])
+    return k + 2 - i, []
+
+def self_move(code, i, sw):
+    op, dst, a, sym, b = code[i]
+    return (1, []) if sym is None and a == dst else None
+
+def mov_fold(code, i, sw):
+    # MOV t = e; MOV v = t with t dead afterwards -> MOV v = e
+    if i + 1 >= len(code): return None
+    op, t, a, sym, b = code[i]; nx = code[i + 1]
+    if nx[0] != "MOV" or nx[3] is not None or nx[2] != t or nx[1] == t: return None
+    if sw.live_after(i + 1, t): return None
+    return 2, [("MOV", nx[1], a, sym, b)]
+
+def dead_label(code, i, sw):
+    L = code[i][1]
+    if sw.refs.get(L, 0): return None
+    sw.removed.add(L)
+    return 1, []
+
+# opcode at the head of the window -> rules tried there, in order
+RULES = {
+    "JMP":   [("jump_next", jump_next), ("thread", thread), ("unreachable", unreachable)],
+    "JZ":    [("thread", thread)],
+    "JNZ":   [("thread", thread)],
+    "RET":   [("unreachable", unreachable)],
+    "CMP":   [("const_branch", const_branch)],
+    "CMPZ":  [("const_branch", const_branch)],
+    "MOV":   [("self_move", self_move), ("mov_fold", mov_fold), ("const_branch", const_branch)],
+    "LABEL": [("dead_label", dead_label)],
+}
+RULE_NAMES = list(dict.fromkeys(name for rules in RULES.values() for name, _ in rules))
+
+def sweep(code, hits):
+    sw = Sweep(code); out = []; i = 0; n = len(code); fired = False
+    while i < n:
+        for name, rule in RULES.get(code[i][0], ()):
+            r = rule(code, i, sw)
+            if r is not None:
+                k, new = r; out.extend(new); i += k
+                hits[name] = hits.get(name, 0) + 1; fired = True
+                break
+        else:
+            out.append(code[i]); i += 1
+    return out, fired
+
+def peephole(lines, hits=None):
+    # lines of one function body (no function label or comments);
+    # `hits` collects {rule: times fired}
+    if hits is None: hits = {}
+    code = [parse(line) for line in lines]
+    for _ in range(MAX_ROUNDS):
+        code, fired = sweep(code, hits)
+        if not fired: break
+    return [fmt(ins) for ins in code]
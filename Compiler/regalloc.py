@@ -0,0 +1,149 @@
+# regalloc.py
+# ------------------------------------------
+# Live intervals over a function's TAC, temp
+# reuse, and linear-scan allocation of temps
+# and locals onto a fixed register file with
+# spill slots (Poletto & Sarkar)
+# ------------------------------------------
+
+from bisect import bisect_left
+from tac import Op, Instr, is_name, is_temp
+from cfg import build_cfg, defined, Liveness
+
+REGS = 8
+
+class Interval:
+    __slots__=("name","start","end","born","loc")
+    def __init__(self,name,pos):
+        self.name=name; self.start=self.end=pos
+        self.born=False     # defined (not read) at `start`
+        self.loc=None
+    def __repr__(self): return f"{self.name}[{self.start},{self.end}]@{self.loc}"
+
+def intervals(body):
+    # name -> Interval, positions are indexes into body; a name's
+    # interval is the hull of every point where it is live
+    blocks=build_cfg(body)
+    lv=Liveness(blocks)
+    names=[None]*len(lv.bit)
+    for nm,m in lv.bit.items(): names[m.bit_length()-1]=nm
+    iv={}
+    def touch(nm,p):
+        r=iv.get(nm)
+        if r is None: iv[nm]=Interval(nm,p)
+        elif p<r.start: r.start=p
+        elif p>r.end: r.end=p
+    def each(x):
+        while x:
+            low=x&-x; yield names[low.bit_length()-1]; x^=low
+    pos=0
+    for b in blocks:
+        first=pos; last=pos+len(b.code)-1
+        for nm in each(lv.before[b.id]): touch(nm,first)
+        for ins in b.code:
+            for u in ins.uses():
+                if is_name(u): touch(u,pos)
+            d=defined(ins)
+            if d is not None:
+                touch(d,pos)
+                if iv[d].start==pos and d not in ins.uses(): iv[d].born=True
+            pos+=1
+        for nm in each(lv.after[b.id]): touch(nm,last)
+    return iv
+
+def linear_scan(iv,body,regs=REGS):
+    # assigns each interval a register name or a spill slot; returns
+    # the number of spills. regs=None means an unbounded register file.
+    # Every register is caller-saved, so with a real register file an
+    # interval that spans a CALL lives in a spill slot.
+    order=sorted(iv.values(),key=lambda r:(r.start,r.end))
+    calls=[p for p,ins in enumerate(body) if ins.op is Op.CALL] if regs is not None else []
+    def spans_call(r):
+        k=bisect_left(calls,r.start)
+        if k<len(calls) and calls[k]==r.start and r.born: k+=1    # the call's own result
+        return k<len(calls) and calls[k]<=r.end
+    hint={}     # 'd = s' at p with s ending there: d would like s's register
+    for p,ins in enumerate(body):
+        if ins.op is Op.COPY and is_name(ins.a) and ins.a in iv and iv[ins.a].end==p:
+            hint[ins.dst]=ins.a
+    free=list(range(regs)) if regs is not None else []
+    nxt=0; active=[]; spills=0
+    for r in order:
+        # expire intervals that end before r starts; one that ends where r
+        # is born is read by the very instruction that defines r
+        keep=[]
+        for a in active:
+            if a.end<r.start or (a.end==r.start and r.born): free.append(a.loc)
+            else: keep.append(a)
+        active=keep
+        if calls and spans_call(r):
+            r.loc=("spill",spills); spills+=1
+            continue
+        h=hint.get(r.name)
+        h=iv[h].loc if h is not None else None
+        if h is not None and h in free:
+            free.remove(h); r.loc=h
+        elif free:
+            free.sort(); r.loc=free.pop(0)
+        elif regs is None:
+            r.loc=nxt; nxt+=1
+        else:
+            # spill whichever of r and the active intervals ends last
+            far=max(active,key=lambda a:a.end) if active else None
+            if far is not None and far.end>r.end:
+                r.loc=far.loc; far.loc=("spill",spills); active.remove(far)
+            else:
+                r.loc=("spill",spills)
+            spills+=1
+            if isinstance(r.loc,tuple): continue
+        if regs is None: nxt=max(nxt,r.loc+1)
+        active.append(r)
+    return spills
+
+def read_first(iv):
+    # names read before any write (live on entry); they start out as 0
+    return sorted(nm for nm,r in iv.items() if r.start==0 and not r.born)
+
+def loc_name(loc,prefix="R"):
+    if isinstance(loc,tuple): return f"[sp+{loc[1]}]"
+    return f"{prefix}{loc}"
+
+def reuse_temps(body):
+    # renames temps so ones with disjoint live intervals share a name;
+    # variables keep theirs. -> (new body, temps before, temps after)
+    iv={nm:r for nm,r in intervals(body).items() if is_temp(nm)}
+    if not iv: return body,0,0
+    linear_scan(iv,body,None)
+    ren={nm:f"T{r.loc+1}" for nm,r in iv.items()}
+    f=lambda x: ren.get(x,x) if is_name(x) else x
+    out=[]
+    for ins in body:
+        if ins.op in (Op.LABEL,Op.GOTO,Op.FUNC): out.append(ins); continue
+        dst=f(ins.dst) if defined(ins) is not None else ins.dst
+        out.append(Instr(ins.op,dst,f(ins.a),ins.sym,f(ins.b)))
+    return out,len(iv),len(set(ren.values()))
+
+class Allocation:
+    # where every name of one function lives, plus the report numbers
+    def __init__(self,name,body,regs=REGS):
+        self.name=name; self.regs=regs
+        self.iv=intervals(body)
+        self.spills=linear_scan(self.iv,body,regs)
+        self.loc={nm:loc_name(r.loc) for nm,r in self.iv.items()}
+        self.used=sorted({r.loc for r in self.iv.values() if not isinstance(r.loc,tuple)})
+        self.entry=read_first(self.iv)
+        self.moves=0    # copies dropped because both sides share a location
+
+    def operand(self,x):
+        if is_name(x): return self.loc.get(x,x)
+        return str(x)
+
+    def report(self):
+        return {"registers":self.regs,"used":len(self.used),"spills":self.spills,
+                "moves_eliminated":self.moves,"names":len(self.iv)}
+
+    def summary(self):
+        r=self.report()
+        return (f"; {self.name}: {r['used']}/{r['registers']} registers, {r['spills']} spill"
+                f"{'s' if r['spills']!=1 else ''}, {r['moves_eliminated']} move"
+                f"{'s' if r['moves_eliminated']!=1 else ''} eliminated")
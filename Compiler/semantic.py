@@ -1,61 +1,128 @@
 # semantic.py
 # ------------------------------------------
-# Builds symbol table and checks basic types
+# Builds symbol table and checks basic types:
+# every expression node gets its type once
+# (node.type) and every VarRef / VarAssign a
+# (function, slot) binding (node.bind) in its
+# function's own scope
 # ------------------------------------------
 
 from parser import *
-from collections import defaultdict
+
+class FuncScope:
+    # one function's variables: a name is one variable for the whole
+    # function (as in codegen and the VM); params take the first slots
+    __slots__=("name","slots","types")
+    def __init__(self,name): self.name=name; self.slots={}; self.types=[]
+    def bind(self,name,typ=None):
+        # -> slot of name, allocated on first sight; typ fills in a type
+        # still unknown (a name read before it is assigned)
+        s=self.slots.get(name)
+        if s is None:
+            s=self.slots[name]=len(self.types); self.types.append(typ)
+        elif self.types[s] is None:
+            self.types[s]=typ
+        return s
+    def type(self,name):
+        s=self.slots.get(name)
+        return None if s is None else self.types[s] or "int"
 
 class SymbolTable:
-    def __init__(self): self.scopes=[{}]
-    def enter(self): self.scopes.append({})
-    def leave(self): self.scopes.pop()
-    def declare(self,name,typ): self.scopes[-1][name]=typ
-    def lookup(self,name):
-        for s in reversed(self.scopes):
-            if name in s: return s[name]
-        return None
+    def __init__(self): self.globals={}; self.funcs={}
+    def declare(self,name,typ): self.globals[name]=typ
+    def lookup(self,name,func=None):
+        # a local of `func` first, then a global
+        sc=self.funcs.get(func)
+        t=sc.type(name) if sc else None
+        return t if t is not None else self.globals.get(name)
     def dump(self):
-        merged={}
-        for s in self.scopes: merged.update(s)
+        merged=dict(self.globals)
+        for sc in self.funcs.values():
+            for n,s in sc.slots.items(): merged[f"{sc.name}.{n}"]=sc.types[s] or "int"
         return merged
 
-def infer(expr,tab):
+def leaf_type(expr):
     if isinstance(expr,Number): return "float" if isinstance(expr.val,float) else "int"
     if isinstance(expr,String): return "string"
     if isinstance(expr,Char): return "char"
-    if isinstance(expr,VarRef): return tab.lookup(expr.name) or "int"
-    if isinstance(expr,BinOp):
-        lt=infer(expr.left,tab); rt=infer(expr.right,tab)
-        if "float" in (lt,rt): return "float"
-        if "string" in (lt,rt): return "string"
-        return "int"
     return "int"
 
+def combine(a,b):
+    # a BinOp is float if either side is, else string if either is, else int
+    if a=="float" or b=="float": return "float"
+    if a=="string" or b=="string": return "string"
+    return "int"
+
+def annotate(expr,sc):
+    # types every node under expr bottom-up and binds the VarRefs in it,
+    # left to right, with an explicit stack; -> type of expr
+    stack=[(expr,False)]
+    while stack:
+        e,done=stack.pop()
+        if isinstance(e,BinOp):
+            if done: e.type=combine(e.left.type,e.right.type)
+            else: stack.append((e,True)); stack.append((e.right,False)); stack.append((e.left,False))
+        elif isinstance(e,FuncCall):
+            e.type="int"; stack.extend((a,False) for a in reversed(e.args))
+        elif isinstance(e,VarRef):
+            s=sc.bind(e.name); e.bind=(sc.name,s); e.type=sc.types[s] or "int"
+        else:
+            e.type=leaf_type(e)
+    return expr.type
+
+def infer(expr,sc=None):
+    # the type analysis gave expr; computed (and kept) if it has none yet
+    if expr.type is not None: return expr.type
+    return annotate(expr,sc or FuncScope(None))
+
 def analyze(tree):
     tab=SymbolTable()
-    for f in tree.funcs:
-        tab.declare(f.name,"func")
-        tab.enter()
-        for p in f.params: tab.declare(p,"int")
-        analyze_block(f.body,tab)
-        tab.leave()
-    # print symbol table
-    print("===== SYMBOL TABLE =====")
-    for n,t in tab.dump().items():
-        print(f"{n} : {t}")
-    print("========================\n")
+    for f in tree.funcs: tab.declare(f.name,"func")
+    for f in tree.funcs: analyze_func(f,tab)
     return tab
 
-def analyze_block(block,tab):
-    for s in block.stmts:
+def analyze_func(f,tab):
+    # one function in its own scope; only its name is global (a later
+    # definition of the same name replaces the scope, as in the VM)
+    sc=tab.funcs[f.name]=FuncScope(f.name)
+    for p in f.params: sc.bind(p,"int")
+    analyze_block(f.body,sc)
+    return sc
+
+# print symbol table
+def print_symbols(tab,out=None):
+    lines=["===== SYMBOL TABLE ====="]
+    lines.extend(f"{n} : {t}" for n,t in tab.globals.items())
+    for sc in tab.funcs.values():
+        lines.extend(f"{sc.name}.{n} : {sc.types[s] or 'int'} (slot {s})" for n,s in sc.slots.items())
+    lines.append("========================\n")
+    print("\n".join(lines),file=out)
+
+def analyze_block(block,sc):
+    # statements in source order; nested bodies are pushed as iterators
+    stack=[iter(block.stmts)]
+    while stack:
+        s=next(stack[-1],None)
+        if s is None: stack.pop(); continue
         if isinstance(s,VarAssign):
-            t=infer(s.expr,tab)
-            if not tab.lookup(s.name): tab.declare(s.name,t)
+            t=annotate(s.expr,sc)
+            s.bind=(sc.name,sc.bind(s.name,t))
         elif isinstance(s,IfStmt):
-            analyze_block(s.thenb,tab)
-            if s.elseb: analyze_block(s.elseb,tab)
+            annotate(s.cond,sc)
+            if s.elseb: stack.append(iter(s.elseb.stmts))
+            stack.append(iter(s.thenb.stmts))
         elif isinstance(s,WhileStmt):
-            analyze_block(s.body,tab)
+            annotate(s.cond,sc)
+            stack.append(iter(s.body.stmts))
         elif isinstance(s,Block):
-            tab.enter(); analyze_block(s,tab); tab.leave()
+            stack.append(iter(s.stmts))
+        elif isinstance(s,(PrintStmt,ReturnStmt,ExprStmt)):
+            annotate(s.expr,sc)
+
+if __name__ == "__main__":
+    import sys
+    from lexical import tokenize
+    if len(sys.argv)<2:
+        print("Usage: python semantic.py sample.src"); sys.exit()
+    with open(sys.argv[1],'r',encoding='utf-8') as f: src=f.read()
+    print_symbols(analyze(Parser(list(tokenize(src))).parse()))
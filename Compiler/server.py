@@ -0,0 +1,206 @@
+# server.py
+# ------------------------------------------
+# Long-running compile server on a Unix socket
+# requests are JSON lines served concurrently
+# from a pool of warm worker processes, with an
+# in-memory memo of recent results and request
+# latency metrics
+# ------------------------------------------
+
+import os
+import io
+import json
+import math
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from client import default_socket
+
+STAGES = ["tokens", "ast", "symbols", "tac", "opt", "asm"]
+
+# ---- worker side ----
+
+_cache = None       # per worker process
+
+def _init(cache_dir):
+    # imports (and the lexer's tables) are loaded once per worker
+    global _cache
+    import main     # pulls in every phase
+    from cache import Cache
+    _cache = Cache(cache_dir) if cache_dir else None
+
+def compile_stages(src, stages):
+    # -> ({stage: report text}, seconds); runs only as far as the last
+    # stage asked for
+    from cache import PHASES, run_phase, compile_source
+    from semantic import analyze
+    from main import write_report
+    t0 = time.perf_counter()
+    want = {"symbols": "ast"}
+    need = sorted({want.get(s, s) for s in stages}, key=PHASES.index)
+    art = {}
+    if _cache:
+        # deepest first: that fills the cache, the shallower ones are hits
+        for p in reversed(need): art[p] = compile_source(src, _cache, p)
+    else:
+        obj = None
+        for p in PHASES[:PHASES.index(need[-1]) + 1]:
+            obj = art[p] = run_phase(p, obj, src)
+    if "symbols" in stages: art["symbols"] = analyze(art["ast"])
+    reports = {}
+    for s in stages:
+        out = io.StringIO(); write_report(out, s, art[s]); reports[s] = out.getvalue()
+    return reports, time.perf_counter() - t0
+
+# ---- metrics ----
+
+def percentiles(xs):
+    if not xs: return {}
+    xs = sorted(xs); n = len(xs)
+    pick = lambda q: xs[min(n - 1, max(0, math.ceil(q * n) - 1))] * 1e3     # nearest rank
+    return {"mean": sum(xs) / n * 1e3, "p50": pick(0.50), "p90": pick(0.90),
+            "p99": pick(0.99), "max": xs[-1] * 1e3}
+
+class Metrics:
+    def __init__(self, window=10000):
+        self.start = time.time()
+        self.requests = 0; self.errors = 0; self.memo_hits = 0; self.inflight = 0
+        self.latency = deque(maxlen=window)     # receipt to response, seconds
+        self.compile = deque(maxlen=window)     # time spent in the worker
+        self.stages = {s: 0 for s in STAGES}
+
+    def as_dict(self):
+        return {"uptime": time.time() - self.start, "requests": self.requests,
+                "errors": self.errors, "memo_hits": self.memo_hits, "inflight": self.inflight,
+                "stages": self.stages, "latency_ms": percentiles(self.latency),
+                "compile_ms": percentiles(self.compile)}
+
+# ---- server ----
+
+class Server:
+    def __init__(self, path=None, jobs=None, cache_dir=None, memo=256):
+        self.path = path or default_socket()
+        self.jobs = jobs or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.memo = OrderedDict(); self.memo_size = memo
+        self.metrics = Metrics()
+        self.pool = None; self.slots = None; self.done = None
+        self.conns = {}     # open connections: handler task -> its reader
+
+    async def handle(self, reader, writer):
+        # requests on one connection may overlap; replies carry their id
+        lock = asyncio.Lock(); tasks = set()
+        async def reply(line):
+            resp = await self.dispatch(line)
+            data = json.dumps(resp).encode("utf-8") + b"\n"
+            async with lock:
+                writer.write(data); await writer.drain()
+        self.conns[asyncio.current_task()] = reader
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                t = asyncio.ensure_future(reply(line)); tasks.add(t)
+                t.add_done_callback(tasks.discard)
+            if tasks: await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            # shutdown gave up waiting for this connection
+            for t in tasks: t.cancel()
+        finally:
+            del self.conns[asyncio.current_task()]
+            writer.close()
+
+    async def dispatch(self, line):
+        t0 = time.perf_counter()
+        try:
+            req = json.loads(line)
+        except ValueError as e:
+            return {"ok": False, "error": f"bad request: {e}"}
+        if not isinstance(req, dict):
+            return {"ok": False, "error": f"bad request: expected an object, got {type(req).__name__}"}
+        op = req.get("op", "compile")
+        if op == "stats": return self.metrics.as_dict()
+        if op == "shutdown":
+            self.done.set(); return {"ok": True, "stopping": True}
+        if op != "compile": return {"id": req.get("id"), "ok": False, "error": f"unknown op {op!r}"}
+
+        m = self.metrics; m.requests += 1; m.inflight += 1
+        try:
+            resp = await self.compile(req)
+        except Exception as e:
+            m.errors += 1
+            resp = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            m.inflight -= 1
+        resp["id"] = req.get("id")
+        m.latency.append(time.perf_counter() - t0)
+        return resp
+
+    async def compile(self, req):
+        stages = [s for s in req.get("stages") or ["asm"]]
+        bad = [s for s in stages if s not in STAGES]
+        if bad: raise ValueError(f"unknown stage(s): {', '.join(bad)}")
+        src = req.get("src")
+        if src is None:
+            path = req.get("path")
+            if not path: raise ValueError("request needs 'src' or 'path'")
+            src = await asyncio.to_thread(_read, path)
+        for s in stages: self.metrics.stages[s] += 1
+
+        key = hashlib.sha256(src.encode("utf-8")).hexdigest() + ":" + ",".join(stages)
+        hit = self.memo.get(key)
+        if hit is not None:
+            self.memo.move_to_end(key); self.metrics.memo_hits += 1
+            return {"ok": True, "stages": stages, "reports": hit, "memo": True}
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            reports, dt = await loop.run_in_executor(self.pool, compile_stages, src, stages)
+        self.metrics.compile.append(dt)
+        self.memo[key] = reports
+        if len(self.memo) > self.memo_size: self.memo.popitem(last=False)
+        return {"ok": True, "stages": stages, "reports": reports}
+
+    async def serve(self, log=print):
+        self.done = asyncio.Event()
+        self.slots = asyncio.Semaphore(self.jobs * 4)   # bounded queue into the pool
+        self.pool = ProcessPoolExecutor(self.jobs, initializer=_init, initargs=(self.cache_dir,))
+        # start every worker now so the first requests find them warm
+        await asyncio.gather(*[asyncio.get_running_loop().run_in_executor(self.pool, time.sleep, 0.01)
+                               for _ in range(self.jobs)])
+        if os.path.exists(self.path): os.unlink(self.path)
+        old = os.umask(0o177)       # socket readable by this user only
+        try:
+            server = await asyncio.start_unix_server(self.handle, self.path)
+        finally:
+            os.umask(old)
+        log(f"compile server on {self.path} with {self.jobs} worker{'s' if self.jobs > 1 else ''}")
+        try:
+            async with server:
+                await self.done.wait()
+                # open connections see end of input, answer what they have
+                # in flight (the shutdown reply too) and close
+                for reader in self.conns.values(): reader.feed_eof()
+                if self.conns: await asyncio.wait(list(self.conns), timeout=10)
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+            try: os.unlink(self.path)
+            except OSError: pass
+        log(json.dumps(self.metrics.as_dict(), indent=2))
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f: return f.read()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(usage="python server.py [--socket PATH] [-j N] [--cache DIR]")
+    ap.add_argument("--socket", help="Unix socket path (default: minicc-<uid>.sock in the temp dir)")
+    ap.add_argument("-j", "--jobs", type=int, help="worker processes (default: CPU count)")
+    ap.add_argument("--cache", metavar="DIR", help="also keep phase artifacts on disk in DIR")
+    ap.add_argument("--memo", type=int, default=256, help="recent results kept in memory")
+    args = ap.parse_args()
+    try:
+        asyncio.run(Server(args.socket, args.jobs, args.cache, args.memo).serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,409 @@
+# ssa.py
+# ------------------------------------------
+# SSA form for one function's TAC: pruned phi
+# placement on dominance frontiers, sparse
+# conditional constant propagation, dominator
+# based global value numbering (CSE + copy
+# folding), then phis lowered to copies and
+# versions coalesced back onto few names
+# ------------------------------------------
+
+from collections import deque
+from tac import Op, Instr, is_name, is_num
+from cfg import Block, build_cfg, reachable, flatten, defined, Liveness, ENDS
+from optimizer import fold, same_const
+
+class Phi:
+    __slots__=("dst","var","args")
+    def __init__(self,var):
+        self.dst=var; self.var=var
+        self.args={}        # pred Block -> value
+    def __repr__(self): return f"{self.dst} = phi({', '.join(map(str,self.args.values()))})"
+
+def base(x): return x.split(".",1)[0]
+def subst(ins,f):
+    # same instruction with its operands mapped through f
+    if ins.op is Op.BIN: return Instr(ins.op,ins.dst,f(ins.a),ins.sym,f(ins.b))
+    if ins.op in (Op.COPY,Op.PRINT,Op.IF,Op.IFZ,Op.RETURN,Op.PARAM): return Instr(ins.op,ins.dst,f(ins.a))
+    if ins.op is Op.CALL or ins.op is Op.ARG: return Instr(ins.op,ins.dst,ins.a,ins.sym)
+    return ins
+
+# ---- dominators ----
+
+def dominators(blocks):
+    # -> (idom, children) keyed by Block (Cooper, Harvey & Kennedy)
+    entry=blocks[0]; order=[]; seen={entry}; stack=[(entry,iter(entry.succ))]
+    while stack:
+        b,it=stack[-1]
+        for s in it:
+            if s not in seen: seen.add(s); stack.append((s,iter(s.succ))); break
+        else:
+            order.append(b); stack.pop()
+    order.reverse()
+    rpo={b:k for k,b in enumerate(order)}
+    idom={entry:entry}
+    def meet(a,b):
+        while a is not b:
+            while rpo[a]>rpo[b]: a=idom[a]
+            while rpo[b]>rpo[a]: b=idom[b]
+        return a
+    changed=True
+    while changed:
+        changed=False
+        for b in order[1:]:
+            new=None
+            for p in b.pred:
+                if p in idom: new=p if new is None else meet(p,new)
+            if idom.get(b) is not new: idom[b]=new; changed=True
+    kids={b:[] for b in blocks}
+    for b in order[1:]: kids[idom[b]].append(b)
+    return idom,kids
+
+def frontiers(blocks,idom):
+    df={b:set() for b in blocks}
+    for b in blocks:
+        if len(b.pred)<2: continue
+        for p in b.pred:
+            r=p
+            while r is not idom[b]: df[r].add(b); r=idom[r]
+    return df
+
+# ---- construction ----
+
+def build(body):
+    # -> (blocks, phis) with every name renamed to name.k; names read
+    # before any definition (parameters, unset variables) keep their own
+    blocks=reachable(build_cfg(body))
+    if blocks and blocks[0].pred:
+        # the entry must not be a join point: put an empty block in front
+        e=Block(0); e.succ=[blocks[0]]; blocks[0].pred.append(e)
+        blocks.insert(0,e)
+        for i,b in enumerate(blocks): b.id=i
+    phis={b:[] for b in blocks}
+    if not blocks: return blocks,phis
+    idom,kids=dominators(blocks); df=frontiers(blocks,idom)
+    lv=Liveness(blocks)
+    sites={}
+    for b in blocks:
+        for ins in b.code:
+            d=defined(ins)
+            if d is not None: sites.setdefault(d,set()).add(b)
+    for v,bs in sites.items():
+        has=set(); work=list(bs)
+        while work:
+            for y in df[work.pop()]:
+                if y not in has and lv.live(lv.before[y.id],v):
+                    has.add(y); phis[y].append(Phi(v))
+                    if y not in bs: work.append(y)
+
+    count={}; top={}    # name -> versions made, current version stack
+    def fresh(v):
+        k=count[v]=count.get(v,0)+1
+        nm=f"{v}.{k}"; top.setdefault(v,[]).append(nm)
+        return nm
+    cur=lambda x: top[x][-1] if is_name(x) and top.get(x) else x
+    stack=[(blocks[0],None)]
+    while stack:
+        b,pushed=stack.pop()
+        if pushed is not None:
+            for v in pushed: top[v].pop()
+            continue
+        pushed=[]
+        for p in phis[b]: p.dst=fresh(p.var); pushed.append(p.var)
+        code=[]
+        for ins in b.code:
+            new=subst(ins,cur)
+            d=defined(ins)
+            if d is not None: new.dst=fresh(d); pushed.append(d)
+            code.append(new)
+        b.code=code
+        for s in b.succ:
+            for p in phis[s]: p.args[b]=cur(p.var)
+        stack.append((b,pushed))
+        for c in reversed(kids[b]): stack.append((c,None))
+    return blocks,phis
+
+# ---- sparse conditional constant propagation ----
+
+TOP=object(); BOT=object()
+
+def meet(a,b):
+    if a is TOP: return b
+    if b is TOP: return a
+    if a is BOT or b is BOT or not same_const(a,b): return BOT
+    return a
+
+def branch_const(c):
+    return is_num(c) or isinstance(c,bool)
+
+def sccp(blocks,phis,st):
+    bylabel={b.label:b for b in blocks if b.label}
+    defs=set(); users={}
+    for b in blocks:
+        for p in phis[b]:
+            defs.add(p.dst)
+            for a in p.args.values():
+                if is_name(a): users.setdefault(a,[]).append((b,p))
+        for k,ins in enumerate(b.code):
+            d=defined(ins)
+            if d is not None: defs.add(d)
+            for u in ins.uses():
+                if is_name(u): users.setdefault(u,[]).append((b,k))
+    val={}
+    def get(x):
+        if not is_name(x): return x
+        return val.get(x,TOP) if x in defs else BOT
+    ssa=deque(); flow=deque([(None,blocks[0])]); edges=set(); live=set()
+    def put(x,v):
+        old=val.get(x,TOP); new=meet(old,v)
+        if new is not old: val[x]=new; ssa.append(x)
+    def visit_phi(b,p):
+        v=TOP
+        for q,a in p.args.items():
+            if (q,b) in edges: v=meet(v,get(a))
+        put(p.dst,v)
+    def visit(b,k):
+        ins=b.code[k]; op=ins.op
+        if op is Op.COPY: put(ins.dst,get(ins.a))
+        elif op is Op.BIN:
+            x=get(ins.a); y=get(ins.b)
+            if x is BOT or y is BOT: put(ins.dst,BOT)
+            elif x is not TOP and y is not TOP:
+                r=fold(ins.sym,x,y); put(ins.dst,BOT if r is None else r)
+        elif op is Op.CALL or op is Op.ARG: put(ins.dst,BOT)
+        elif op is Op.GOTO:
+            for s in b.succ: flow.append((b,s))
+        elif op is Op.IF or op is Op.IFZ:
+            c=get(ins.a)
+            if c is TOP: return
+            tgt=bylabel.get(ins.dst); fall=[s for s in b.succ if s is not tgt] or [tgt]
+            if tgt is not None and c is not BOT and branch_const(c):
+                flow.append((b,tgt) if bool(c)==(op is Op.IF) else (b,fall[0]))
+            else:
+                for s in b.succ: flow.append((b,s))
+    while flow or ssa:
+        while flow:
+            e=flow.popleft()
+            if e in edges: continue
+            edges.add(e); b=e[1]
+            for p in phis[b]: visit_phi(b,p)
+            if b in live: continue
+            live.add(b)
+            for k in range(len(b.code)): visit(b,k)
+            if not b.code or b.code[-1].op not in ENDS:
+                for s in b.succ: flow.append((b,s))
+        while ssa:
+            for b,site in users.get(ssa.popleft(),()):
+                if b not in live: continue
+                if isinstance(site,Phi): visit_phi(b,site)
+                else: visit(b,site)
+
+    # rewrite: constants replace their names, dead blocks and edges go
+    const={x:v for x,v in val.items() if v is not TOP and v is not BOT}
+    st["constants"]=st.get("constants",0)+len(const)
+    f=lambda x: const.get(x,x) if is_name(x) else x
+    kept=[b for b in blocks if b in live]
+    st["unreachable"]=st.get("unreachable",0)+len(blocks)-len(kept)
+    for b in kept:
+        b.succ=[s for s in b.succ if (b,s) in edges]
+        b.pred=[q for q in b.pred if (q,b) in edges]
+        ps=[]
+        for p in phis[b]:
+            if p.dst in const: continue
+            p.args={q:f(a) for q,a in p.args.items() if (q,b) in edges}
+            ps.append(p)
+        phis[b]=ps
+        code=[]
+        for ins in b.code:
+            d=defined(ins)
+            if d is not None and d in const: continue
+            new=subst(ins,f)
+            if (new.op is Op.IF or new.op is Op.IFZ) and branch_const(new.a):
+                st["branches"]=st.get("branches",0)+1
+                if bool(new.a)==(new.op is Op.IF): new=Instr(Op.GOTO,new.dst)
+                else: continue
+            code.append(new)
+        b.code=code
+    for b in blocks:
+        if b not in live: del phis[b]
+    for i,b in enumerate(kept): b.id=i
+    return kept
+
+# ---- global value numbering ----
+
+COMMUTATIVE={"*","==","!="}     # '+' also joins strings, so it stays ordered
+
+def gvn(blocks,phis,st):
+    idom,kids=dominators(blocks)
+    rep={}
+    def find(x):
+        while is_name(x) and x in rep: x=rep[x]
+        return x
+    key=lambda x: x if is_name(x) else (x.__class__,x)
+    table={}; stack=[(blocks[0],None)]
+    while stack:
+        b,added=stack.pop()
+        if added is not None:
+            for k in added: del table[k]
+            continue
+        added=[]; ps=[]
+        for p in phis[b]:
+            args={q:find(a) for q,a in p.args.items()}
+            vals={key(a):a for a in args.values() if a!=p.dst}
+            if len(vals)==1:
+                rep[p.dst]=next(iter(vals.values())); st["phis_removed"]=st.get("phis_removed",0)+1
+                continue
+            k=("phi",b)+tuple(key(args[q]) for q in b.pred)
+            if k in table:
+                rep[p.dst]=table[k]; st["phis_removed"]=st.get("phis_removed",0)+1
+                continue
+            table[k]=p.dst; added.append(k)
+            p.args=args; ps.append(p)
+        phis[b]=ps
+        code=[]
+        for ins in b.code:
+            if ins.op is Op.COPY:
+                rep[ins.dst]=find(ins.a); st["copies"]=st.get("copies",0)+1
+                continue
+            ins=subst(ins,find)
+            if ins.op is Op.BIN:
+                x,y=key(ins.a),key(ins.b)
+                if ins.sym in COMMUTATIVE and repr(y)<repr(x): x,y=y,x
+                k=(ins.sym,x,y)
+                if k in table:
+                    rep[ins.dst]=table[k]; st["cse"]=st.get("cse",0)+1
+                    continue
+                table[k]=ins.dst; added.append(k)
+            code.append(ins)
+        b.code=code
+        stack.append((b,added))
+        for c in reversed(kids[b]): stack.append((c,None))
+    # phi args along back edges were read before their block was visited
+    for b in blocks:
+        for p in phis[b]: p.args={q:find(a) for q,a in p.args.items()}
+
+# ---- out of SSA ----
+
+def destruct(blocks,phis,st):
+    # each phi becomes 'shadow = arg' at the end of every predecessor and
+    # 'dst = shadow' at the top of its block; names joined by copies are
+    # then merged wherever their live ranges do not interfere
+    nshadow=0
+    for b in blocks:
+        head=[]
+        for p in phis[b]:
+            nshadow+=1; s=f"{p.var}.s{nshadow}"
+            for q,a in p.args.items():
+                at=len(q.code)-1 if q.code and q.code[-1].op in ENDS else len(q.code)
+                q.code.insert(at,Instr(Op.COPY,s,a))
+            head.append(Instr(Op.COPY,p.dst,s))
+        if head:
+            at=1 if b.code and b.code[0].op is Op.LABEL else 0
+            b.code[at:at]=head
+
+    lv=Liveness(blocks); bit=lv.bit
+    inter={nm:0 for nm in bit}
+    for b in blocks:
+        x=lv.after[b.id]
+        for ins in reversed(b.code):
+            d=defined(ins)
+            if d is not None:
+                other=x&~bit[d]
+                if ins.op is Op.COPY and is_name(ins.a): other&=~bit[ins.a]
+                inter[d]|=other
+            x=lv.step(x,ins)
+    entry=lv.before[blocks[0].id]
+    for nm,m in bit.items():
+        if entry&m: inter[nm]|=entry&~m
+
+    # union-find over names; a class keeps its members and interference
+    parent={nm:nm for nm in bit}; mem={nm:bit[nm] for nm in bit}
+    def root(x):
+        while parent[x]!=x: parent[x]=parent[parent[x]]; x=parent[x]
+        return x
+    for b in blocks:
+        for ins in b.code:
+            if ins.op is not Op.COPY or not is_name(ins.a): continue
+            r1,r2=root(ins.dst),root(ins.a)
+            if r1==r2 or inter[r1]&mem[r2] or inter[r2]&mem[r1]: continue
+            if entry&mem[r1] and entry&mem[r2]: continue
+            parent[r2]=r1; mem[r1]|=mem[r2]; inter[r1]|=inter[r2]
+            st["coalesced"]=st.get("coalesced",0)+1
+
+    # one name per class: a name read on entry keeps itself, otherwise
+    # the original variable (or temp) name if still free
+    classes={}
+    for nm in sorted(bit): classes.setdefault(root(nm),[]).append(nm)
+    taken={nm for nm in bit if "." not in nm}
+    orig={base(nm) for nm in bit}
+    name={}
+    for r,ms in classes.items():
+        plain=[m for m in ms if "." not in m]
+        if plain:
+            for m in ms: name[m]=plain[0]
+    for r,ms in classes.items():
+        if ms[0] in name: continue
+        bases=sorted({base(m) for m in ms},key=lambda v:(v[:1]=="T" and v[1:].isdigit(),v))
+        nm=next((v for v in bases if v not in taken),None)
+        k=1
+        while nm is None:
+            c=f"{bases[0]}_{k}"
+            if c not in taken and c not in orig: nm=c
+            k+=1
+        taken.add(nm)
+        for m in ms: name[m]=nm
+    f=lambda x: name.get(x,x) if is_name(x) else x
+    for b in blocks:
+        code=[]
+        for ins in b.code:
+            new=subst(ins,f)
+            d=defined(ins)
+            if d is not None:
+                new.dst=f(d)
+                if new.op is Op.COPY and new.a==new.dst: continue
+            code.append(new)
+        b.code=code
+    return flatten(blocks)
+
+def ssa_optimize(body,st=None):
+    # SCCP and GVN over SSA; the caller cleans up with the usual passes
+    if st is None: st={}
+    blocks,phis=build(body)
+    if not blocks: return body
+    st["phis"]=st.get("phis",0)+sum(len(ps) for ps in phis.values())
+    blocks=sccp(blocks,phis,st)
+    gvn(blocks,phis,st)
+    return destruct(blocks,phis,st)
+
+def static_count(tac):
+    return sum(1 for ins in tac if ins.op is not Op.LABEL and ins.op is not Op.FUNC)
+
+if __name__ == "__main__":
+    import sys
+    from lexical import tokenize
+    from parser import Parser
+    from codegen import TACGen
+    from optimizer import optimize
+
+    if len(sys.argv) < 2:
+        print("Usage: python ssa.py sample.src ... | --bench")
+        sys.exit()
+    if sys.argv[1] == "--bench":
+        from bench import generate
+        from jit import PROGRAMS
+        progs = dict(PROGRAMS)
+        for size in (16 << 10, 128 << 10): progs[f"gen{size >> 10}K"] = generate(size)
+    else:
+        progs = {path: open(path).read() for path in sys.argv[1:]}
+    print("===== SSA: STATIC INSTRUCTIONS =====")
+    print(f"{'program':12} {'tac':>8} {'level 2':>8} {'level 3':>8}  change")
+    total = {}
+    for name, src in progs.items():
+        tac = TACGen().gen(Parser(list(tokenize(src))).parse())
+        st = {}
+        n0, n2, n3 = (static_count(tac), static_count(optimize(tac, 2)),
+                      static_count(optimize(tac, 3, st)))
+        print(f"{name:12} {n0:>8} {n2:>8} {n3:>8}  {(n3 - n2) / max(n2, 1):+.1%}")
+        for k, v in st.items(): total[k] = total.get(k, 0) + v
+    print(", ".join(f"{k}: {v}" for k, v in total.items()))
+    print("====================================\n")
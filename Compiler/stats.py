@@ -0,0 +1,91 @@
+# stats.py
+# ------------------------------------------
+# Phase instrumentation for the compiler driver
+# wall/CPU time, sizes, tracemalloc peaks and
+# optional cProfile per phase; a shared no-op
+# context is used when nothing is enabled
+# ------------------------------------------
+
+import sys
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+_off=nullcontext()
+
+class Stats:
+    def __init__(self,enabled=False,memory=False,profile=()):
+        self.enabled=enabled or bool(profile)
+        self.memory=memory and self.enabled
+        self.profile=set(profile)
+        self.phases={}; self.counts={}
+        if self.memory:
+            import tracemalloc
+            self._tm=tracemalloc
+            if not tracemalloc.is_tracing(): tracemalloc.start()
+
+    def phase(self,name):
+        return self._phase(name) if self.enabled else _off
+
+    @contextmanager
+    def _phase(self,name):
+        prof=None
+        if name in self.profile or "all" in self.profile:
+            import cProfile
+            prof=cProfile.Profile()
+        if self.memory: self._tm.reset_peak(); base=self._tm.get_traced_memory()[0]
+        c0=time.process_time(); t0=time.perf_counter()
+        if prof: prof.enable()
+        try:
+            yield
+        finally:
+            if prof: prof.disable()
+            rec={"wall":time.perf_counter()-t0,"cpu":time.process_time()-c0}
+            # peak above what was already allocated when the phase started
+            if self.memory: rec["peak_bytes"]=self._tm.get_traced_memory()[1]-base
+            self.phases[name]=rec
+            if prof: self._dump_profile(name,prof)
+
+    def _dump_profile(self,name,prof):
+        import pstats
+        print(f"===== PROFILE: {name} =====",file=sys.stderr)
+        pstats.Stats(prof,stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+
+    def count(self,name,value):
+        # value may be a callable so disabled runs never compute it
+        if self.enabled: self.counts[name]=value() if callable(value) else value
+
+    def as_dict(self):
+        total={"wall":sum(p["wall"] for p in self.phases.values()),
+               "cpu":sum(p["cpu"] for p in self.phases.values())}
+        if self.memory: total["peak_bytes"]=max((p["peak_bytes"] for p in self.phases.values()),default=0)
+        return {"phases":self.phases,"counts":self.counts,"total":total}
+
+    def dump(self,path="-",**extra):
+        doc=dict(extra); doc.update(self.as_dict())
+        text=json.dumps(doc,indent=2)
+        if path in (None,"-"): print(text)
+        else:
+            with open(path,"w") as f: f.write(text+"\n")
+
+def counting(items,stats,name):
+    # passes a lazy stream through, recording how many items went by
+    n=0
+    for x in items:
+        n+=1; yield x
+    stats.count(name,n)
+
+def count_nodes(tree):
+    # AST node count without recursion
+    from parser import Node
+    n=0; stack=[tree]
+    while stack:
+        x=stack.pop()
+        if isinstance(x,Node):
+            n+=1; stack.extend(vars(x).values())
+        elif isinstance(x,list):
+            stack.extend(x)
+    return n
+
+def asm_instructions(asm):
+    return sum(1 for line in asm if not line.endswith(":") and not line.startswith(";"))
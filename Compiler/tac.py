@@ -0,0 +1,77 @@
+# tac.py
+# ------------------------------------------
+# Compact instruction form for 3-address code
+# (rendered to text only when printed)
+# ------------------------------------------
+
+import operator
+from enum import IntEnum
+
+class Op(IntEnum):
+    FUNC=0      # label f
+    LABEL=1     # L1:
+    COPY=2      # dst = a
+    BIN=3       # dst = a sym b
+    PRINT=4     # PRINT a
+    IF=5        # IF a GOTO dst
+    IFZ=6       # IFZ a GOTO dst
+    GOTO=7      # GOTO dst
+    RETURN=8    # RETURN a
+    PARAM=9     # PARAM a          (next argument of the coming CALL)
+    CALL=10     # dst = CALL f, n  (f in sym, n arguments in a)
+    ARG=11      # dst = ARG k      (k-th argument of this call, 0 if missing)
+
+# string / char constant operand (numbers are stored as plain values)
+class Lit:
+    __slots__=("val","quote")
+    def __init__(self,val,quote='"'): self.val=val; self.quote=quote
+    def __str__(self): return f"{self.quote}{self.val}{self.quote}"
+    __repr__=__str__
+    def __eq__(self,o): return isinstance(o,Lit) and o.val==self.val and o.quote==self.quote
+    def __hash__(self): return hash((self.val,self.quote))
+
+class Instr:
+    __slots__=("op","dst","a","sym","b")
+    def __init__(self,op,dst=None,a=None,sym=None,b=None):
+        self.op=op; self.dst=dst; self.a=a; self.sym=sym; self.b=b
+
+    def uses(self):
+        if self.op is Op.BIN: return (self.a,self.b)
+        if self.op in (Op.COPY,Op.PRINT,Op.IF,Op.IFZ,Op.RETURN,Op.PARAM): return (self.a,)
+        return ()
+
+    def __str__(self):
+        op=self.op
+        if op is Op.COPY: return f"{self.dst} = {self.a}"
+        if op is Op.BIN: return f"{self.dst} = {self.a} {self.sym} {self.b}"
+        if op is Op.FUNC: return f"label {self.dst}"
+        if op is Op.LABEL: return f"{self.dst}:"
+        if op is Op.PRINT: return f"PRINT {self.a}"
+        if op is Op.IF: return f"IF {self.a} GOTO {self.dst}"
+        if op is Op.IFZ: return f"IFZ {self.a} GOTO {self.dst}"
+        if op is Op.GOTO: return f"GOTO {self.dst}"
+        if op is Op.RETURN: return f"RETURN {self.a}"
+        if op is Op.PARAM: return f"PARAM {self.a}"
+        if op is Op.CALL: return f"{self.dst} = CALL {self.sym}, {self.a}"
+        if op is Op.ARG: return f"{self.dst} = ARG {self.a}"
+        return f"? {self.op.name}"
+    def __repr__(self): return f"Instr({self})"
+    def __reduce__(self):
+        # compact pickles (cache, incremental state): the opcode goes in as an int
+        return (_instr,(int(self.op),self.dst,self.a,self.sym,self.b))
+
+_OPS=tuple(Op)
+def _instr(op,dst,a,sym,b): return Instr(_OPS[op],dst,a,sym,b)
+
+def is_name(x): return isinstance(x,str)
+def is_temp(x): return isinstance(x,str) and x[:1]=="T" and x[1:].isdigit()
+def is_num(x): return isinstance(x,(int,float)) and not isinstance(x,bool)
+
+# binary operator semantics shared by the optimizer and backends
+# (comparisons yield 1/0 like the target machine's flags)
+EVAL={
+    "+":operator.add, "-":operator.sub, "*":operator.mul, "/":operator.truediv,
+    "==":lambda a,b: int(a==b), "!=":lambda a,b: int(a!=b),
+    "<":lambda a,b: int(a<b), ">":lambda a,b: int(a>b),
+    "<=":lambda a,b: int(a<=b), ">=":lambda a,b: int(a>=b),
+}
@@ -0,0 +1,11 @@
+# conftest.py
+# ------------------------------------------
+# The compiler modules import each other by
+# plain name, so the tests run with Compiler/
+# on the path
+# ------------------------------------------
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,43 @@
+# test_arena.py
+# ------------------------------------------
+# The analysis types an arena tree (fresh or
+# loaded from its dump) as it types the object
+# tree, though every access makes a new view
+# ------------------------------------------
+
+import os
+import pytest
+from lexical import tokenize
+from parser import Parser
+from arena import Arena
+from semantic import analyze
+from codegen import TACGen
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.src")
+
+PROGRAMS = [
+    "func main() { b = 2.5; c = 1 * (b + 3); d = c + 1; }",
+    "func f(x) { s = \"a\" + x; return s; } func main() { y = f(1.5) + 0.5; z = y * 2; print(z); }",
+    "func main() { i = 0; while (i < 3) { t = i / 2.0; if (t > 1) { u = t + 1; } i = i + 1; } }",
+]
+
+def trees(src):
+    toks = list(tokenize(src))
+    arena = Arena().parse(toks)
+    return Parser(toks).parse(), arena.tree(), Arena.loads(arena.dumps()).tree()
+
+@pytest.mark.parametrize("src", PROGRAMS + [open(SAMPLE, encoding="utf-8").read()])
+def test_arena_symbols_match_object_tree(src):
+    obj, fresh, loaded = trees(src)
+    want = analyze(obj).dump()
+    assert analyze(fresh).dump() == want
+    assert analyze(loaded).dump() == want
+
+def test_arena_keeps_types_and_binds():
+    obj, fresh, loaded = trees(PROGRAMS[0])
+    for tree in (obj, fresh, loaded): analyze(tree)
+    stmts = [t.funcs[0].body.stmts for t in (obj, fresh, loaded)]
+    for o, f, l in zip(*stmts):
+        assert o.expr.type == f.expr.type == l.expr.type
+        assert o.bind == f.bind == l.bind
+    assert [str(i) for i in TACGen().gen(fresh)] == [str(i) for i in TACGen().gen(obj)]
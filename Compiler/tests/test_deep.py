@@ -0,0 +1,47 @@
+# test_deep.py
+# ------------------------------------------
+# Parser, analyzer and TAC generator on input
+# nested 100k levels deep: no RecursionError,
+# and the program does what a small one does
+# ------------------------------------------
+
+import pytest
+from lexical import tokenize
+from parser import Parser
+from semantic import analyze
+from codegen import TACGen
+from bench import deep_programs
+import vm
+
+N = 100000
+
+# what each program of deep_programs(N) computes, written flat
+SMALL = {
+    "if":    "func main() { x = 0; if (1) { x = x + 1; } print(x); return x; }",
+    "while": "func main() { i = 0; while (i < 1) { i = i + 1; } return i; }",
+    "block": "func main() { { x = 1; } return 0; }",
+    "paren": "func main() { x = (1); return x; }",
+    "call":  "func main() { x = g(1); return 0; }",
+    "chain": f"func main() {{ x = {N + 1}; return x; }}",
+    "right": f"func main() {{ x = {N + 1}; return x; }}",
+}
+G = "func g(a) { return a; }\n"     # so the nested calls have a callee
+
+def front(src):
+    tree = Parser(list(tokenize(src))).parse()
+    tab = analyze(tree)
+    return tab, TACGen().gen(tree)
+
+def execute(tac):
+    out = []
+    ret = vm.VM(vm.load(tac), out.append).run()
+    return out, ret
+
+@pytest.mark.parametrize("name", sorted(SMALL))
+def test_deep_nesting(name):
+    src = deep_programs(N)[name]
+    if name == "call": src = G + src
+    tab, tac = front(src)
+    small_tab, small_tac = front((G if name == "call" else "") + SMALL[name])
+    assert tab.dump() == small_tab.dump()
+    assert execute(tac) == execute(small_tac)
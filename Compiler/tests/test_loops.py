@@ -0,0 +1,51 @@
+# test_loops.py
+# ------------------------------------------
+# Full unrolling only for loops whose trip
+# count the counter's increment really gives
+# ------------------------------------------
+
+from lexical import tokenize
+from parser import Parser
+from codegen import TACGen
+from optimizer import optimize
+import vm
+
+def build(src, unroll):
+    tac = TACGen().gen(Parser(list(tokenize(src))).parse())
+    st = {}
+    return tac, optimize(tac, stats=st, unroll=unroll), st
+
+def result(tac):
+    out = []
+    return out, vm.VM(vm.load(tac), out.append).run()
+
+def test_conditional_increment_is_not_unrolled():
+    # i steps only from the second iteration on: 4 trips, not 3
+    src = ("func main() { i = 0; j = 0; n = 0; "
+           "while (i < 3) { if (j > 0) { i = i + 1; } j = j + 1; n = n + 1; } return n; }")
+    tac, opt, st = build(src, 64)
+    assert result(opt) == result(tac) == ([], 4)
+    assert "unrolled" not in st
+
+def test_increment_in_inner_loop_is_not_unrolled():
+    src = ("func main() { i = 0; n = 0; "
+           "while (i < 6) { k = 0; while (k < 2) { i = i + 1; k = k + 1; } n = n + 1; } return n; }")
+    tac, opt, st = build(src, 64)
+    assert result(opt) == result(tac) == ([], 3)
+
+def test_counted_loop_is_unrolled():
+    src = "func main() { i = 0; s = 0; while (i < 5) { s = s + i; i = i + 1; } print(s); return i; }"
+    tac, opt, st = build(src, 64)
+    assert result(opt) == result(tac) == (["10\n"], 5)
+    assert st.get("unrolled") == 1
+
+def test_many_loops_in_one_function():
+    # every loop of a long function is handled on the one CFG, nested ones too
+    body = "".join(f"i = 0; while (i < {k % 4 + 1}) {{ a = s * 3 + i * 4; j = 0; "
+                   f"while (j < 2) {{ s = s + a * j; j = j + 1; }} i = i + 1; }} " for k in range(200))
+    src = "func main() { s = 1; " + body + "print(s); return 0; }"
+    for unroll in (0, 64):
+        tac, opt, st = build(src, unroll)
+        assert result(opt) == result(tac)
+        assert st["loops"] == 400
+        assert st.get("unrolled" if unroll else "reduced", 0) > 0
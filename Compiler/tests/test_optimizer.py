@@ -0,0 +1,41 @@
+# test_optimizer.py
+# ------------------------------------------
+# Optimized code faults where the original
+# does: a division whose only effect is the
+# fault is not dead code
+# ------------------------------------------
+
+import pytest
+from lexical import tokenize
+from parser import Parser
+from codegen import TACGen
+from optimizer import optimize
+from tac import Op
+import vm
+
+def outcome(tac):
+    out = []
+    try: ret = vm.VM(vm.load(tac), out.append).run()
+    except RuntimeError as e: ret = "division by zero" if "division by zero" in str(e) else str(e)
+    return out, ret
+
+FAULTS = [
+    "func main() { a = 0; x = 7 / a; print(1); return 0; }",
+    "func main() { i = 0; while (i < 3) { x = 10 / (i - 1); i = i + 1; } print(i); return i; }",
+    "func f(n) { return 0; } func main() { i = 0; while (i < 3) { f(5 / i); i = i + 1; } return 1; }",
+]
+
+@pytest.mark.parametrize("src", FAULTS)
+def test_unused_division_still_faults(src):
+    tac = TACGen().gen(Parser(list(tokenize(src))).parse())
+    ref = outcome(tac)
+    assert ref[1] == "division by zero"
+    for level in (1, 2, 3):
+        for unroll in (0, 64):
+            assert outcome(optimize(tac, level, unroll=unroll)) == ref
+
+def test_unused_division_by_constant_is_dropped():
+    src = "func main() { a = 5; x = a / 2; y = a / 0.5; return a; }"
+    opt = optimize(TACGen().gen(Parser(list(tokenize(src))).parse()))
+    assert not any(ins.op is Op.BIN for ins in opt)
+    assert outcome(opt) == ([], 5)
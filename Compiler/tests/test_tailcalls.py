@@ -0,0 +1,68 @@
+# test_tailcalls.py
+# ------------------------------------------
+# Self tail calls and accumulated + / * self
+# calls run in constant stack, and only take
+# the accumulator when regrouping is exact
+# ------------------------------------------
+
+from lexical import tokenize
+from parser import Parser
+from codegen import TACGen
+from optimizer import optimize
+from arena import Arena
+from bench import recursion_programs
+import vm
+
+N = 100000
+
+def compile_src(src, tree=None):
+    gen = TACGen()
+    tac = gen.gen(tree or Parser(list(tokenize(src))).parse())
+    return gen, tac
+
+def run(tac):
+    out = []
+    m = vm.VM(vm.load(tac), out.append)
+    return out, m.run(), m.depth
+
+def test_deep_self_recursion_keeps_one_frame():
+    for name, stat in (("tail", "tail_calls"), ("accum", "accumulated")):
+        gen, tac = compile_src(recursion_programs(N)[name])
+        assert gen.stats == {stat: 1}
+        assert run(tac) == ([], N * (N + 1) // 2, 1)
+        # optimized, f is no longer recursive and may be inlined into main
+        out, ret, depth = run(optimize(tac))
+        assert (out, ret) == ([], N * (N + 1) // 2) and depth <= 1
+
+def test_float_arguments_keep_the_grouping():
+    src = ("func recn(n, s) { if (n < 1) { return s; } return n + recn(n - 1, s); }\n"
+           "func main() { print(recn(3.3, 0.35)); return 0; }")
+    def recn(n, s): return s if n < 1 else n + recn(n - 1, s)
+    gen, tac = compile_src(src)
+    assert "accumulated" not in gen.stats
+    assert run(tac)[0] == [f"{recn(3.3, 0.35)}\n"]
+
+def test_string_arguments_keep_the_recursion():
+    src = ("func rec(n, s) { if (n < 1) { return s; } return s + rec(n - 1, s); }\n"
+           "func main() { print(rec(2, \"a\")); return 0; }")
+    gen, tac = compile_src(src)
+    assert "accumulated" not in gen.stats
+    assert run(tac)[0] == ["aaa\n"]
+
+def test_ints_from_every_caller():
+    # one caller passing a float is enough to keep the plain recursion
+    body = "func f(n) { if (n < 1) { return 0; } return n + f(n - 1); }\n"
+    gen, _ = compile_src(body + "func g() { return f(4); }\nfunc main() { return f(3) + g(); }")
+    assert gen.stats == {"accumulated": 1}
+    gen, tac = compile_src(body + "func g() { return f(2.5); }\nfunc main() { return f(3) + g(); }")
+    assert "accumulated" not in gen.stats
+    assert run(tac)[1] == 6 + 4.0
+
+def test_arena_tree_gives_the_same_code():
+    for src in recursion_programs(10).values():
+        toks = list(tokenize(src))
+        _, tac = compile_src(src)
+        for tree in (Arena().parse(toks).tree(), Arena.loads(Arena().parse(toks).dumps()).tree()):
+            gen, code = compile_src(None, tree)
+            assert list(map(str, code)) == list(map(str, tac))
+            assert gen.stats
@@ -0,0 +1,293 @@
+# vector.py
+# ------------------------------------------
+# Batched execution of a compiled function
+# over many argument rows with NumPy: every
+# name holds one column, IF/IFZ split lanes
+# into masks and a block runs for all lanes
+# waiting at it, lowest block first, so loops
+# run until every lane has left them. Values
+# int64 / float64 cannot hold exactly fall
+# back to Python objects, so every row gets
+# the result the VM would give it.
+# ------------------------------------------
+
+import sys
+import heapq
+import operator
+from tac import Op, Lit, EVAL
+from cfg import split_funcs, build_cfg
+from vm import CALL_DEPTH
+
+try:
+    import numpy as np
+except ImportError:     # optional: only this module needs it
+    np = None
+
+ARITH = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+COMPARE = {"==": operator.eq, "!=": operator.ne, "<": operator.lt, ">": operator.gt,
+           "<=": operator.le, ">=": operator.ge}
+INT_SAFE = {"+": 1 << 62, "-": 1 << 62, "*": 1 << 31, "/": 1 << 53}   # int64 operands below these stay exact
+EXACT = 1 << 53     # ints a float64 holds exactly
+
+def need_numpy():
+    if np is None: raise RuntimeError("batched execution needs NumPy (pip install numpy)")
+
+# ---- lane values: an array (int64 / float64 / object) or one scalar for all ----
+
+def kind(x):
+    if x.__class__ is np.ndarray: return x.dtype.kind
+    if x.__class__ is int: return "i" if -(1 << 63) <= x < 1 << 63 else "O"
+    if x.__class__ is float: return "f"
+    return "O"      # strings, chars, bools
+
+def fits(x, bound):
+    if x.__class__ is not np.ndarray: return -bound < x < bound
+    return x.size == 0 or (-bound < int(x.min()) and int(x.max()) < bound)
+
+def objects(x, n):
+    # a fresh object array (Python ints / floats) with x's values
+    if x.__class__ is np.ndarray: return x.astype(object)
+    return np.full(n, x, object)
+
+def take(x, idx):
+    return x[idx] if x.__class__ is np.ndarray else x
+
+def merge(m, new, old, n):
+    # new where the mask is set, old elsewhere (m None: every lane)
+    if m is None: return new
+    kn = kind(new)
+    if kn == kind(old) and kn != "O": return np.where(m, new, old)
+    out = objects(old, n); out[m] = objects(new, n)[m]
+    return out
+
+def truth(c):
+    if c.__class__ is not np.ndarray: return bool(c)
+    return c.astype(bool)       # object cells: Python truth
+
+def column(x, n):
+    if x.__class__ is not np.ndarray:
+        # a plain list: numeric dtypes only when every cell has that type
+        types = set(map(type, x))
+        x = np.array(x, object) if types - {int} and types - {float} else np.asarray(x)
+    if x.ndim != 1 or len(x) != n: raise ValueError(f"argument columns must all have {n} rows")
+    if x.dtype.kind in "iu" and (x.size == 0 or fits(x, 1 << 63)): return x.astype(np.int64)
+    if x.dtype.kind == "f": return x.astype(np.float64)
+    return x.astype(object)
+
+# ---- one function, cut into blocks ----
+
+class Kernel:
+    __slots__ = ("name", "code", "target", "fall")
+    def __init__(self, name, body):
+        self.name = name
+        blocks = build_cfg(body)
+        at = {b.label: b.id for b in blocks if b.label}
+        self.code = []; self.target = []; self.fall = []
+        pos = 0     # instruction numbers as the VM counts them (labels left out)
+        for b in blocks:
+            code = []
+            for ins in b.code:
+                if ins.op is Op.LABEL: continue
+                pos += 1; code.append((ins, pos))
+            self.code.append(code)
+            last = b.code[-1]
+            if last.op in (Op.GOTO, Op.IF, Op.IFZ):
+                if last.dst not in at: raise RuntimeError(f"{name}: undefined label {last.dst}")
+                self.target.append(at[last.dst])
+            else:
+                self.target.append(None)
+            self.fall.append(b.id + 1 if b.id + 1 < len(blocks) else None)
+
+class Result:
+    # values[i]: what row i returned (0 if it faulted); errors[i]: None or
+    # the VM's error text for row i; prints: [(rows, values)] in order
+    def __init__(self, values, errors, prints):
+        self.values = values; self.errors = errors; self.prints = prints
+
+    def output(self, row):
+        # what row `row` printed, as the VM writes it
+        out = []
+        for rows, vals in self.prints:
+            k = np.searchsorted(rows, row)
+            if k < len(rows) and rows[k] == row: out.append(f"{vals[k]}\n")
+        return out
+
+class VectorVM:
+    def __init__(self, tac):
+        need_numpy()
+        self.kernels = {name: Kernel(name, body) for name, body in split_funcs(tac)}
+
+    def run(self, entry, columns):
+        # columns: one array-like per parameter of `entry`, all the same length
+        k = self.kernels.get(entry)
+        if k is None: raise RuntimeError(f"no function '{entry}'")
+        n = len(columns[0]) if columns else 0
+        args = [column(c, n) for c in columns]
+        self.errors = np.full(n, None, object); self.prints = []
+        old = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(old, CALL_DEPTH + 100))
+        try:
+            with np.errstate(all="ignore"):
+                ret = self.call(k, args, np.arange(n), 0)
+        finally:
+            sys.setrecursionlimit(old)
+        if ret.__class__ is not np.ndarray: ret = objects(ret, n)
+        return Result(ret, self.errors, self.prints)
+
+    def fail(self, rows, msg):
+        for r in rows.tolist(): self.errors[r] = msg
+
+    def call(self, k, args, rows, depth):
+        # runs kernel k for len(rows) lanes; lane i is row rows[i] of the
+        # batch. -> return values (lanes that faulted are left at 0 and
+        # recorded in self.errors)
+        n = len(rows); R = {}; params = []; ret = 0
+        val = lambda x: R.get(x, 0) if x.__class__ is str else x.val if x.__class__ is Lit else x
+        wait = {0: np.ones(n, bool)} if k.code and n else {}
+        heap = list(wait)
+        while heap:
+            b = heapq.heappop(heap); m = wait.pop(b)
+            if not m.any(): continue
+            mm = None if m.all() else m
+            for ins, pos in k.code[b]:
+                op = ins.op
+                if op is Op.BIN:
+                    r, bad = self.binop(ins.sym, val(ins.a), val(ins.b), m, n)
+                    if bad is not None:
+                        self.fail(rows[bad], f"{k.name}: division by zero at instruction {pos}")
+                        m = m & ~bad
+                        if not m.any(): break
+                        mm = m
+                    R[ins.dst] = merge(mm, r, R.get(ins.dst, 0), n)
+                elif op is Op.COPY: R[ins.dst] = merge(mm, val(ins.a), R.get(ins.dst, 0), n)
+                elif op is Op.PRINT:
+                    idx = np.flatnonzero(m); v = take(val(ins.a), idx)
+                    self.prints.append((rows[idx], v.tolist() if v.__class__ is np.ndarray else [v] * len(idx)))
+                elif op is Op.PARAM: params.append(val(ins.a))
+                elif op is Op.ARG:
+                    R[ins.dst] = merge(mm, args[ins.a] if ins.a < len(args) else 0, R.get(ins.dst, 0), n)
+                elif op is Op.CALL:
+                    sub = params[len(params) - ins.a:]; del params[len(params) - ins.a:]
+                    idx = np.flatnonzero(m); g = self.kernels.get(ins.sym)
+                    if g is None or depth >= CALL_DEPTH:
+                        self.fail(rows[idx], f"{k.name}: no function '{ins.sym}'" if g is None
+                                  else f"{ins.sym}: call depth {CALL_DEPTH} exceeded")
+                        m = np.zeros(n, bool); break
+                    r = self.call(g, [take(p, idx) for p in sub], rows[idx], depth + 1)
+                    ok = np.zeros(n, bool); ok[idx] = np.equal(self.errors[rows[idx]], None)
+                    if r.__class__ is np.ndarray:
+                        full = np.zeros(n, r.dtype); full[idx] = r; r = full
+                    m = m & ok
+                    if not m.any(): break
+                    mm = None if m.all() else m
+                    R[ins.dst] = merge(mm, r, R.get(ins.dst, 0), n)
+                elif op is Op.RETURN:
+                    ret = merge(mm, val(ins.a), ret, n); m = None; break
+            if m is None or not m.any(): continue
+            # hand the lanes on: to the jump target and / or the next block
+            last = k.code[b][-1][0] if k.code[b] else None
+            go = None; stay = m
+            if last is not None and last.op is Op.GOTO:
+                go, stay = m, None
+            elif last is not None and (last.op is Op.IF or last.op is Op.IFZ):
+                t = truth(val(last.a))
+                if last.op is Op.IFZ: t = ~t if t.__class__ is np.ndarray else not t
+                go = m & t; stay = m & ~go
+            for dst, lanes in ((k.target[b], go), (k.fall[b], stay)):
+                if lanes is None or not lanes.any(): continue
+                if dst is None:
+                    ret = merge(lanes, 0, ret, n)    # ran off the end
+                elif dst in wait:
+                    wait[dst] = wait[dst] | lanes
+                else:
+                    wait[dst] = lanes; heapq.heappush(heap, dst)
+        return ret
+
+    def binop(self, sym, x, y, m, n):
+        # -> (lane values, mask of lanes dividing by zero or None)
+        bad = None
+        if sym == "/":
+            z = m & (y == 0)
+            if z.any():
+                bad = z; y = np.where(z, 1, y) if y.__class__ is np.ndarray else 1
+        if x.__class__ is not np.ndarray and y.__class__ is not np.ndarray:
+            return EVAL[sym](x, y), bad
+        kx, ky = kind(x), kind(y)
+        if kx != "O" and ky != "O":
+            if sym in COMPARE:
+                if kx == ky or fits(x if kx == "i" else y, EXACT):
+                    return COMPARE[sym](x, y).astype(np.int64), bad
+            elif kx != "i" or ky != "i" or (fits(x, INT_SAFE[sym]) and fits(y, INT_SAFE[sym])):
+                return ARITH[sym](x, y), bad
+        # exact Python arithmetic, only on the lanes that are running
+        idx = np.flatnonzero(m if bad is None else m & ~bad)
+        xs = objects(take(x, idx), len(idx)); ys = objects(take(y, idx), len(idx))
+        r = (COMPARE[sym](xs, ys).astype(np.int64) if sym in COMPARE else ARITH[sym](xs, ys))
+        out = np.zeros(n, object); out[idx] = r
+        return out, bad
+
+def run(tac, entry, columns):
+    return VectorVM(tac).run(entry, columns)
+
+if __name__ == "__main__":
+    import csv
+    import time
+    import random
+    import vm
+    from lexical import tokenize
+    from parser import Parser
+    from codegen import TACGen
+    from optimizer import optimize
+
+    if len(sys.argv) < 3:
+        print("Usage: python vector.py prog.src FUNC [--rows N | --csv FILE] [--check K]")
+        sys.exit()
+    path, entry = sys.argv[1], sys.argv[2]
+    opts = dict(zip(sys.argv[3::2], sys.argv[4::2]))
+    with open(path, "r", encoding="utf-8") as f:
+        tree = Parser(list(tokenize(f.read()))).parse()
+    params = next((f.params for f in tree.funcs if f.name == entry), None)
+    if params is None: print(f"no function '{entry}'"); sys.exit(1)
+
+    def cell(s):
+        for conv in (int, float):
+            try: return conv(s)
+            except ValueError: pass
+        return s
+    if "--csv" in opts:
+        with open(opts["--csv"], newline="") as f:
+            rows = list(csv.DictReader(f))
+        cols = [[cell(r[p]) for r in rows] for p in params]
+    else:
+        rnd = random.Random(0); n = int(opts.get("--rows", 100000))
+        cols = [[rnd.randint(-50, 50) for _ in range(n)] for _ in params]
+    n = len(cols[0]) if cols else 0
+    # columns that are not all ints may not go through an accumulator
+    ints = all(x.__class__ is int for c in cols for x in c)
+    opt = optimize(TACGen(() if ints else (entry,)).gen(tree))
+
+    t0 = time.perf_counter()
+    try: res = run(opt, entry, cols)
+    except RuntimeError as e: print(e); sys.exit(1)
+    t1 = time.perf_counter()
+    check = min(n, int(opts.get("--check", 1000)))
+    machine = vm.VM(vm.load(opt), lambda s: None); mismatches = 0
+    t2 = time.perf_counter()
+    values = res.values.tolist()
+    for i in range(check):
+        out = []; machine.write = out.append
+        try: want, err = machine.run(entry, args=[c[i] for c in cols]), None
+        except RuntimeError as e: want, err = 0, str(e)
+        got = values[i]
+        if err != res.errors[i] or (err is None and (got != want or type(got) is not type(want))) \
+                or out != res.output(i):
+            mismatches += 1
+    t3 = time.perf_counter()
+    print("===== BATCHED RUN =====")
+    if "--csv" in opts:
+        for i in range(n):
+            print(f"row {i}: {res.errors[i] or values[i]}")
+    print(f"{n} rows in {t1 - t0:.3f}s; VM per row: {(t3 - t2) / max(check, 1) * 1e6:.1f} us "
+          f"(~{(t3 - t2) / max(check, 1) * n:.3f}s for all rows)")
+    print(f"checked {check} rows against the VM: {mismatches} mismatches")
+    print("=======================\n")
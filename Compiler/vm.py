@@ -0,0 +1,133 @@
+# vm.py
+# ------------------------------------------
+# Register virtual machine for (optimized) TAC
+# labels are resolved to instruction indexes and
+# every name / constant gets a numbered slot;
+# calls push frames on an explicit stack
+# ------------------------------------------
+
+import sys
+from tac import Op, Lit, EVAL
+from cfg import split_funcs
+
+# dispatch codes (plain ints are cheaper to compare than the enum)
+COPY, BIN, IF, IFZ, GOTO, PRINT, RETURN, PARAM, CALL, ARG = range(10)
+_codes={Op.COPY:COPY, Op.BIN:BIN, Op.IF:IF, Op.IFZ:IFZ, Op.GOTO:GOTO,
+        Op.PRINT:PRINT, Op.RETURN:RETURN, Op.PARAM:PARAM, Op.CALL:CALL, Op.ARG:ARG}
+CALL_DEPTH=10000    # frames before a run is stopped as runaway recursion
+
+def value(x): return x.val if isinstance(x,Lit) else x
+
+class Func:
+    __slots__=("name","code","slots","init")
+    def __init__(self,name,body):
+        self.name=name; self.slots={}; self.init=[]
+        labels={}; real=[]
+        for ins in body:
+            if ins.op is Op.LABEL: labels[ins.dst]=len(real)
+            else: real.append(ins)
+        self.code=[]
+        for ins in real:
+            op=_codes[ins.op]
+            if op in (IF,IFZ,GOTO):
+                if ins.dst not in labels: raise RuntimeError(f"{name}: undefined label {ins.dst}")
+                d=labels[ins.dst]
+            else:
+                d=self.slot(ins.dst) if ins.dst is not None else 0
+            if op==CALL or op==ARG:
+                # argument count / index stays a plain int, the callee a name
+                self.code.append((op,d,ins.a,0,ins.sym)); continue
+            a=self.slot(ins.a) if op!=GOTO else 0
+            b=self.slot(ins.b) if op==BIN else 0
+            self.code.append((op,d,a,b,EVAL[ins.sym] if op==BIN else None))
+
+    def slot(self,x):
+        # names and constants share one register file; constants are preloaded
+        key=x if isinstance(x,str) else (type(value(x)),value(x))
+        s=self.slots.get(key)
+        if s is None:
+            s=self.slots[key]=len(self.init)
+            self.init.append(0 if isinstance(x,str) else value(x))
+        return s
+
+def load(tac):
+    return {name:Func(name,body) for name,body in split_funcs(tac)}
+
+class VM:
+    def __init__(self,funcs,write=None):
+        self.funcs=funcs; self.write=write or sys.stdout.write
+        self.count=0        # dynamic instruction count of the last run
+        self.depth=0        # most frames the last run had on its stack
+
+    def run(self,entry="main",limit=None,args=()):
+        # args: what the entry function's ARGs read
+        f=self.funcs.get(entry)
+        if f is None: raise RuntimeError(f"no function '{entry}'")
+        funcs=self.funcs; write=self.write
+        R=list(f.init); code=f.code; A=list(args)
+        end=len(code); pc=0; n=0; depth=0
+        params=[]           # PARAM values waiting for their CALL
+        frames=[]           # callers: (func, R, args, return pc, result slot)
+        limit=float("inf") if limit is None else limit
+        try:
+            while True:
+                while pc<end:
+                    op,d,a,b,fn=code[pc]; pc+=1; n+=1
+                    if op==BIN: R[d]=fn(R[a],R[b])
+                    elif op==COPY: R[d]=R[a]
+                    elif op==IFZ:
+                        if not R[a]: pc=d
+                    elif op==IF:
+                        if R[a]: pc=d
+                    elif op==GOTO:
+                        pc=d
+                        if n>limit: raise RuntimeError(f"{entry}: step limit {limit} exceeded")
+                    elif op==PRINT: write(f"{R[a]}\n")
+                    elif op==PARAM: params.append(R[a])
+                    elif op==CALL:
+                        g=funcs.get(fn)
+                        if g is None: raise RuntimeError(f"{f.name}: no function '{fn}'")
+                        if len(frames)>=CALL_DEPTH: raise RuntimeError(f"{fn}: call depth {CALL_DEPTH} exceeded")
+                        frames.append((f,R,A,pc,d))
+                        if len(frames)>depth: depth=len(frames)
+                        k=len(params)-a; A=params[k:]; del params[k:]
+                        f=g; R=list(g.init); code=g.code; end=len(code); pc=0
+                        if n>limit: raise RuntimeError(f"{entry}: step limit {limit} exceeded")
+                    elif op==ARG: R[d]=A[a] if a<len(A) else 0
+                    else:
+                        ret=R[a]; break
+                else:
+                    ret=0       # ran off the end
+                if not frames: return ret
+                f,R,A,pc,d=frames.pop(); code=f.code; end=len(code)
+                R[d]=ret
+        except ZeroDivisionError:
+            raise RuntimeError(f"{f.name}: division by zero at instruction {pc}") from None
+        finally:
+            self.count=n; self.depth=depth
+
+def run(tac,entry="main",write=None,limit=None):
+    vm=VM(load(tac),write)
+    ret=vm.run(entry,limit)
+    return ret,vm.count
+
+if __name__ == "__main__":
+    from lexical import tokenize
+    from parser import Parser
+    from codegen import TACGen
+    from optimizer import optimize
+
+    if len(sys.argv) < 2:
+        print("Usage: python vm.py sample.src")
+        sys.exit()
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        src = f.read()
+    tac = TACGen().gen(Parser(list(tokenize(src))).parse())
+    print("===== RUN =====")
+    machine = VM(load(optimize(tac)))
+    ret = machine.run()
+    print(f"return: {ret}")
+    print(f"instructions executed: {machine.count} (unoptimized: {run(tac, write=lambda s: None)[1]})")
+    print(f"max call depth: {machine.depth}")
+    print("===============\n")